@@ -0,0 +1,71 @@
+import argparse
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from config import Settings
+from load import _write_frame, get_engine, verify_connection
+from logger import get_logger
+
+log = get_logger(__name__)
+
+BENCH_TABLE = "bench_load"
+METHODS = ["multi", "copy"]
+
+
+def make_clean_frame(rows: int, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    quantity = rng.integers(1, 10, rows)
+    unit_price = rng.uniform(1, 1000, rows).round(2)
+    return pd.DataFrame(
+        {
+            "order_id": np.arange(1, rows + 1),
+            "customer_name": rng.choice(
+                ["Alice Johnson", "Bob Smith", "Eve Davis"], rows
+            ),
+            "product": rng.choice(["Laptop", "Mouse", "Keyboard", "Monitor"], rows),
+            "quantity": quantity,
+            "unit_price": unit_price,
+            "order_date": pd.Timestamp("2024-01-01")
+            + pd.to_timedelta(rng.integers(0, 365, rows), unit="D"),
+            "region": rng.choice(["North", "South", "East", "West"], rows),
+            "total_revenue": (quantity * unit_price).round(2),
+            "loaded_at": datetime.now(tz=timezone.utc),
+        }
+    )
+
+
+def bench_method(df: pd.DataFrame, engine, method: str) -> float:
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        _write_frame(df, conn, BENCH_TABLE, if_exists="replace", method=method)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare to_sql vs COPY load speed.")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--methods", nargs="+", default=METHODS, choices=METHODS)
+    args = parser.parse_args()
+
+    settings = Settings()
+    engine = get_engine(settings.database_url, **settings.pool_options)
+    verify_connection(engine)
+
+    df = make_clean_frame(args.rows)
+    try:
+        for method in args.methods:
+            elapsed = bench_method(df, engine, method)
+            log.info(
+                f"[{method}] {args.rows} rows in {elapsed:.2f}s -> {args.rows / elapsed:,.0f} rows/sec"
+            )
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {BENCH_TABLE}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import argparse
+import os
+import time
+
+from benchmarks.bench_transform import make_raw_frame
+from logger import get_logger
+from transform import parallel_transform, transform
+
+log = get_logger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare transform against parallel_transform with N workers."
+    )
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[2, os.cpu_count() or 1]
+    )
+    args = parser.parse_args()
+
+    df = make_raw_frame(args.rows)
+    log.info(f"Benchmarking parallel transform on {len(df)} rows...")
+
+    start = time.perf_counter()
+    transform(df)
+    baseline = time.perf_counter() - start
+    log.info(f"[transform] {baseline:.2f}s")
+
+    for workers in sorted(set(args.workers)):
+        start = time.perf_counter()
+        parallel_transform(df, workers=workers)
+        elapsed = time.perf_counter() - start
+        log.info(
+            f"[parallel_transform x{workers}] {elapsed:.2f}s, speedup {baseline / elapsed:.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import validate
+from benchmarks.bench_load import make_clean_frame
+from logger import get_logger
+
+log = get_logger(__name__)
+
+BACKENDS = ["builtin", "gx"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare the builtin validation engine against Great Expectations."
+    )
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--backends", nargs="+", default=BACKENDS, choices=BACKENDS)
+    args = parser.parse_args()
+
+    # Keep benchmark reports out of the real reports/ directory.
+    validate.REPORTS_DIR = Path(tempfile.mkdtemp())
+    df = make_clean_frame(args.rows)
+
+    for backend in args.backends:
+        if backend == "gx" and validate.gx is None:
+            log.warning("great_expectations not installed — skipping gx backend.")
+            continue
+
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            validate.validate_clean(df, action="warn", backend=backend)
+            timings.append(time.perf_counter() - start)
+
+        log.info(
+            f"[{backend}] validate_clean on {args.rows} rows: best {min(timings):.2f}s over {args.repeat} runs"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import os
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+
+import metrics
+import validate
+from benchmarks.generate_data import write_sales_csv
+from extract import extract
+from metrics import RunSummary, measure
+from transform import transform
+
+# Generated CSVs are cached across sessions; 10M rows take a while to write.
+DATA_DIR = Path(
+    os.environ.get("BENCH_DATA_DIR", Path(__file__).parents[1] / "tmp" / "bench")
+)
+ROUNDS = int(os.environ.get("BENCH_ROUNDS", "3"))
+
+SIZES = [
+    pytest.param(10_000, id="10k"),
+    pytest.param(1_000_000, id="1m"),
+    pytest.param(10_000_000, id="10m", marks=pytest.mark.slow),
+]
+
+
+@pytest.fixture(autouse=True)
+def output_dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(validate, "REPORTS_DIR", tmp_path / "reports")
+    monkeypatch.setattr(metrics, "METRICS_DIR", tmp_path / "metrics")
+
+
+@pytest.fixture(scope="session", params=SIZES)
+def rows(request) -> int:
+    return request.param
+
+
+@pytest.fixture(scope="session")
+def sales_csv(rows) -> Path:
+    path = DATA_DIR / f"sales_{rows}.csv"
+    if not path.exists():
+        write_sales_csv(path, rows)
+    return path
+
+
+@pytest.fixture(scope="session")
+def raw_df(sales_csv):
+    return extract(sales_csv)
+
+
+@pytest.fixture(scope="session")
+def clean_df(raw_df):
+    return transform(raw_df)
+
+
+@pytest.fixture(scope="session")
+def bench_engine(tmp_path_factory):
+    # A local Postgres via BENCH_DATABASE_URL, otherwise a throwaway SQLite file.
+    url = os.environ.get("BENCH_DATABASE_URL")
+    if url is None:
+        url = f"sqlite:///{tmp_path_factory.mktemp('db') / 'bench.db'}"
+    engine = create_engine(url)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def run_bench(benchmark):
+    def run(fn, rows: int):
+        # One measured pass for memory and throughput, then the timed rounds.
+        summary = RunSummary(mode="bench")
+        with measure(summary, benchmark.name) as stage:
+            fn()
+            stage.rows = rows
+        benchmark.extra_info.update(
+            rows=rows,
+            peak_rss_mb=round(stage.peak_rss_mb, 1),
+            rows_per_sec=round(stage.rows_per_sec or 0),
+        )
+        return benchmark.pedantic(fn, rounds=ROUNDS, iterations=1)
+
+    return run
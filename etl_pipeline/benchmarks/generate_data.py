@@ -0,0 +1,137 @@
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from logger import get_logger
+
+log = get_logger(__name__)
+
+REGIONS = ["North", "South", "East", "West"]
+PRODUCTS = {
+    "Laptop": 999.99,
+    "Monitor": 349.99,
+    "Headset": 149.99,
+    "Webcam": 89.99,
+    "Keyboard": 79.99,
+    "Mouse": 29.99,
+}
+FIRST_NAMES = ["alice", "bob", "carol", "dave", "eve", "frank", "grace", "hank"]
+LAST_NAMES = ["johnson", "smith", "white", "brown", "davis", "miller", "lee"]
+BAD_NUMERICS = ["abc", "", "N/A", "-"]
+BAD_DATES = ["not-a-date", "2024-13-45", "15/01/2024", ""]
+
+WRITE_CHUNK_ROWS = 1_000_000
+
+
+def generate_sales(
+    rows: int,
+    seed: int = 42,
+    duplicate_rate: float = 0.01,
+    null_rate: float = 0.02,
+    bad_numeric_rate: float = 0.01,
+    bad_date_rate: float = 0.01,
+    region_skew: float = 1.0,
+    start_id: int = 1,
+) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    duplicates = int(rows * duplicate_rate)
+    unique = rows - duplicates
+
+    product = rng.choice(list(PRODUCTS), unique)
+    list_price = pd.Series(product).map(PRODUCTS).to_numpy()
+    # Zipf-like weights: 0 is uniform, higher values pile rows onto "North".
+    weights = 1 / np.arange(1, len(REGIONS) + 1) ** region_skew
+    region = rng.choice(REGIONS, unique, p=weights / weights.sum())
+    order_date = pd.Timestamp("2024-01-01") + pd.to_timedelta(
+        rng.integers(0, 366, unique), "D"
+    )
+
+    df = pd.DataFrame(
+        {
+            "order_id": np.arange(start_id, start_id + unique),
+            "customer_name": _messy_text(
+                np.char.add(
+                    np.char.add(rng.choice(FIRST_NAMES, unique), " "),
+                    rng.choice(LAST_NAMES, unique),
+                ),
+                rng,
+            ),
+            "product": product.astype(object),
+            "quantity": rng.integers(1, 10, unique).astype(str).astype(object),
+            "unit_price": (list_price * rng.uniform(0.8, 1.2, unique))
+            .round(2)
+            .astype(str)
+            .astype(object),
+            "order_date": order_date.strftime("%Y-%m-%d").to_numpy(dtype=object),
+            "region": _messy_text(region, rng),
+        }
+    )
+
+    for column in ["customer_name", "product", "region", "quantity"]:
+        df.loc[rng.random(unique) < null_rate, column] = None
+    for column in ["quantity", "unit_price"]:
+        bad = rng.random(unique) < bad_numeric_rate
+        df.loc[bad, column] = rng.choice(BAD_NUMERICS, int(bad.sum()))
+    bad = rng.random(unique) < bad_date_rate
+    df.loc[bad, "order_date"] = rng.choice(BAD_DATES, int(bad.sum()))
+
+    if duplicates:
+        repeated = df.iloc[rng.integers(0, unique, duplicates)]
+        df = pd.concat([df, repeated], ignore_index=True)
+        df = df.iloc[rng.permutation(len(df))].reset_index(drop=True)
+
+    return df
+
+
+def write_sales_csv(path: Path, rows: int, seed: int = 42, **options) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Written in slices so 10M+ rows never have to sit in memory at once.
+    written = 0
+    for i, start in enumerate(range(0, rows, WRITE_CHUNK_ROWS)):
+        size = min(WRITE_CHUNK_ROWS, rows - start)
+        chunk = generate_sales(size, seed=seed + i, start_id=start + 1, **options)
+        chunk.to_csv(path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+        written += len(chunk)
+
+    log.info(f"Wrote {written} synthetic rows to {path}")
+    return path
+
+
+def _messy_text(values: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    # Mixed case and stray whitespace, as transform's text step expects.
+    values = values.astype(object)
+    variant = rng.integers(0, 4, len(values))
+    values[variant == 1] = np.char.upper(values[variant == 1].astype(str))
+    values[variant == 2] = np.char.add(" ", values[variant == 2].astype(str))
+    values[variant == 3] = np.char.title(values[variant == 3].astype(str))
+    return values
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a dirty sales CSV.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--out", type=Path, default=Path("data/sales_synthetic.csv"))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--duplicate-rate", type=float, default=0.01)
+    parser.add_argument("--null-rate", type=float, default=0.02)
+    parser.add_argument("--bad-numeric-rate", type=float, default=0.01)
+    parser.add_argument("--bad-date-rate", type=float, default=0.01)
+    parser.add_argument("--region-skew", type=float, default=1.0)
+    args = parser.parse_args()
+
+    write_sales_csv(
+        args.out,
+        args.rows,
+        seed=args.seed,
+        duplicate_rate=args.duplicate_rate,
+        null_rate=args.null_rate,
+        bad_numeric_rate=args.bad_numeric_rate,
+        bad_date_rate=args.bad_date_rate,
+        region_skew=args.region_skew,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from extract import extract, extract_chunks
+from load import _write_frame
+from transform import transform
+from validate import validate_clean, validate_raw
+
+
+def test_extract(run_bench, sales_csv, rows):
+    run_bench(lambda: extract(sales_csv), rows)
+
+
+def test_extract_chunks(run_bench, sales_csv, rows):
+    run_bench(lambda: sum(len(c) for c in extract_chunks(sales_csv, 500_000)), rows)
+
+
+def test_validate_raw(run_bench, raw_df):
+    run_bench(lambda: validate_raw(raw_df, action="warn"), len(raw_df))
+
+
+def test_transform(run_bench, raw_df):
+    run_bench(lambda: transform(raw_df), len(raw_df))
+
+
+def test_validate_clean(run_bench, clean_df):
+    run_bench(lambda: validate_clean(clean_df, action="warn"), len(clean_df))
+
+
+def test_load(run_bench, clean_df, bench_engine):
+    def write():
+        with bench_engine.begin() as conn:
+            _write_frame(clean_df, conn, "bench_sales", if_exists="replace")
+
+    run_bench(write, len(clean_df))
+
+
+@pytest.fixture(scope="module")
+def spark():
+    pytest.importorskip("pyspark")
+    from pyspark.sql import SparkSession
+
+    session = (
+        SparkSession.builder.master("local[*]")
+        .appName("etl-bench")
+        .config("spark.ui.enabled", "false")
+        .config("spark.sql.session.timeZone", "UTC")
+        .getOrCreate()
+    )
+    yield session
+    session.stop()
+
+
+def test_spark_extract(run_bench, spark, sales_csv, rows):
+    from spark.extract_spark import extract as extract_spark
+
+    run_bench(lambda: extract_spark(spark, sales_csv).count(), rows)
+
+
+def test_spark_transform(run_bench, spark, sales_csv, rows):
+    from spark.extract_spark import extract as extract_spark
+    from spark.transform_spark import transform as transform_spark
+
+    raw = extract_spark(spark, sales_csv).cache()
+    run_bench(lambda: transform_spark(raw).count(), rows)
+    raw.unpersist()
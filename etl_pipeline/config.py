@@ -6,8 +6,18 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-VALID_LOAD_MODES = {"full", "incremental"}
+VALID_LOAD_MODES = {"full", "incremental", "upsert"}
 VALID_GE_ACTIONS = {"halt", "warn"}
+VALID_LOAD_METHODS = {"multi", "copy"}
+VALID_CSV_ENGINES = {"c", "pyarrow"}
+VALID_VALIDATION_BACKENDS = {"builtin", "gx"}
+VALID_ISOLATION_LEVELS = {
+    "NONE",
+    "READ_UNCOMMITTED",
+    "READ_COMMITTED",
+    "REPEATABLE_READ",
+    "SERIALIZABLE",
+}
 
 
 @dataclass
@@ -19,6 +29,17 @@ class Settings:
     db_name: str = field(default_factory=lambda: _require_env("DB_NAME"))
     db_user: str = field(default_factory=lambda: _require_env("DB_USER"))
     db_password: str = field(default_factory=lambda: _require_env("DB_PASSWORD"))
+    db_pool_size: int = field(
+        default_factory=lambda: int(_require_env("DB_POOL_SIZE", default="5"))
+    )
+    db_pool_pre_ping: bool = field(
+        default_factory=lambda: _env_flag("DB_POOL_PRE_PING", default="true")
+    )
+    db_statement_timeout_ms: int = field(
+        default_factory=lambda: int(
+            _require_env("DB_STATEMENT_TIMEOUT_MS", default="0")
+        )
+    )
     csv_path: Path = field(
         default_factory=lambda: Path(
             _require_env("CSV_PATH", default="data/sales_raw.csv")
@@ -33,8 +54,80 @@ class Settings:
     ge_action: str = field(
         default_factory=lambda: _require_env("GE_ACTION", default="halt")
     )
+    validation_backend: str = field(
+        default_factory=lambda: _require_env("VALIDATION_BACKEND", default="builtin")
+    )
+    load_method: str = field(
+        default_factory=lambda: _require_env("LOAD_METHOD", default="multi")
+    )
+    partition_by_month: bool = field(
+        default_factory=lambda: _env_flag("PARTITION_BY_MONTH")
+    )
+    csv_engine: str = field(
+        default_factory=lambda: _require_env("CSV_ENGINE", default="c")
+    )
+    stream_chunk_rows: int = field(
+        default_factory=lambda: int(_require_env("STREAM_CHUNK_ROWS", default="0"))
+    )
+    extract_workers: int = field(
+        default_factory=lambda: int(_require_env("EXTRACT_WORKERS", default="4"))
+    )
+    transform_workers: int = field(
+        default_factory=lambda: int(_require_env("TRANSFORM_WORKERS", default="1"))
+    )
+    spark_max_partition_bytes: int = field(
+        default_factory=lambda: int(
+            _require_env("SPARK_MAX_PARTITION_BYTES", default="0")
+        )
+    )
+    spark_partitions: int = field(
+        default_factory=lambda: int(_require_env("SPARK_PARTITIONS", default="0"))
+    )
+    spark_jdbc_partitions: int = field(
+        default_factory=lambda: int(_require_env("SPARK_JDBC_PARTITIONS", default="0"))
+    )
+    spark_jdbc_batch_size: int = field(
+        default_factory=lambda: int(
+            _require_env("SPARK_JDBC_BATCH_SIZE", default="10000")
+        )
+    )
+    spark_jdbc_isolation_level: str = field(
+        default_factory=lambda: _require_env(
+            "SPARK_JDBC_ISOLATION_LEVEL", default="READ_COMMITTED"
+        )
+    )
+    spark_jdbc_rewrite_batched_inserts: bool = field(
+        default_factory=lambda: _env_flag(
+            "SPARK_JDBC_REWRITE_BATCHED_INSERTS", default="true"
+        )
+    )
+    spark_checkpoint_dir: Path = field(
+        default_factory=lambda: Path(
+            _require_env("SPARK_CHECKPOINT_DIR", default="data/checkpoints/sales")
+        )
+    )
+    spark_trigger_seconds: int = field(
+        default_factory=lambda: int(_require_env("SPARK_TRIGGER_SECONDS", default="60"))
+    )
+    spark_max_files_per_trigger: int = field(
+        default_factory=lambda: int(
+            _require_env("SPARK_MAX_FILES_PER_TRIGGER", default="0")
+        )
+    )
+    parquet_sink_dir: Path | None = field(
+        default_factory=lambda: _env_path("PARQUET_SINK_DIR")
+    )
+    persist_metrics: bool = field(default_factory=lambda: _env_flag("PERSIST_METRICS"))
 
     def __post_init__(self) -> None:
+        if self.db_pool_size < 1:
+            raise ValueError(
+                f"Invalid DB_POOL_SIZE '{self.db_pool_size}'. Must be 1 or more."
+            )
+        if self.db_statement_timeout_ms < 0:
+            raise ValueError(
+                f"Invalid DB_STATEMENT_TIMEOUT_MS '{self.db_statement_timeout_ms}'. Must be 0 (no timeout) or a positive number of milliseconds."
+            )
         if self.load_mode not in VALID_LOAD_MODES:
             raise ValueError(
                 f"Invalid LOAD_MODE '{self.load_mode}'. Must be one of: {sorted(VALID_LOAD_MODES)}"
@@ -43,6 +136,58 @@ class Settings:
             raise ValueError(
                 f"Invalid GE_ACTION '{self.ge_action}'. Must be one of: {sorted(VALID_GE_ACTIONS)}"
             )
+        if self.validation_backend not in VALID_VALIDATION_BACKENDS:
+            raise ValueError(
+                f"Invalid VALIDATION_BACKEND '{self.validation_backend}'. Must be one of: {sorted(VALID_VALIDATION_BACKENDS)}"
+            )
+        if self.load_method not in VALID_LOAD_METHODS:
+            raise ValueError(
+                f"Invalid LOAD_METHOD '{self.load_method}'. Must be one of: {sorted(VALID_LOAD_METHODS)}"
+            )
+        if self.csv_engine not in VALID_CSV_ENGINES:
+            raise ValueError(
+                f"Invalid CSV_ENGINE '{self.csv_engine}'. Must be one of: {sorted(VALID_CSV_ENGINES)}"
+            )
+        if self.stream_chunk_rows < 0:
+            raise ValueError(
+                f"Invalid STREAM_CHUNK_ROWS '{self.stream_chunk_rows}'. Must be 0 (disabled) or a positive row count."
+            )
+        if self.extract_workers < 1:
+            raise ValueError(
+                f"Invalid EXTRACT_WORKERS '{self.extract_workers}'. Must be 1 or more."
+            )
+        if self.transform_workers < 1:
+            raise ValueError(
+                f"Invalid TRANSFORM_WORKERS '{self.transform_workers}'. Must be 1 (no parallelism) or more."
+            )
+        if self.spark_max_partition_bytes < 0:
+            raise ValueError(
+                f"Invalid SPARK_MAX_PARTITION_BYTES '{self.spark_max_partition_bytes}'. Must be 0 (Spark's default) or a positive byte count."
+            )
+        if self.spark_partitions < 0:
+            raise ValueError(
+                f"Invalid SPARK_PARTITIONS '{self.spark_partitions}'. Must be 0 (keep the read partitioning) or a positive partition count."
+            )
+        if self.spark_jdbc_partitions < 0:
+            raise ValueError(
+                f"Invalid SPARK_JDBC_PARTITIONS '{self.spark_jdbc_partitions}'. Must be 0 (keep the upstream partitioning) or a positive partition count."
+            )
+        if self.spark_jdbc_batch_size < 1:
+            raise ValueError(
+                f"Invalid SPARK_JDBC_BATCH_SIZE '{self.spark_jdbc_batch_size}'. Must be 1 or more."
+            )
+        if self.spark_jdbc_isolation_level not in VALID_ISOLATION_LEVELS:
+            raise ValueError(
+                f"Invalid SPARK_JDBC_ISOLATION_LEVEL '{self.spark_jdbc_isolation_level}'. Must be one of: {sorted(VALID_ISOLATION_LEVELS)}"
+            )
+        if self.spark_trigger_seconds < 1:
+            raise ValueError(
+                f"Invalid SPARK_TRIGGER_SECONDS '{self.spark_trigger_seconds}'. Must be 1 or more."
+            )
+        if self.spark_max_files_per_trigger < 0:
+            raise ValueError(
+                f"Invalid SPARK_MAX_FILES_PER_TRIGGER '{self.spark_max_files_per_trigger}'. Must be 0 (no limit) or a positive file count."
+            )
 
     @property
     def database_url(self) -> str:
@@ -51,13 +196,52 @@ class Settings:
             f"@{self.db_host}:{self.db_port}/{self.db_name}"
         )
 
+    @property
+    def pool_options(self) -> dict:
+        return {
+            "pool_size": self.db_pool_size,
+            "pre_ping": self.db_pool_pre_ping,
+            "statement_timeout_ms": self.db_statement_timeout_ms,
+        }
+
+    @property
+    def jdbc_options(self) -> dict:
+        return {
+            "num_partitions": self.spark_jdbc_partitions,
+            "batch_size": self.spark_jdbc_batch_size,
+            "isolation_level": self.spark_jdbc_isolation_level,
+            "rewrite_batched_inserts": self.spark_jdbc_rewrite_batched_inserts,
+        }
+
     def __repr__(self) -> str:
         return (
             f"Settings(db_host={self.db_host!r}, db_port={self.db_port}, "
             f"db_name={self.db_name!r}, db_user={self.db_user!r}, "
-            f"db_password='***', csv_path={self.csv_path!r}, "
+            f"db_password='***', db_pool_size={self.db_pool_size}, "
+            f"db_pool_pre_ping={self.db_pool_pre_ping}, "
+            f"db_statement_timeout_ms={self.db_statement_timeout_ms}, "
+            f"csv_path={self.csv_path!r}, "
             f"table_name={self.table_name!r}, load_mode={self.load_mode!r}, "
-            f"ge_action={self.ge_action!r})"
+            f"ge_action={self.ge_action!r}, "
+            f"validation_backend={self.validation_backend!r}, "
+            f"load_method={self.load_method!r}, "
+            f"partition_by_month={self.partition_by_month}, "
+            f"csv_engine={self.csv_engine!r}, "
+            f"stream_chunk_rows={self.stream_chunk_rows}, "
+            f"extract_workers={self.extract_workers}, "
+            f"transform_workers={self.transform_workers}, "
+            f"spark_max_partition_bytes={self.spark_max_partition_bytes}, "
+            f"spark_partitions={self.spark_partitions}, "
+            f"spark_jdbc_partitions={self.spark_jdbc_partitions}, "
+            f"spark_jdbc_batch_size={self.spark_jdbc_batch_size}, "
+            f"spark_jdbc_isolation_level={self.spark_jdbc_isolation_level!r}, "
+            f"spark_jdbc_rewrite_batched_inserts="
+            f"{self.spark_jdbc_rewrite_batched_inserts}, "
+            f"spark_checkpoint_dir={self.spark_checkpoint_dir!r}, "
+            f"spark_trigger_seconds={self.spark_trigger_seconds}, "
+            f"spark_max_files_per_trigger={self.spark_max_files_per_trigger}, "
+            f"parquet_sink_dir={self.parquet_sink_dir!r}, "
+            f"persist_metrics={self.persist_metrics})"
         )
 
 
@@ -69,3 +253,12 @@ def _require_env(key: str, default: str | None = None) -> str:
             f"Did you copy .env.sample to .env and fill it in?"
         )
     return value
+
+
+def _env_flag(key: str, default: str = "false") -> bool:
+    return _require_env(key, default=default).strip().lower() in {"1", "true", "yes"}
+
+
+def _env_path(key: str) -> Path | None:
+    value = _require_env(key, default="")
+    return Path(value) if value else None
@@ -20,8 +20,10 @@ def task_extract(**context) -> None:
 
     sys.path.insert(0, str(Path(__file__).parents[1]))
 
+    import pandas as pd
+
     from config import Settings
-    from extract import extract
+    from extract import extract_files, resolve_sources
 
     settings = Settings()
     TMP_DIR.mkdir(exist_ok=True)
@@ -29,7 +31,11 @@ def task_extract(**context) -> None:
     ds = context["ds"]
     raw_path = str(TMP_DIR / f"raw_{ds}.parquet")
 
-    raw_df = extract(settings.csv_path)
+    jobs = [(path, None, None, None) for path in resolve_sources(settings.csv_path)]
+    frames = extract_files(
+        jobs, engine=settings.csv_engine, workers=settings.extract_workers
+    )
+    raw_df = pd.concat(frames, ignore_index=True)
     raw_df.to_parquet(raw_path, index=False)
 
     context["ti"].xcom_push(key="raw_path", value=raw_path)
@@ -42,13 +48,17 @@ def task_transform(**context) -> None:
 
     import pandas as pd
 
-    from transform import transform
+    from config import Settings
+    from transform import parallel_transform
 
+    settings = Settings()
     ds = context["ds"]
     clean_path = str(TMP_DIR / f"clean_{ds}.parquet")
     raw_path = context["ti"].xcom_pull(task_ids="extract_task", key="raw_path")
 
-    clean_df = transform(pd.read_parquet(raw_path))
+    clean_df = parallel_transform(
+        pd.read_parquet(raw_path), workers=settings.transform_workers
+    )
     clean_df.to_parquet(clean_path, index=False)
 
     context["ti"].xcom_push(key="clean_path", value=clean_path)
@@ -67,9 +77,15 @@ def task_load(**context) -> None:
     settings = Settings()
     clean_path = context["ti"].xcom_pull(task_ids="transform_task", key="clean_path")
 
-    engine = get_engine(settings.database_url)
+    engine = get_engine(settings.database_url, **settings.pool_options)
     verify_connection(engine)
-    load(pd.read_parquet(clean_path), engine, settings.table_name)
+    load(
+        pd.read_parquet(clean_path),
+        engine,
+        settings.table_name,
+        method=settings.load_method,
+        partitioned=settings.partition_by_month,
+    )
 
 
 def task_cleanup(**context) -> None:
@@ -1,10 +1,30 @@
+import bz2
+import csv
+import glob
+import gzip
+import hashlib
+import io
+import lzma
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
+from typing import IO
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
 
 from logger import get_logger
 
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - only needed for .zst inputs
+    zstandard = None
+
 log = get_logger(__name__)
 
 EXPECTED_COLUMNS: frozenset[str] = frozenset(
@@ -19,24 +39,415 @@ EXPECTED_COLUMNS: frozenset[str] = frozenset(
     }
 )
 
+CATEGORICAL_COLUMNS: list[str] = ["product", "region"]
+NUMERIC_COLUMNS: list[str] = ["quantity", "unit_price"]
+DATE_COLUMNS: list[str] = ["order_date"]
+
+FINGERPRINT_BLOCK_BYTES = 64 * 1024
+HASH_BLOCK_BYTES = 1024 * 1024
+
+COLUMNAR_FORMATS: dict[str, str] = {
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".arrow": "ipc",
+    ".feather": "ipc",
+    ".ipc": "ipc",
+}
+
+# Layout written by load.write_parquet_sink: order_date=YYYY-MM-DD/region=X/.
+SINK_PARTITIONING = ds.partitioning(
+    pa.schema([("order_date", pa.date32()), ("region", pa.string())]),
+    flavor="hive",
+)
+
+
+GLOB_CHARS = frozenset("*?[")
+CSV_SUFFIXES = frozenset({".csv"})
+
+# Suffix -> pandas compression name. Compressed CSVs are decompressed as a
+# stream while they're parsed; no uncompressed copy is written to disk.
+COMPRESSIONS: dict[str, str] = {
+    ".gz": "gzip",
+    ".bz2": "bz2",
+    ".zst": "zstd",
+    ".xz": "xz",
+}
 
-def extract(csv_path: Path, since: datetime | None = None) -> pd.DataFrame:
-    if not csv_path.exists():
-        raise FileNotFoundError(
-            f"CSV file not found at '{csv_path}'. Check CSV_PATH in your .env file."
-        )
 
-    df = pd.read_csv(csv_path)
+@dataclass(frozen=True)
+class FileState:
+    path: str
+    fingerprint: str
+    byte_offset: int
+    # The stored state this snapshot was checked to extend, i.e. whose bytes
+    # are an unchanged prefix of it. Set by snapshot_file, never persisted.
+    extends: "FileState | None" = field(default=None, compare=False, repr=False)
+
+
+# (path, since, resume_from, until) for one file of a multi-file source.
+ExtractJob = tuple[Path, datetime | None, FileState | None, FileState | None]
+
+
+def resolve_sources(csv_path: Path) -> list[Path]:
+    if GLOB_CHARS & set(str(csv_path)):
+        paths = sorted(Path(p) for p in glob.glob(str(csv_path)))
+        if not paths:
+            raise FileNotFoundError(
+                f"No files match '{csv_path}'. Check CSV_PATH in your .env file."
+            )
+        return paths
+
+    if csv_path.is_dir():
+        csvs = sorted(p for p in csv_path.iterdir() if _is_csv(p))
+        # A directory without CSVs is read as one Parquet dataset.
+        if csvs:
+            return csvs
+
+    return [csv_path]
+
+
+def extract(
+    csv_path: Path,
+    since: datetime | None = None,
+    resume_from: FileState | None = None,
+    engine: str = "c",
+    until: FileState | None = None,
+) -> pd.DataFrame:
+    _check_exists(csv_path)
+
+    if _columnar_format(csv_path):
+        dataset = _open_dataset(csv_path)
+        table = dataset.to_table(**_scan_options(dataset, since))
+        df = _from_arrow(table)
+        log.info(f"Loaded {len(df)} rows x {len(df.columns)} columns from {csv_path}")
+        _validate_columns(df, csv_path)
+        df = _coerce_types(df)
+        return _filter_since(df, since) if since is not None else df
+
+    with _open_source(csv_path, resume_from, until) as (source, names):
+        # pyarrow can't parse an empty tail, and resumed tails are small anyway.
+        read_engine = engine if names is None else "c"
+        df = pd.read_csv(source, **_read_options(csv_path, names, read_engine))
     log.info(f"Loaded {len(df)} rows x {len(df.columns)} columns from {csv_path}")
 
     _validate_columns(df, csv_path)
+    df = _coerce_types(df)
 
-    if since is not None:
+    if since is not None and names is None:
         df = _filter_since(df, since)
 
     return df
 
 
+def extract_chunks(
+    csv_path: Path,
+    chunk_rows: int,
+    since: datetime | None = None,
+    resume_from: FileState | None = None,
+    until: FileState | None = None,
+) -> Iterator[pd.DataFrame]:
+    _check_exists(csv_path)
+
+    if _columnar_format(csv_path):
+        yield from _dataset_chunks(csv_path, chunk_rows, since)
+        return
+
+    total = 0
+    with (
+        _open_source(csv_path, resume_from, until) as (source, names),
+        pd.read_csv(
+            source, chunksize=chunk_rows, **_read_options(csv_path, names, "c")
+        ) as reader,
+    ):
+        for i, chunk in enumerate(reader):
+            if i == 0:
+                _validate_columns(chunk, csv_path)
+            total += len(chunk)
+            chunk = _coerce_types(chunk)
+
+            if since is not None and names is None:
+                chunk = _filter_since(chunk, since)
+            if chunk.empty:
+                continue
+
+            yield chunk
+
+    log.info(f"Streamed {total} rows in chunks of {chunk_rows} from {csv_path}")
+
+
+def extract_files(
+    jobs: Iterable[ExtractJob], engine: str = "c", workers: int = 4
+) -> Iterator[pd.DataFrame]:
+    # pandas' parser releases the GIL, so files are read on a thread pool.
+    # At most 2 x workers frames are in flight, and they come back in job
+    # order so the combined frame is the same on every run.
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        in_flight: deque = deque()
+        for path, since, resume_from, until in jobs:
+            if len(in_flight) >= 2 * workers:
+                yield in_flight.popleft().result()
+            in_flight.append(
+                pool.submit(
+                    extract,
+                    path,
+                    since=since,
+                    resume_from=resume_from,
+                    engine=engine,
+                    until=until,
+                )
+            )
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def snapshot_file(
+    csv_path: Path, previous: FileState | None = None
+) -> FileState | None:
+    _check_exists(csv_path)
+    # Byte offsets only mean something for an append-only CSV; columnar
+    # inputs rely on order_date pushdown instead.
+    if _columnar_format(csv_path):
+        return None
+
+    # A compressed stream can't be resumed mid-file, so its state only records
+    # whether the file changed at all; a changed file is re-read in full.
+    size = csv_path.stat().st_size
+    if _compression(csv_path):
+        return FileState(
+            path=str(csv_path.resolve()),
+            fingerprint=_fingerprint(csv_path, size)[0],
+            byte_offset=size,
+        )
+
+    # End the snapshot on a line boundary so a row still being appended is
+    # read in full on the next run rather than split across two.
+    with open(csv_path, "rb") as handle:
+        start = max(0, size - FINGERPRINT_BLOCK_BYTES)
+        handle.seek(start)
+        tail = handle.read(size - start)
+    offset = start + tail.rfind(b"\n") + 1 if b"\n" in tail else size
+
+    # The previous run's prefix is checked on the way to the new offset, so
+    # an incremental run reads the file once rather than hashing it twice.
+    fingerprint, extends = _fingerprint(csv_path, offset, previous)
+    return FileState(
+        path=str(csv_path.resolve()),
+        fingerprint=fingerprint,
+        byte_offset=offset,
+        extends=previous if extends else None,
+    )
+
+
+def _dataset_chunks(
+    path: Path, chunk_rows: int, since: datetime | None
+) -> Iterator[pd.DataFrame]:
+    dataset = _open_dataset(path)
+    total = 0
+    batches = dataset.to_batches(batch_size=chunk_rows, **_scan_options(dataset, since))
+    for i, batch in enumerate(batches):
+        chunk = _from_arrow(pa.Table.from_batches([batch]))
+        if i == 0:
+            _validate_columns(chunk, path)
+        total += len(chunk)
+        chunk = _coerce_types(chunk)
+
+        if since is not None:
+            chunk = _filter_since(chunk, since)
+        if chunk.empty:
+            continue
+
+        yield chunk
+
+    log.info(f"Streamed {total} rows in chunks of {chunk_rows} from {path}")
+
+
+def _is_csv(path: Path) -> bool:
+    suffixes = [suffix.lower() for suffix in path.suffixes]
+    if suffixes and suffixes[-1] in COMPRESSIONS:
+        suffixes.pop()
+    return path.is_file() and bool(suffixes) and suffixes[-1] in CSV_SUFFIXES
+
+
+def _compression(path: Path) -> str | None:
+    return COMPRESSIONS.get(path.suffix.lower())
+
+
+def _columnar_format(path: Path) -> str | None:
+    if path.is_dir():
+        return "parquet"
+    return COLUMNAR_FORMATS.get(path.suffix.lower())
+
+
+def _open_dataset(path: Path) -> ds.Dataset:
+    partitioning = None
+    if path.is_dir() and any("=" in child.name for child in path.iterdir()):
+        partitioning = SINK_PARTITIONING
+    return ds.dataset(
+        str(path), format=_columnar_format(path), partitioning=partitioning
+    )
+
+
+def _scan_options(dataset: ds.Dataset, since: datetime | None) -> dict:
+    # Only the pipeline's columns are read, and a typed order_date lets the
+    # watermark skip whole row groups / partitions before anything is decoded.
+    options = {"columns": [c for c in dataset.schema.names if c in EXPECTED_COLUMNS]}
+    if since is not None and "order_date" in dataset.schema.names:
+        options["filter"] = _since_filter(dataset.schema.field("order_date"), since)
+    return options
+
+
+def _since_filter(field: pa.Field, since: datetime) -> ds.Expression | None:
+    if pa.types.is_timestamp(field.type):
+        value = since if field.type.tz else since.replace(tzinfo=None)
+        return ds.field("order_date") > pa.scalar(value, type=field.type)
+    if pa.types.is_date(field.type):
+        return ds.field("order_date") > pa.scalar(since.date(), type=field.type)
+    # Raw string dates are parsed and filtered after the read, as for CSV.
+    return None
+
+
+def _from_arrow(table: pa.Table) -> pd.DataFrame:
+    df = table.to_pandas()
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype("category")
+    return df
+
+
+@contextmanager
+def _open_source(
+    csv_path: Path, resume_from: FileState | None, until: FileState | None = None
+) -> Iterator[tuple[Path | IO[bytes], list[str] | None]]:
+    if _compression(csv_path):
+        if resume_from is not None:
+            log.info(
+                f"{csv_path} is compressed and can't be resumed — reading it in full."
+            )
+        yield csv_path, None
+        return
+
+    verified = until is not None and until.extends == resume_from
+    if (
+        resume_from is not None
+        and not verified
+        and not _prefix_unchanged(csv_path, resume_from)
+    ):
+        log.info(
+            f"{csv_path} changed before byte {resume_from.byte_offset} — falling back to a full read."
+        )
+        resume_from = None
+
+    # The read stops at the offset the run's snapshot recorded, so a row still
+    # being appended is left for the next run instead of parsed half-written.
+    size = csv_path.stat().st_size
+    end = until.byte_offset if until is not None else size
+    if resume_from is None and end >= size:
+        yield csv_path, None
+        return
+
+    with open(csv_path, "rb") as handle:
+        names = None
+        if resume_from is not None:
+            names = next(csv.reader([handle.readline().decode()]))
+            handle.seek(max(resume_from.byte_offset, handle.tell()))
+            log.info(f"Resuming {csv_path} from byte {handle.tell()}.")
+        yield io.BufferedReader(_BoundedReader(handle, end)), names
+
+
+class _BoundedReader(io.RawIOBase):
+    # Exposes a file only up to `end`, as if it had been truncated there.
+    def __init__(self, handle: IO[bytes], end: int) -> None:
+        self._handle = handle
+        self._end = end
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), self._end - self._handle.tell())
+        if size <= 0:
+            return 0
+        return self._handle.readinto(memoryview(buffer)[:size])
+
+
+def _read_options(csv_path: Path, names: list[str] | None, engine: str) -> dict:
+    header = names if names is not None else _read_header(csv_path)
+    return {
+        "header": None if names else "infer",
+        "names": names,
+        "usecols": [c for c in header if c in EXPECTED_COLUMNS],
+        "dtype": {c: "category" for c in CATEGORICAL_COLUMNS if c in header},
+        "engine": engine,
+        "compression": _compression(csv_path),
+    }
+
+
+def _read_header(csv_path: Path) -> list[str]:
+    with _open_text(csv_path) as handle:
+        return next(csv.reader(handle), [])
+
+
+def _open_text(csv_path: Path) -> IO[str]:
+    compression = _compression(csv_path)
+    if compression is None:
+        return open(csv_path, newline="")
+    if compression == "zstd":
+        if zstandard is None:
+            raise ImportError(
+                f"Reading '{csv_path}' requires zstandard. Install it or recompress the file."
+            )
+        return zstandard.open(csv_path, "rt", newline="")
+    opener = {"gzip": gzip.open, "bz2": bz2.open, "xz": lzma.open}[compression]
+    return opener(csv_path, "rt", newline="")
+
+
+def _coerce_types(df: pd.DataFrame) -> pd.DataFrame:
+    for column in NUMERIC_COLUMNS:
+        df[column] = pd.to_numeric(df[column], errors="coerce")
+    for column in DATE_COLUMNS:
+        df[column] = pd.to_datetime(df[column], errors="coerce")
+    return df
+
+
+def _prefix_unchanged(csv_path: Path, state: FileState) -> bool:
+    if csv_path.stat().st_size < state.byte_offset:
+        return False
+    return _fingerprint(csv_path, state.byte_offset)[0] == state.fingerprint
+
+
+def _fingerprint(
+    csv_path: Path, offset: int, previous: FileState | None = None
+) -> tuple[str, bool]:
+    # Every byte of the prefix is hashed: a correction anywhere before the
+    # offset has to send the file back to a full read, or it's never loaded.
+    # The digest covers the bytes alone, so the digest of a shorter prefix is
+    # an intermediate state of this one and `previous` is checked in passing.
+    digest = hashlib.sha256()
+    extends = False
+    with open(csv_path, "rb") as handle:
+        if previous is not None and previous.byte_offset <= offset:
+            _hash_bytes(handle, digest, previous.byte_offset)
+            extends = digest.hexdigest() == previous.fingerprint
+        _hash_bytes(handle, digest, offset - handle.tell())
+    return digest.hexdigest(), extends
+
+
+def _hash_bytes(handle: IO[bytes], digest: "hashlib._Hash", count: int) -> None:
+    while count > 0:
+        block = handle.read(min(count, HASH_BLOCK_BYTES))
+        if not block:
+            break
+        digest.update(block)
+        count -= len(block)
+
+
+def _check_exists(csv_path: Path) -> None:
+    if not csv_path.exists():
+        raise FileNotFoundError(
+            f"CSV file not found at '{csv_path}'. Check CSV_PATH in your .env file."
+        )
+
+
 def _filter_since(df: pd.DataFrame, since: datetime) -> pd.DataFrame:
     before = len(df)
     parsed_dates = pd.to_datetime(df["order_date"], errors="coerce")
@@ -1,20 +1,91 @@
+import io
+import shutil
+import threading
+import uuid
+from collections.abc import Iterable
+from dataclasses import asdict, dataclass
 from datetime import datetime, timezone
+from pathlib import Path
 
 import pandas as pd
-from sqlalchemy import Engine, create_engine, text
+import pyarrow as pa
+import pyarrow.dataset as ds
+from sqlalchemy import Connection, Engine, bindparam, create_engine, make_url, text
 from sqlalchemy.exc import OperationalError, SQLAlchemyError
 
+from extract import SINK_PARTITIONING, FileState
 from logger import get_logger
+from metrics import RunSummary
 
 log = get_logger(__name__)
 
 PIPELINE_NAME = "sales"
 WATERMARK_COLUMN = "order_date"
+COPY_BATCH_ROWS = 100_000
+PARTITION_COLUMN = "order_date"
+ROW_HASH_COLUMN = "row_hash"
+# Metadata that changes on every run and must not count as a content change.
+UNHASHED_COLUMNS = frozenset({"loaded_at", ROW_HASH_COLUMN})
+
+# One pooled engine per (URL, pool options) per process, so every helper and
+# every stage of a run shares the same bounded set of connections.
+_engine_lock = threading.Lock()
+_engines: dict[tuple, Engine] = {}
+
+# Databases whose metadata tables are known to exist. The DDL runs once per
+# process per database instead of on every watermark/metrics call.
+_schema_lock = threading.Lock()
+_schema_ready: set[str] = set()
+
+
+@dataclass
+class MergeCounts:
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+
+    def __add__(self, other: "MergeCounts") -> "MergeCounts":
+        return MergeCounts(
+            self.inserted + other.inserted,
+            self.updated + other.updated,
+            self.unchanged + other.unchanged,
+        )
 
-
-def get_engine(database_url: str) -> Engine:
-    log.info("Creating database engine...")
-    return create_engine(database_url)
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+def get_engine(
+    database_url: str,
+    pool_size: int = 5,
+    pre_ping: bool = True,
+    statement_timeout_ms: int = 0,
+) -> Engine:
+    key = (database_url, pool_size, pre_ping, statement_timeout_ms)
+    with _engine_lock:
+        if key in _engines:
+            return _engines[key]
+
+        log.info(f"Creating database engine (pool_size={pool_size})...")
+        options: dict = {"pool_size": pool_size, "pool_pre_ping": pre_ping}
+        # statement_timeout is a PostgreSQL setting, applied once per pooled
+        # connection at connect time rather than before every statement.
+        if statement_timeout_ms and make_url(database_url).get_backend_name() == (
+            "postgresql"
+        ):
+            options["connect_args"] = {
+                "options": f"-c statement_timeout={statement_timeout_ms}"
+            }
+        engine = create_engine(database_url, **options)
+        _engines[key] = engine
+        return engine
+
+
+def dispose_engines() -> None:
+    with _engine_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
 
 
 def verify_connection(engine: Engine) -> None:
@@ -30,28 +101,163 @@ def verify_connection(engine: Engine) -> None:
         ) from e
 
 
-def load(df: pd.DataFrame, engine: Engine, table_name: str) -> None:
-    log.info(f"Full load: writing {len(df)} rows to '{table_name}'...")
+def load(
+    df: pd.DataFrame,
+    engine: Engine,
+    table_name: str,
+    method: str = "multi",
+    partitioned: bool = False,
+) -> None:
+    shadow = _shadow_name(table_name)
+    partition_column = PARTITION_COLUMN if partitioned else None
+    df = with_row_hash(df)
+    log.info(f"Full load: writing {len(df)} rows to '{shadow}'...")
     try:
-        df.to_sql(
-            name=table_name,
-            con=engine,
-            if_exists="replace",
-            index=False,
-            method="multi",
-        )
+        # The live table is only touched by the final rename, so readers keep
+        # seeing the previous load until this transaction commits.
+        with engine.begin() as conn:
+            _create_table(conn, shadow, df, "order_id", partition_column)
+            months = _add_partitions(conn, shadow, df, set()) if partitioned else set()
+            _write_frame(df, conn, shadow, if_exists="append", method=method)
+            _finalize_table(
+                conn,
+                shadow,
+                column="order_id",
+                expected=len(df),
+                partition_column=partition_column,
+            )
+            _swap_in(conn, shadow, table_name, column="order_id", months=months)
     except SQLAlchemyError as e:
         raise SQLAlchemyError(f"Full load failed for '{table_name}': {e}") from e
 
-    _ensure_unique_constraint(engine, table_name, column="order_id")
-    _verify_row_count(engine, table_name, expected=len(df))
     log.info(f"Full load complete.")
 
 
+def load_chunks(
+    chunks: Iterable[pd.DataFrame],
+    engine: Engine,
+    table_name: str,
+    method: str = "multi",
+    partitioned: bool = False,
+) -> int:
+    shadow = _shadow_name(table_name)
+    partition_column = PARTITION_COLUMN if partitioned else None
+    log.info(f"Full load: streaming chunks to '{shadow}'...")
+    total = 0
+    written = 0
+    months: set[pd.Period] = set()
+    try:
+        for df in chunks:
+            df = with_row_hash(df)
+            with engine.begin() as conn:
+                if written == 0:
+                    _create_table(conn, shadow, df, "order_id", partition_column)
+                if partitioned:
+                    _add_partitions(conn, shadow, df, months)
+                _write_frame(df, conn, shadow, if_exists="append", method=method)
+            written += 1
+            total += len(df)
+            log.info(f"Chunk {written} committed: {total} rows written so far.")
+    except SQLAlchemyError as e:
+        raise SQLAlchemyError(f"Full load failed for '{table_name}': {e}") from e
+
+    if written == 0:
+        log.info("No chunks to load.")
+        return 0
+
+    with engine.begin() as conn:
+        _finalize_table(
+            conn,
+            shadow,
+            column="order_id",
+            expected=total,
+            partition_column=partition_column,
+        )
+        _swap_in(conn, shadow, table_name, column="order_id", months=months)
+    log.info(f"Full load complete: {total} rows in {written} chunks.")
+    return total
+
+
+def write_parquet_sink(df: pd.DataFrame, root: Path, replace: bool = False) -> int:
+    if df.empty:
+        return 0
+
+    # Partition on the calendar day, not the timestamp, so each day is one
+    # directory that extract's order_date pushdown can skip as a whole.
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    position = table.schema.get_field_index("order_date")
+    table = table.set_column(
+        position, "order_date", table["order_date"].cast(pa.date32())
+    )
+
+    if replace and root.exists():
+        shutil.rmtree(root)
+    # A unique file name per write lets incremental runs add files to existing
+    # partitions without touching what earlier runs wrote.
+    ds.write_dataset(
+        table,
+        str(root),
+        format="parquet",
+        partitioning=SINK_PARTITIONING,
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+    log.info(f"Parquet sink: wrote {len(df)} rows to {root}.")
+    return len(df)
+
+
+def merge_parquet_sink(
+    df: pd.DataFrame, root: Path, key: list[str], keep: str = "first"
+) -> int:
+    if df.empty:
+        return 0
+    if not root.exists():
+        return write_parquet_sink(df.drop_duplicates(subset=key, keep=keep), root)
+
+    # Every day partition the batch touches is rewritten with the batch merged
+    # in on the target's key, so a retried run or a corrected order leaves one
+    # copy per key instead of appending another.
+    dataset = ds.dataset(str(root), format="parquet", partitioning=SINK_PARTITIONING)
+    days = set(df["order_date"].dt.date.dropna())
+    if "order_date" not in key:
+        # A correction can move an order to another day; its old copy lives
+        # in that day's partition, so that day is rewritten too. Only the
+        # order_id column is read to find them.
+        ids = pa.array(df["order_id"].unique()).cast(
+            dataset.schema.field("order_id").type
+        )
+        moved = dataset.to_table(
+            columns=["order_date"], filter=ds.field("order_id").isin(ids)
+        )
+        days.update(moved["order_date"].to_pylist())
+
+    touched = ds.field("order_date").isin(pa.array(sorted(days), type=pa.date32()))
+    stale = [Path(fragment.path) for fragment in dataset.get_fragments(touched)]
+    existing = dataset.to_table(filter=touched).to_pandas()
+    existing["order_date"] = pd.to_datetime(existing["order_date"])
+
+    # Existing rows come first: keep="first" lets what's already there win,
+    # as ON CONFLICT DO NOTHING does; keep="last" lets the batch win.
+    merged = pd.concat(
+        [existing.reindex(columns=df.columns), df], ignore_index=True
+    ).drop_duplicates(subset=key, keep=keep)
+    write_parquet_sink(merged, root)
+
+    # The old files go only after the new ones are written, so a crash in
+    # between leaves duplicates for the next run to merge away, never a gap.
+    for path in stale:
+        path.unlink()
+        for parent in (path.parent, path.parent.parent):
+            if parent != root and not any(parent.iterdir()):
+                parent.rmdir()
+    log.info(f"Parquet sink: rewrote {len(days)} day partitions with {len(df)} rows.")
+    return len(df)
+
+
 def get_watermark(
     engine: Engine, pipeline_name: str = PIPELINE_NAME
 ) -> datetime | None:
-    _ensure_watermarks_table(engine)
+    _ensure_metadata_tables(engine)
 
     with engine.connect() as conn:
         row = conn.execute(
@@ -73,12 +279,80 @@ def get_watermark(
     return watermark
 
 
+def get_file_state(
+    engine: Engine, file_path: str, pipeline_name: str = PIPELINE_NAME
+) -> FileState | None:
+    _ensure_metadata_tables(engine)
+
+    with engine.connect() as conn:
+        row = conn.execute(
+            text("""
+                SELECT fingerprint, byte_offset FROM etl_file_state
+                WHERE pipeline_name = :name AND file_path = :path
+            """),
+            {"name": pipeline_name, "path": file_path},
+        ).fetchone()
+
+    if row is None:
+        log.info(f"No byte offset recorded for '{file_path}'.")
+        return None
+
+    return FileState(path=file_path, fingerprint=row[0], byte_offset=row[1])
+
+
+def get_file_states(
+    engine: Engine, file_paths: Iterable[str], pipeline_name: str = PIPELINE_NAME
+) -> dict[str, FileState]:
+    file_paths = list(file_paths)
+    if not file_paths:
+        return {}
+    _ensure_metadata_tables(engine)
+
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text("""
+                SELECT file_path, fingerprint, byte_offset FROM etl_file_state
+                WHERE pipeline_name = :name AND file_path IN :paths
+            """).bindparams(bindparam("paths", expanding=True)),
+            {"name": pipeline_name, "paths": file_paths},
+        ).fetchall()
+
+    log.info(f"File state: {len(rows)}/{len(file_paths)} files seen before.")
+    return {
+        path: FileState(path=path, fingerprint=fingerprint, byte_offset=offset)
+        for path, fingerprint, offset in rows
+    }
+
+
 def save_watermark(
-    engine: Engine, watermark: datetime, pipeline_name: str = PIPELINE_NAME
+    engine: Engine,
+    watermark: datetime,
+    pipeline_name: str = PIPELINE_NAME,
+    file_state: FileState | None = None,
+    file_states: Iterable[FileState] = (),
 ) -> None:
-    _ensure_watermarks_table(engine)
+    _ensure_metadata_tables(engine)
 
+    states = [file_state, *file_states] if file_state else list(file_states)
     with engine.begin() as conn:
+        if states:
+            conn.execute(
+                text("""
+                    INSERT INTO etl_file_state (pipeline_name, file_path, fingerprint, byte_offset, updated_at)
+                    VALUES (:name, :path, :fingerprint, :offset, NOW())
+                    ON CONFLICT (pipeline_name, file_path)
+                    DO UPDATE SET fingerprint = EXCLUDED.fingerprint, byte_offset = EXCLUDED.byte_offset, updated_at = EXCLUDED.updated_at
+                """),
+                [
+                    {
+                        "name": pipeline_name,
+                        "path": state.path,
+                        "fingerprint": state.fingerprint,
+                        "offset": state.byte_offset,
+                    }
+                    for state in states
+                ],
+            )
         conn.execute(
             text("""
                 INSERT INTO etl_watermarks (pipeline_name, last_order_date, updated_at)
@@ -91,33 +365,93 @@ def save_watermark(
     log.info(f"Watermark saved: '{pipeline_name}' -> {watermark.date()}")
 
 
-def load_incremental(df: pd.DataFrame, engine: Engine, table_name: str) -> int:
+def save_run_metrics(
+    engine: Engine, summary: RunSummary, pipeline_name: str = PIPELINE_NAME
+) -> None:
+    if not summary.stages:
+        return
+    _ensure_metadata_tables(engine)
+
+    rows = [
+        {
+            "name": pipeline_name,
+            "run_id": summary.run_id,
+            "mode": summary.mode,
+            "started_at": summary.started_at,
+            "stage": stage.stage,
+            "wall_seconds": stage.wall_seconds,
+            "cpu_seconds": stage.cpu_seconds,
+            "peak_rss_mb": stage.peak_rss_mb,
+            "row_count": stage.rows,
+            "rows_per_sec": stage.rows_per_sec,
+        }
+        for stage in summary.stages
+    ]
+    with engine.begin() as conn:
+        conn.execute(
+            text("""
+                INSERT INTO etl_run_metrics (
+                    pipeline_name, run_id, mode, started_at, stage, wall_seconds,
+                    cpu_seconds, peak_rss_mb, row_count, rows_per_sec
+                )
+                VALUES (
+                    :name, :run_id, :mode, :started_at, :stage, :wall_seconds,
+                    :cpu_seconds, :peak_rss_mb, :row_count, :rows_per_sec
+                )
+            """),
+            rows,
+        )
+    log.info(f"Run metrics saved: {len(rows)} stages for '{summary.run_id}'.")
+
+
+def load_incremental(
+    df: pd.DataFrame,
+    engine: Engine,
+    table_name: str,
+    method: str = "multi",
+    partitioned: bool = False,
+) -> int:
     if df.empty:
         log.info("No new rows to load.")
         return 0
 
     staging = f"{table_name}_staging"
     log.info(f"Incremental load: staging {len(df)} rows...")
+    # A partitioned table's unique key has to include the partition column.
+    conflict = "order_id, order_date" if partitioned else "order_id"
+    # Rows inserted without a hash would all count as changed on the next
+    # upsert and be rewritten even though nothing about them differs.
+    df = with_row_hash(df)
 
     try:
-        df.to_sql(
-            name=staging, con=engine, if_exists="replace", index=False, method="multi"
-        )
-
         columns = ", ".join(f'"{c}"' for c in df.columns)
+        _ensure_row_hash_column(engine, table_name)
         with engine.begin() as conn:
+            if partitioned:
+                _add_partitions(conn, table_name, df, set())
+            # Session-private, unlogged by nature and dropped at commit, so
+            # concurrent runs never see each other's staging rows.
+            conn.execute(
+                text(f"""
+                CREATE TEMP TABLE "{staging}"
+                (LIKE "{table_name}" INCLUDING DEFAULTS)
+                ON COMMIT DROP
+            """)
+            )
+            _write_frame(df, conn, staging, if_exists="append", method=method)
+
+            # On a partitioned target, Postgres routes each staged row to its
+            # month and checks the conflict against that partition's index
+            # only; partitions the batch doesn't touch are never opened.
             result = conn.execute(
                 text(f"""
-                INSERT INTO {table_name} ({columns})
-                SELECT {columns} FROM {staging}
-                ON CONFLICT (order_id) DO NOTHING
+                INSERT INTO "{table_name}" ({columns})
+                SELECT {columns} FROM "{staging}"
+                ON CONFLICT ({conflict}) DO NOTHING
             """)
             )
             inserted = result.rowcount
 
-        with engine.begin() as conn:
-            conn.execute(text(f"DROP TABLE IF EXISTS {staging}"))
-
     except SQLAlchemyError as e:
         raise SQLAlchemyError(f"Incremental load failed for '{table_name}': {e}") from e
 
@@ -127,42 +461,306 @@ def load_incremental(df: pd.DataFrame, engine: Engine, table_name: str) -> int:
     return inserted
 
 
-def _ensure_watermarks_table(engine: Engine) -> None:
-    with engine.begin() as conn:
-        conn.execute(
-            text("""
-            CREATE TABLE IF NOT EXISTS etl_watermarks (
-                pipeline_name   VARCHAR(255) PRIMARY KEY,
-                last_order_date TIMESTAMP WITH TIME ZONE NOT NULL,
-                updated_at      TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+def load_upsert(
+    df: pd.DataFrame,
+    engine: Engine,
+    table_name: str,
+    method: str = "multi",
+    partitioned: bool = False,
+) -> MergeCounts:
+    if df.empty:
+        log.info("No rows to upsert.")
+        return MergeCounts()
+
+    key = ["order_id", PARTITION_COLUMN] if partitioned else ["order_id"]
+    # ON CONFLICT DO UPDATE can't touch a row twice in one statement, so a
+    # batch carrying several versions of an order keeps the last one read.
+    staged = with_row_hash(df.drop_duplicates(subset=key, keep="last"))
+    staging = f"{table_name}_staging"
+    log.info(f"Upsert: staging {len(staged)} rows...")
+
+    columns = ", ".join(f'"{c}"' for c in staged.columns)
+    updates = ", ".join(
+        f'"{c}" = EXCLUDED."{c}"' for c in staged.columns if c not in key
+    )
+    conflict = ", ".join(key)
+    try:
+        _ensure_row_hash_column(engine, table_name)
+        with engine.begin() as conn:
+            if partitioned:
+                _add_partitions(conn, table_name, staged, set())
+            conn.execute(
+                text(f"""
+                CREATE TEMP TABLE "{staging}"
+                (LIKE "{table_name}" INCLUDING DEFAULTS)
+                ON COMMIT DROP
+            """)
             )
-        """)
-        )
+            _write_frame(staged, conn, staging, if_exists="append", method=method)
 
+            # Rows whose hash matches are left alone (no new tuple, no WAL);
+            # RETURNING only sees rows actually written, and xmax = 0 marks
+            # the ones that were inserted rather than updated.
+            inserted, updated = conn.execute(
+                text(f"""
+                WITH merged AS (
+                    INSERT INTO "{table_name}" AS target ({columns})
+                    SELECT {columns} FROM "{staging}"
+                    ON CONFLICT ({conflict}) DO UPDATE SET {updates}
+                    WHERE target."{ROW_HASH_COLUMN}"
+                        IS DISTINCT FROM EXCLUDED."{ROW_HASH_COLUMN}"
+                    RETURNING (xmax = 0) AS inserted
+                )
+                SELECT
+                    COUNT(*) FILTER (WHERE inserted),
+                    COUNT(*) FILTER (WHERE NOT inserted)
+                FROM merged
+            """)
+            ).one()
 
-def _ensure_unique_constraint(engine: Engine, table_name: str, column: str) -> None:
-    constraint_name = f"uq_{table_name}_{column}"
-    with engine.begin() as conn:
-        exists = conn.execute(
-            text("SELECT 1 FROM pg_constraint WHERE conname = :name"),
-            {"name": constraint_name},
-        ).fetchone()
+    except SQLAlchemyError as e:
+        raise SQLAlchemyError(f"Upsert failed for '{table_name}': {e}") from e
+
+    counts = MergeCounts(inserted, updated, len(staged) - inserted - updated)
+    log.info(
+        f"Upsert complete: {counts.inserted} inserted, {counts.updated} updated, {counts.unchanged} unchanged."
+    )
+    return counts
+
+
+def with_row_hash(df: pd.DataFrame) -> pd.DataFrame:
+    # Hashed on the string form, like transform's cross-chunk dedup, so the
+    # same row hashes the same whether a column is category or object, or
+    # its timestamps came in at a different resolution.
+    content = [c for c in df.columns if c not in UNHASHED_COLUMNS]
+    hashes = pd.util.hash_pandas_object(df[content].astype(str), index=False)
+    return df.assign(**{ROW_HASH_COLUMN: hashes.to_numpy().view("int64")})
+
+
+def _write_frame(
+    df: pd.DataFrame,
+    conn: Connection,
+    table_name: str,
+    if_exists: str,
+    method: str = "multi",
+) -> None:
+    if method == "copy":
+        _copy_frame(df, conn, table_name, if_exists)
+        return
+
+    df.to_sql(
+        name=table_name, con=conn, if_exists=if_exists, index=False, method="multi"
+    )
+
+
+def _copy_frame(
+    df: pd.DataFrame, conn: Connection, table_name: str, if_exists: str
+) -> None:
+    columns = ", ".join(f'"{c}"' for c in df.columns)
+    copy_sql = f'COPY "{table_name}" ({columns}) FROM STDIN WITH (FORMAT csv)'
+
+    # Create (or replace) the table from pandas' type mapping, then stream
+    # the rows in through COPY on the same connection and transaction.
+    df.head(0).to_sql(name=table_name, con=conn, if_exists=if_exists, index=False)
 
-        if not exists:
+    cursor = conn.connection.cursor()
+    try:
+        for start in range(0, len(df), COPY_BATCH_ROWS):
+            buffer = io.StringIO()
+            df.iloc[start : start + COPY_BATCH_ROWS].to_csv(
+                buffer, index=False, header=False
+            )
+            buffer.seek(0)
+            cursor.copy_expert(copy_sql, buffer)
+    finally:
+        cursor.close()
+
+
+def _ensure_metadata_tables(engine: Engine) -> None:
+    key = str(engine.url)
+    with _schema_lock:
+        if key in _schema_ready:
+            return
+
+        with engine.begin() as conn:
+            conn.execute(
+                text("""
+                CREATE TABLE IF NOT EXISTS etl_watermarks (
+                    pipeline_name   VARCHAR(255) PRIMARY KEY,
+                    last_order_date TIMESTAMP WITH TIME ZONE NOT NULL,
+                    updated_at      TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+                );
+                CREATE TABLE IF NOT EXISTS etl_file_state (
+                    pipeline_name   VARCHAR(255) NOT NULL,
+                    file_path       TEXT NOT NULL,
+                    fingerprint     VARCHAR(64) NOT NULL,
+                    byte_offset     BIGINT NOT NULL,
+                    updated_at      TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+                    PRIMARY KEY (pipeline_name, file_path)
+                );
+                CREATE TABLE IF NOT EXISTS etl_run_metrics (
+                    id              BIGSERIAL PRIMARY KEY,
+                    pipeline_name   VARCHAR(255) NOT NULL,
+                    run_id          VARCHAR(255) NOT NULL,
+                    mode            VARCHAR(32) NOT NULL,
+                    started_at      TIMESTAMP WITH TIME ZONE NOT NULL,
+                    stage           VARCHAR(64) NOT NULL,
+                    wall_seconds    DOUBLE PRECISION NOT NULL,
+                    cpu_seconds     DOUBLE PRECISION NOT NULL,
+                    peak_rss_mb     DOUBLE PRECISION NOT NULL,
+                    row_count       BIGINT,
+                    rows_per_sec    DOUBLE PRECISION,
+                    recorded_at     TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+                )
+            """)
+            )
+        # Only cached once the DDL has committed, so a failed attempt retries.
+        _schema_ready.add(key)
+
+
+def _ensure_row_hash_column(engine: Engine, table_name: str) -> None:
+    # Tables built before upsert mode existed have no hash column. Rows with
+    # a NULL hash count as changed, so the first upsert backfills them.
+    key = f"{engine.url}#{table_name}.{ROW_HASH_COLUMN}"
+    with _schema_lock:
+        if key in _schema_ready:
+            return
+        with engine.begin() as conn:
             conn.execute(
                 text(
-                    f'ALTER TABLE "{table_name}" ADD CONSTRAINT {constraint_name} UNIQUE ("{column}")'
+                    f'ALTER TABLE "{table_name}" ADD COLUMN IF NOT EXISTS "{ROW_HASH_COLUMN}" BIGINT'
                 )
             )
-            log.info(f"Unique constraint added on '{table_name}'.'{column}'.")
+        _schema_ready.add(key)
 
 
-def _verify_row_count(engine: Engine, table_name: str, expected: int) -> None:
-    with engine.connect() as conn:
-        actual = conn.execute(text(f"SELECT COUNT(*) FROM {table_name}")).scalar()
+def _clear_schema_cache() -> None:
+    with _schema_lock:
+        _schema_ready.clear()
+
+
+def _shadow_name(table_name: str) -> str:
+    return f"{table_name}_shadow"
+
+
+def _create_table(
+    conn: Connection,
+    table_name: str,
+    df: pd.DataFrame,
+    key: str,
+    partition_column: str | None = None,
+) -> None:
+    # Dropped first in case an earlier run failed before its swap.
+    columns = ",\n".join(
+        f'    "{column}" {_column_type(df[column])}'
+        + (" NOT NULL" if column in (key, partition_column) else "")
+        for column in df.columns
+    )
+    partitioning = (
+        f'PARTITION BY RANGE ("{partition_column}")' if partition_column else ""
+    )
+    conn.execute(
+        text(f"""
+            DROP TABLE IF EXISTS "{table_name}";
+            CREATE TABLE "{table_name}" (\n{columns}\n) {partitioning}
+        """)
+    )
+
+
+def _add_partitions(
+    conn: Connection, table_name: str, df: pd.DataFrame, known: set[pd.Period]
+) -> set[pd.Period]:
+    # One monthly partition per month in the batch. `known` holds months
+    # already created in this load, so a chunk only pays for new ones.
+    months = set(df[PARTITION_COLUMN].dt.to_period("M").dropna().unique()) - known
+    if not months:
+        return known
+
+    statements = "".join(
+        f"""
+            CREATE TABLE IF NOT EXISTS "{_partition_name(table_name, month)}"
+            PARTITION OF "{table_name}"
+            FOR VALUES FROM ('{month.start_time:%Y-%m-%d}')
+            TO ('{(month + 1).start_time:%Y-%m-%d}');"""
+        for month in sorted(months)
+    )
+    conn.execute(text(statements))
+    log.info(f"Partitions ready on '{table_name}': {len(months)} month(s) added.")
+    known.update(months)
+    return known
+
+
+def _partition_name(table_name: str, month: pd.Period) -> str:
+    return f"{table_name}_p{month.strftime('%Y%m')}"
+
+
+def _column_type(values: pd.Series) -> str:
+    dtype = values.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return "BOOLEAN"
+    if pd.api.types.is_integer_dtype(dtype):
+        return "BIGINT"
+    if pd.api.types.is_float_dtype(dtype):
+        return "DOUBLE PRECISION"
+    if isinstance(dtype, pd.DatetimeTZDtype):
+        return "TIMESTAMP WITH TIME ZONE"
+    if pd.api.types.is_datetime64_dtype(dtype):
+        return "TIMESTAMP WITHOUT TIME ZONE"
+    return "TEXT"
+
+
+def _finalize_table(
+    conn: Connection,
+    table_name: str,
+    column: str,
+    expected: int,
+    partition_column: str | None = None,
+) -> None:
+    # The shadow table was just created, so the constraint can't exist yet.
+    # Building its index after the bulk load is one sort instead of a per-row
+    # index update; the constraint, fresh statistics and the row count all go
+    # out as one round trip.
+    constraint_name = f"uq_{table_name}_{column}"
+    key = ", ".join(f'"{c}"' for c in (column, partition_column) if c)
+    actual = conn.execute(
+        text(f"""
+            ALTER TABLE "{table_name}" ADD CONSTRAINT {constraint_name} UNIQUE ({key});
+            ANALYZE "{table_name}";
+            SELECT COUNT(*) FROM "{table_name}"
+        """)
+    ).scalar()
+    log.info(f"Unique constraint added on '{table_name}'.'{column}'.")
 
     if actual != expected:
         raise ValueError(
             f"Row count mismatch: wrote {expected} but '{table_name}' has {actual}."
         )
     log.info(f"Row count verified: {actual} rows in '{table_name}'.")
+
+
+def _swap_in(
+    conn: Connection,
+    shadow: str,
+    table_name: str,
+    column: str,
+    months: Iterable[pd.Period] = (),
+) -> None:
+    # DROP + RENAME in one transaction: readers block for the instant the
+    # catalog changes and then see the new table, never a missing or half one.
+    # The constraint and any partitions are renamed too, so the next shadow
+    # can reuse their names.
+    partitions = "".join(
+        f"""
+            ALTER TABLE "{_partition_name(shadow, month)}"
+                RENAME TO "{_partition_name(table_name, month)}";"""
+        for month in sorted(months)
+    )
+    conn.execute(
+        text(f"""
+            DROP TABLE IF EXISTS "{table_name}";
+            ALTER TABLE "{shadow}" RENAME TO "{table_name}";{partitions}
+            ALTER TABLE "{table_name}"
+                RENAME CONSTRAINT uq_{shadow}_{column} TO uq_{table_name}_{column}
+        """)
+    )
+    log.info(f"Swapped '{shadow}' in as '{table_name}'.")
@@ -0,0 +1,133 @@
+import json
+import os
+import resource
+import sys
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+
+from logger import get_logger
+
+log = get_logger(__name__)
+
+METRICS_DIR = Path(__file__).parent / "metrics"
+# One file per run; older ones are pruned so a frequent schedule doesn't
+# fill the disk. PERSIST_METRICS keeps the full history in the database.
+METRICS_KEEP = 500
+
+_PROC_STATUS = Path("/proc/self/status")
+_PROC_CLEAR_REFS = Path("/proc/self/clear_refs")
+
+
+@dataclass
+class StageMetrics:
+    stage: str
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    peak_rss_mb: float = 0.0
+    rows: int | None = None
+
+    @property
+    def rows_per_sec(self) -> float | None:
+        if self.rows is None or self.wall_seconds == 0:
+            return None
+        return self.rows / self.wall_seconds
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "rows_per_sec": self.rows_per_sec}
+
+
+@dataclass
+class RunSummary:
+    mode: str
+    started_at: datetime = field(default_factory=lambda: datetime.now(tz=timezone.utc))
+    rows_in: int = 0
+    rows_out: int = 0
+    watermark: datetime | None = None
+    stages: list[StageMetrics] = field(default_factory=list)
+    # inserted/updated/unchanged totals, filled in by upsert runs.
+    merged: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def run_id(self) -> str:
+        return f"{self.mode}_{self.started_at:%Y%m%dT%H%M%S%fZ}"
+
+    @property
+    def timings(self) -> dict[str, float]:
+        totals: dict[str, float] = {}
+        for stage in self.stages:
+            totals[stage.stage] = totals.get(stage.stage, 0.0) + stage.wall_seconds
+        return totals
+
+    def as_dict(self) -> dict:
+        return {
+            "run_id": self.run_id,
+            "mode": self.mode,
+            "started_at": self.started_at.isoformat(),
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "watermark": None if self.watermark is None else str(self.watermark),
+            "stages": [stage.as_dict() for stage in self.stages],
+            "merged": self.merged,
+        }
+
+
+@contextmanager
+def measure(summary: RunSummary, name: str) -> Iterator[StageMetrics]:
+    stage = StageMetrics(stage=name)
+    _reset_peak_rss()
+    wall_start = time.perf_counter()
+    cpu_start = _cpu_seconds()
+    try:
+        yield stage
+    finally:
+        stage.wall_seconds = time.perf_counter() - wall_start
+        stage.cpu_seconds = _cpu_seconds() - cpu_start
+        stage.peak_rss_mb = _peak_rss_bytes() / 1024**2
+        summary.stages.append(stage)
+
+
+def write_metrics(summary: RunSummary) -> Path:
+    METRICS_DIR.mkdir(exist_ok=True)
+    metrics_path = METRICS_DIR / f"{summary.run_id}.json"
+    metrics_path.write_text(json.dumps(summary.as_dict(), indent=2))
+    log.info(f"Run metrics written to {metrics_path}")
+    _prune_metrics(METRICS_KEEP)
+    return metrics_path
+
+
+def _prune_metrics(keep: int) -> None:
+    files = sorted(METRICS_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime)
+    for stale in files[:-keep]:
+        stale.unlink(missing_ok=True)
+
+
+def _cpu_seconds() -> float:
+    # Includes reaped child processes, so parallel_transform workers count.
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def _reset_peak_rss() -> None:
+    # Linux resets VmHWM on "5" so each stage reports its own peak; elsewhere
+    # the peak is the process high-water mark so far.
+    try:
+        _PROC_CLEAR_REFS.write_text("5")
+    except OSError:
+        pass
+
+
+def _peak_rss_bytes() -> int:
+    try:
+        for line in _PROC_STATUS.read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux but bytes on macOS.
+    return peak if sys.platform == "darwin" else peak * 1024
@@ -1,44 +1,57 @@
 import sys
+from collections.abc import Iterable, Iterator
+from datetime import datetime
+from itertools import chain
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import Engine
+from sqlalchemy.exc import SQLAlchemyError
 
 from config import Settings
-from extract import extract
+from extract import (
+    EXPECTED_COLUMNS,
+    ExtractJob,
+    FileState,
+    extract,
+    extract_chunks,
+    extract_files,
+    resolve_sources,
+    snapshot_file,
+)
 from load import (
+    PARTITION_COLUMN,
     WATERMARK_COLUMN,
+    dispose_engines,
     get_engine,
+    get_file_states,
     get_watermark,
     load,
+    load_chunks,
     load_incremental,
+    load_upsert,
+    merge_parquet_sink,
+    save_run_metrics,
     save_watermark,
     verify_connection,
+    write_parquet_sink,
 )
 from logger import get_logger
-from transform import transform
-from validate import validate_clean, validate_raw
+from metrics import RunSummary, measure, write_metrics
+from transform import parallel_transform, transform_chunks
+from validate import ChunkedReport, validate_clean, validate_raw
 
 log = get_logger(__name__)
 
 _SEP = "=" * 60
 
 
-def run_pipeline(settings: Settings) -> None:
-    log.info(_SEP)
-    log.info("PIPELINE START  [mode: full]")
-    log.info(f"Source : {settings.csv_path}")
-    log.info(
-        f"Target : {settings.db_host}:{settings.db_port}/{settings.db_name} -> {settings.table_name}"
-    )
-    log.info(_SEP)
+def run_pipeline(settings: Settings) -> RunSummary:
+    _log_start("full", settings)
 
+    summary = RunSummary(mode="full")
     try:
-        raw_df = extract(settings.csv_path)
-        validate_raw(raw_df, action=settings.ge_action)
-
-        clean_df = transform(raw_df)
-        validate_clean(clean_df, action=settings.ge_action)
-
-        engine = get_engine(settings.database_url)
-        verify_connection(engine)
-        load(clean_df, engine, settings.table_name)
+        _run_full(settings, summary)
     except FileNotFoundError as e:
         log.error(f"PIPELINE FAILED — file not found: {e}")
         raise
@@ -49,56 +62,106 @@ def run_pipeline(settings: Settings) -> None:
         log.error(f"PIPELINE FAILED — {type(e).__name__}: {e}")
         raise
 
-    log.info(_SEP)
-    log.info("PIPELINE COMPLETE  [mode: full]")
-    log.info(_SEP)
+    return _complete("full", summary, settings)
 
 
-def run_incremental_pipeline(settings: Settings) -> None:
-    log.info(_SEP)
-    log.info("PIPELINE START  [mode: incremental]")
-    log.info(f"Source : {settings.csv_path}")
-    log.info(
-        f"Target : {settings.db_host}:{settings.db_port}/{settings.db_name} -> {settings.table_name}"
-    )
-    log.info(_SEP)
+def run_incremental_pipeline(settings: Settings) -> RunSummary:
+    # LOAD_MODE=upsert shares this flow; only the date filter and the merge
+    # into the target differ.
+    mode = settings.load_mode if settings.load_mode == "upsert" else "incremental"
+    _log_start(mode, settings)
 
+    summary = RunSummary(mode=mode)
     try:
-        engine = get_engine(settings.database_url)
+        engine = _engine(settings)
         verify_connection(engine)
-        watermark = get_watermark(engine)
+        with measure(summary, "read_watermark"):
+            watermark = get_watermark(engine)
+            sources = resolve_sources(settings.csv_path)
+            # Stored states are read first so each snapshot checks the stored
+            # prefix in the same pass that hashes up to its new offset.
+            stored = (
+                get_file_states(engine, [str(path.resolve()) for path in sources])
+                if watermark is not None
+                else {}
+            )
+            snapshots = {
+                path: snapshot_file(path, stored.get(str(path.resolve())))
+                for path in sources
+            }
+        end_states = [state for state in snapshots.values() if state is not None]
 
         if watermark is None:
             log.info("No watermark — bootstrapping with full load.")
-            run_pipeline(settings)
-            clean_df = transform(extract(settings.csv_path))
-            save_watermark(engine, clean_df[WATERMARK_COLUMN].max())
-            return
+            # The full load already knows the max order_date it wrote, so the
+            # watermark comes from its summary rather than a second pass.
+            _run_full(
+                settings,
+                summary,
+                [(path, None, None, end) for path, end in snapshots.items()],
+            )
+            if summary.watermark is not None:
+                _save_watermark(summary, engine, summary.watermark, end_states)
+            return _complete(f"{mode} — bootstrap", summary, settings)
+
+        jobs = _pending_jobs(
+            snapshots, stored, watermark, filter_dates=mode != "upsert"
+        )
+
+        if settings.stream_chunk_rows:
+            _load_incremental_streaming(settings, engine, jobs, summary)
+            if summary.watermark is None:
+                _save_watermark(summary, engine, watermark, end_states)
+                log.info("No new rows since last run.")
+                return _complete(f"{mode} — no new data", summary, settings)
+            _save_watermark(
+                summary, engine, _later(watermark, summary.watermark), end_states
+            )
+            return _complete(f"{mode} — streamed", summary, settings)
 
-        raw_df = extract(settings.csv_path, since=watermark)
+        with measure(summary, "extract") as stage:
+            raw_df = _extract_jobs(settings, jobs)
+            stage.rows = summary.rows_in = len(raw_df)
 
         if raw_df.empty:
+            _save_watermark(summary, engine, watermark, end_states)
             log.info("No new rows since last run.")
-            log.info(_SEP)
-            log.info("PIPELINE COMPLETE  [mode: incremental — no new data]")
-            log.info(_SEP)
-            return
+            return _complete(f"{mode} — no new data", summary, settings)
 
-        validate_raw(raw_df, action=settings.ge_action)
+        with measure(summary, "validate_raw") as stage:
+            validate_raw(
+                raw_df, action=settings.ge_action, backend=settings.validation_backend
+            )
+            stage.rows = len(raw_df)
 
-        clean_df = transform(raw_df)
+        with measure(summary, "transform") as stage:
+            clean_df = parallel_transform(raw_df, workers=settings.transform_workers)
+            stage.rows = len(raw_df)
+        summary.rows_out = len(clean_df)
 
         if clean_df.empty:
+            _save_watermark(summary, engine, watermark, end_states)
             log.info("All new rows filtered by transform — nothing to load.")
-            log.info(_SEP)
-            log.info("PIPELINE COMPLETE  [mode: incremental — all rows invalid]")
-            log.info(_SEP)
-            return
+            return _complete(f"{mode} — all rows invalid", summary, settings)
 
-        validate_clean(clean_df, action=settings.ge_action)
+        summary.watermark = _max_watermark([clean_df])
 
-        load_incremental(clean_df, engine, settings.table_name)
-        save_watermark(engine, clean_df[WATERMARK_COLUMN].max())
+        with measure(summary, "validate_clean") as stage:
+            validate_clean(
+                clean_df,
+                action=settings.ge_action,
+                backend=settings.validation_backend,
+                upsert=mode == "upsert",
+            )
+            stage.rows = len(clean_df)
+
+        with measure(summary, "load") as stage:
+            _merge(settings, engine, clean_df, summary)
+            stage.rows = len(clean_df)
+        _write_sink(settings, summary, clean_df, replace=False)
+        _save_watermark(
+            summary, engine, _later(watermark, summary.watermark), end_states
+        )
 
     except FileNotFoundError as e:
         log.error(f"PIPELINE FAILED — file not found: {e}")
@@ -110,11 +173,334 @@ def run_incremental_pipeline(settings: Settings) -> None:
         log.error(f"PIPELINE FAILED — {type(e).__name__}: {e}")
         raise
 
+    return _complete(mode, summary, settings)
+
+
+def _run_full(
+    settings: Settings, summary: RunSummary, jobs: list[ExtractJob] | None = None
+) -> None:
+    if jobs is None:
+        jobs = [(path, None, None, None) for path in resolve_sources(settings.csv_path)]
+
+    if settings.stream_chunk_rows:
+        _load_full_streaming(settings, summary, jobs)
+        return
+
+    with measure(summary, "extract") as stage:
+        raw_df = _extract_jobs(settings, jobs)
+        stage.rows = summary.rows_in = len(raw_df)
+
+    with measure(summary, "validate_raw") as stage:
+        validate_raw(
+            raw_df, action=settings.ge_action, backend=settings.validation_backend
+        )
+        stage.rows = len(raw_df)
+
+    with measure(summary, "transform") as stage:
+        clean_df = parallel_transform(raw_df, workers=settings.transform_workers)
+        stage.rows = len(raw_df)
+    summary.rows_out = len(clean_df)
+    summary.watermark = _max_watermark([clean_df])
+
+    with measure(summary, "validate_clean") as stage:
+        validate_clean(
+            clean_df, action=settings.ge_action, backend=settings.validation_backend
+        )
+        stage.rows = len(clean_df)
+
+    with measure(summary, "load") as stage:
+        engine = _engine(settings)
+        verify_connection(engine)
+        load(
+            clean_df,
+            engine,
+            settings.table_name,
+            method=settings.load_method,
+            partitioned=settings.partition_by_month,
+        )
+        stage.rows = len(clean_df)
+    _write_sink(settings, summary, clean_df, replace=True)
+
+
+def _load_full_streaming(
+    settings: Settings, summary: RunSummary, jobs: list[ExtractJob]
+) -> None:
+    engine = _engine(settings)
+    verify_connection(engine)
+
+    report = ChunkedReport()
+    try:
+        # Extract, validate and transform run lazily inside the load loop,
+        # so the streamed stages are measured as one.
+        with measure(summary, "stream") as stage:
+            load_chunks(
+                _sink_chunks(_stream_clean(settings, report, summary, jobs), settings),
+                engine,
+                settings.table_name,
+                method=settings.load_method,
+                partitioned=settings.partition_by_month,
+            )
+            stage.rows = summary.rows_in
+    finally:
+        report.write()
+
+
+def _load_incremental_streaming(
+    settings: Settings,
+    engine: Engine,
+    jobs: list[ExtractJob],
+    summary: RunSummary,
+) -> None:
+    report = ChunkedReport()
+    try:
+        with measure(summary, "stream") as stage:
+            clean_chunks = _stream_clean(
+                settings, report, summary, jobs, upsert=settings.load_mode == "upsert"
+            )
+            for clean_df in _sink_chunks(clean_chunks, settings, append=True):
+                _merge(settings, engine, clean_df, summary)
+            stage.rows = summary.rows_in
+    finally:
+        report.write()
+
+
+def _stream_clean(
+    settings: Settings,
+    report: ChunkedReport,
+    summary: RunSummary,
+    jobs: list[ExtractJob],
+    upsert: bool = False,
+) -> Iterator[pd.DataFrame]:
+    raw_chunks = chain.from_iterable(
+        extract_chunks(
+            path,
+            settings.stream_chunk_rows,
+            since=since,
+            resume_from=resume_from,
+            until=until,
+        )
+        for path, since, resume_from, until in jobs
+    )
+    validated = _validated_raw(raw_chunks, settings, report, summary)
+    for clean_df in transform_chunks(validated):
+        if clean_df.empty:
+            continue
+        validate_clean(
+            clean_df,
+            action=settings.ge_action,
+            report=report,
+            backend=settings.validation_backend,
+            upsert=upsert,
+        )
+        summary.rows_out += len(clean_df)
+        summary.watermark = _max_watermark([clean_df], summary.watermark)
+        yield clean_df
+
+
+def _validated_raw(
+    chunks: Iterable[pd.DataFrame],
+    settings: Settings,
+    report: ChunkedReport,
+    summary: RunSummary,
+) -> Iterator[pd.DataFrame]:
+    for raw_df in chunks:
+        summary.rows_in += len(raw_df)
+        validate_raw(
+            raw_df,
+            action=settings.ge_action,
+            report=report,
+            backend=settings.validation_backend,
+        )
+        yield raw_df
+
+
+def _extract_jobs(settings: Settings, jobs: list[ExtractJob]) -> pd.DataFrame:
+    if not jobs:
+        log.info("Every source file is unchanged since the last run.")
+        return pd.DataFrame(columns=sorted(EXPECTED_COLUMNS))
+
+    if len(jobs) == 1:
+        path, since, resume_from, until = jobs[0]
+        return extract(
+            path,
+            since=since,
+            resume_from=resume_from,
+            engine=settings.csv_engine,
+            until=until,
+        )
+
+    frames = extract_files(
+        jobs, engine=settings.csv_engine, workers=settings.extract_workers
+    )
+    df = pd.concat(frames, ignore_index=True)
+    log.info(f"Extracted {len(df)} rows from {len(jobs)} files.")
+    return df
+
+
+def _pending_jobs(
+    snapshots: dict[Path, FileState | None],
+    stored: dict[str, FileState],
+    watermark: datetime,
+    filter_dates: bool = True,
+) -> list[ExtractJob]:
+    # Once any file has recorded state, a file without state is new (e.g. a
+    # store's late drop) and is read in full; ON CONFLICT absorbs overlaps.
+    # Sources with no state at all fall back to the order_date watermark.
+    # Upserts never filter on date: a correction keeps its original
+    # order_date, which is usually behind the watermark.
+    tracked = bool(stored)
+    jobs = []
+    for path, snapshot in snapshots.items():
+        state = stored.get(snapshot.path) if snapshot is not None else None
+        if state is not None and state == snapshot:
+            continue
+        dated = state is not None or not tracked
+        since = watermark if filter_dates and dated else None
+        jobs.append((path, since, state, snapshot))
+
+    skipped = len(snapshots) - len(jobs)
+    if skipped:
+        log.info(f"Skipping {skipped} unchanged files; {len(jobs)} to extract.")
+    return jobs
+
+
+def _write_sink(
+    settings: Settings, summary: RunSummary, clean_df: pd.DataFrame, replace: bool
+) -> None:
+    if settings.parquet_sink_dir is None:
+        return
+    with measure(summary, "parquet_sink") as stage:
+        if replace:
+            stage.rows = write_parquet_sink(
+                clean_df, settings.parquet_sink_dir, replace=True
+            )
+        else:
+            stage.rows = _merge_sink(settings, clean_df)
+
+
+def _sink_chunks(
+    chunks: Iterable[pd.DataFrame], settings: Settings, append: bool = False
+) -> Iterator[pd.DataFrame]:
+    # Each chunk reaches the sink only once the loader has asked for the next
+    # one, i.e. after it has been committed to Postgres.
+    for i, clean_df in enumerate(chunks):
+        yield clean_df
+        if settings.parquet_sink_dir is None:
+            continue
+        if append:
+            _merge_sink(settings, clean_df)
+        else:
+            write_parquet_sink(clean_df, settings.parquet_sink_dir, replace=i == 0)
+
+
+def _merge_sink(settings: Settings, clean_df: pd.DataFrame) -> int:
+    # Keyed and resolved like the Postgres merge: an upsert's batch replaces
+    # the stored row, an incremental load keeps the row already there.
+    key = (
+        ["order_id", PARTITION_COLUMN] if settings.partition_by_month else ["order_id"]
+    )
+    return merge_parquet_sink(
+        clean_df,
+        settings.parquet_sink_dir,
+        key=key,
+        keep="last" if settings.load_mode == "upsert" else "first",
+    )
+
+
+def _save_watermark(
+    summary: RunSummary,
+    engine: Engine,
+    watermark: datetime,
+    file_states: list[FileState],
+) -> None:
+    with measure(summary, "save_watermark"):
+        save_watermark(engine, watermark, file_states=file_states)
+
+
+def _log_start(mode: str, settings: Settings) -> None:
     log.info(_SEP)
-    log.info("PIPELINE COMPLETE  [mode: incremental]")
+    log.info(f"PIPELINE START  [mode: {mode}]")
+    log.info(f"Source : {settings.csv_path}")
+    log.info(
+        f"Target : {settings.db_host}:{settings.db_port}/{settings.db_name} -> {settings.table_name}"
+    )
     log.info(_SEP)
 
 
+def _complete(label: str, summary: RunSummary, settings: Settings) -> RunSummary:
+    timings = ", ".join(f"{name} {secs:.2f}s" for name, secs in summary.timings.items())
+    log.info(_SEP)
+    log.info(f"PIPELINE COMPLETE  [mode: {label}]")
+    log.info(f"Rows   : {summary.rows_out}/{summary.rows_in} clean")
+    if summary.merged:
+        log.info(
+            "Merged : "
+            + ", ".join(f"{value} {name}" for name, value in summary.merged.items())
+        )
+    if timings:
+        log.info(f"Timings: {timings}")
+    log.info(_SEP)
+
+    write_metrics(summary)
+    if settings.persist_metrics:
+        # Metrics are diagnostics; failing to store them must not fail a run
+        # whose data has already been committed.
+        try:
+            save_run_metrics(_engine(settings), summary)
+        except SQLAlchemyError as e:
+            log.warning(f"Could not save run metrics: {e}")
+    return summary
+
+
+def _merge(
+    settings: Settings, engine: Engine, clean_df: pd.DataFrame, summary: RunSummary
+) -> None:
+    if settings.load_mode != "upsert":
+        load_incremental(
+            clean_df,
+            engine,
+            settings.table_name,
+            method=settings.load_method,
+            partitioned=settings.partition_by_month,
+        )
+        return
+
+    counts = load_upsert(
+        clean_df,
+        engine,
+        settings.table_name,
+        method=settings.load_method,
+        partitioned=settings.partition_by_month,
+    )
+    for name, value in counts.as_dict().items():
+        summary.merged[name] = summary.merged.get(name, 0) + value
+
+
+def _engine(settings: Settings) -> Engine:
+    # Pooled and cached per URL in load.py, so every stage shares one engine.
+    return get_engine(settings.database_url, **settings.pool_options)
+
+
+def _max_watermark(
+    chunks: Iterable[pd.DataFrame], current: datetime | None = None
+) -> datetime | None:
+    for df in chunks:
+        if df.empty:
+            continue
+        chunk_max = df[WATERMARK_COLUMN].max()
+        current = chunk_max if current is None else max(current, chunk_max)
+    return current
+
+
+def _later(watermark: datetime, candidate: datetime) -> datetime:
+    # Rows resumed from a byte offset aren't date-filtered, so a late-arriving
+    # batch must never move the watermark backwards.
+    candidate_utc = pd.Timestamp(candidate)
+    if candidate_utc.tzinfo is None:
+        candidate_utc = candidate_utc.tz_localize("UTC")
+    return candidate if candidate_utc > watermark else watermark
+
+
 if __name__ == "__main__":
     try:
         settings = Settings()
@@ -125,9 +511,11 @@ if __name__ == "__main__":
     log.info(f"Configuration loaded: {settings}")
 
     try:
-        if settings.load_mode == "incremental":
+        if settings.load_mode in {"incremental", "upsert"}:
             run_incremental_pipeline(settings)
         else:
             run_pipeline(settings)
     except Exception:
         sys.exit(1)
+    finally:
+        dispose_engines()
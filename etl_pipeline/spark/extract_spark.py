@@ -1,9 +1,22 @@
+import csv
+from collections.abc import Iterator
 from datetime import datetime
 from pathlib import Path
 
-from pyspark.sql import DataFrame, SparkSession
+from pyspark import RDD
+from pyspark.sql import DataFrame, DataFrameReader, SparkSession
 from pyspark.sql.functions import col, lit, to_date
+from pyspark.sql.streaming import DataStreamReader
+from pyspark.sql.types import (
+    DateType,
+    DoubleType,
+    IntegerType,
+    StringType,
+    StructField,
+    StructType,
+)
 
+from extract import GLOB_CHARS
 from logger import get_logger
 
 log = get_logger(__name__)
@@ -20,45 +33,148 @@ EXPECTED_COLUMNS = frozenset(
     }
 )
 
+# Declared types for the sales columns, so the CSV is parsed once at read time
+# instead of read as strings and cast afterwards. order_id stays a string, as
+# it always has been in the Spark pipeline.
+COLUMN_TYPES = {
+    "order_id": StringType(),
+    "customer_name": StringType(),
+    "product": StringType(),
+    "quantity": IntegerType(),
+    "unit_price": DoubleType(),
+    "order_date": DateType(),
+    "region": StringType(),
+}
+CORRUPT_RECORD_COLUMN = "_corrupt_record"
+
+# Hadoop decodes .gz and .bz2 by suffix as it reads. Spark ships no codec for
+# .xz, and .zst needs a native libhadoop, so those are decompressed as a
+# stream on the executors instead.
+EXECUTOR_CODECS: dict[str, str] = {".zst": "zstd", ".xz": "xz"}
+
 
 def extract(
-    spark: SparkSession, csv_path: Path, since: datetime | None = None
+    spark: SparkSession,
+    csv_path: Path,
+    since: datetime | None = None,
+    partitions: int = 0,
 ) -> DataFrame:
     if not csv_path.exists():
         raise FileNotFoundError(
             f"CSV file not found at '{csv_path}'. Check CSV_PATH in your .env file."
         )
 
-    df = (
-        spark.read.option("header", True)
-        .option("inferSchema", False)
-        .csv(str(csv_path))
-    )
+    # Reading the header only touches the first line. The schema is built in
+    # the header's column order, since Spark applies it by position.
+    codec = EXECUTOR_CODECS.get(csv_path.suffix.lower())
+    if codec is None:
+        source = str(csv_path)
+        header = spark.read.option("header", True).csv(source).columns
+    else:
+        source = _decompressed_lines(spark, csv_path, codec)
+        # first() stops decompressing after one line, rather than handing
+        # the RDD to the CSV reader for a header probe of its own.
+        header = next(csv.reader([source.first()]))
+    _validate_columns(header, csv_path)
 
-    log.info(f"Loaded {df.count()} rows x {len(df.columns)} columns from {csv_path}")
+    df = _typed(spark.read, header).csv(source)
 
-    _validate_columns(df, csv_path)
+    # No count here: it would be a full scan of its own. Row counts come from
+    # transform's single counting pass.
+    log.info(f"Reading {len(header)} columns from {csv_path}")
 
     if since is not None:
         df = _filter_since(df, since)
 
+    if partitions:
+        # Hash-partitioning on order_date also satisfies transform's
+        # groupBy over every column, so its dedup needs no second shuffle.
+        df = df.repartition(partitions, "order_date")
+        log.info(f"Repartitioned into {partitions} partitions by order_date.")
+
     return df
 
 
+def extract_stream(
+    spark: SparkSession, source: Path, max_files_per_trigger: int = 0
+) -> DataFrame:
+    # A file stream watches a directory (or glob) and picks up each new file
+    # once; a single CSV has nothing to watch.
+    if not (source.is_dir() or GLOB_CHARS & set(str(source))):
+        raise ValueError(
+            f"Streaming needs a directory or glob of CSVs, got '{source}'. Check CSV_PATH in your .env file."
+        )
+
+    # The schema has to be known before any file arrives, so it's the standard
+    # column order. With enforceSchema off, a file whose header doesn't match
+    # fails the batch instead of loading values into the wrong columns.
+    reader = _typed(spark.readStream, list(COLUMN_TYPES)).option("enforceSchema", False)
+    if max_files_per_trigger:
+        reader = reader.option("maxFilesPerTrigger", max_files_per_trigger)
+
+    log.info(f"Watching {source} for new CSV files.")
+    return reader.csv(str(source))
+
+
+def _typed(
+    reader: DataFrameReader | DataStreamReader, header: list[str]
+) -> DataFrameReader | DataStreamReader:
+    # PERMISSIVE sets a value that doesn't parse as its declared type to null
+    # and keeps the raw line in the corrupt-record column, so transform can
+    # count malformed rows without parsing them again.
+    return (
+        reader.option("header", True)
+        .option("mode", "PERMISSIVE")
+        .option("dateFormat", "yyyy-MM-dd")
+        .option("columnNameOfCorruptRecord", CORRUPT_RECORD_COLUMN)
+        .schema(_schema(header))
+    )
+
+
+def _schema(header: list[str]) -> StructType:
+    return StructType(
+        [StructField(name, COLUMN_TYPES.get(name, StringType())) for name in header]
+        + [StructField(CORRUPT_RECORD_COLUMN, StringType())]
+    )
+
+
+def _decompressed_lines(spark: SparkSession, csv_path: Path, codec: str) -> RDD:
+    # The executor opens the file itself and yields its lines as they're
+    # decompressed, so neither the compressed nor the decompressed file has
+    # to fit in memory. The path has to be readable by the executors at the
+    # same location, as for any local CSV. The helper is nested so it's
+    # pickled by value and executors don't need this module on their path.
+    def lines(path: str) -> Iterator[str]:
+        if codec == "zstd":
+            import zstandard
+
+            opener = zstandard.open
+        else:
+            import lzma
+
+            opener = lzma.open
+        with opener(path, "rt", encoding="utf-8", newline="") as text:
+            for line in text:
+                yield line.rstrip("\r\n")
+
+    log.info(f"Decompressing {csv_path} ({codec}) on the executors.")
+    # A compressed stream can't be split, so the file is one task either way.
+    return spark.sparkContext.parallelize([str(csv_path.resolve())], 1).flatMap(lines)
+
+
 def _filter_since(df: DataFrame, since: datetime) -> DataFrame:
-    before = df.count()
     since_str = since.date().isoformat()
-    df = df.filter(to_date(col("order_date"), "yyyy-MM-dd") > lit(since_str))
-    after = df.count()
-    log.info(
-        f"Watermark filter (order_date > {since_str}): {before - after} excluded, {after} remaining."
-    )
+    order_date = col("order_date")
+    if isinstance(df.schema["order_date"].dataType, StringType):
+        order_date = to_date(order_date, "yyyy-MM-dd")
+    df = df.filter(order_date > lit(since_str).cast("date"))
+    log.info(f"Watermark filter: order_date > {since_str}")
     return df
 
 
-def _validate_columns(df: DataFrame, csv_path: Path) -> None:
-    missing = EXPECTED_COLUMNS - frozenset(df.columns)
+def _validate_columns(columns: list[str], csv_path: Path) -> None:
+    missing = EXPECTED_COLUMNS - frozenset(columns)
     if missing:
         raise ValueError(
-            f"CSV at '{csv_path}' is missing columns: {sorted(missing)}. Found: {sorted(df.columns)}"
+            f"CSV at '{csv_path}' is missing columns: {sorted(missing)}. Found: {sorted(columns)}"
         )
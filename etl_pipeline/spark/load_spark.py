@@ -1,18 +1,26 @@
-from datetime import datetime, timezone
+from collections.abc import Callable
+from typing import TypeVar
+from uuid import uuid4
 
 from pyspark.sql import DataFrame
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import SQLAlchemyError
 
 from load import (
-    PIPELINE_NAME,
-    WATERMARK_COLUMN,
-    get_engine,
-    get_watermark,
-    save_watermark,
+    ROW_HASH_COLUMN,
+    UNHASHED_COLUMNS,
+    MergeCounts,
+    _finalize_table,
+    _shadow_name,
+    _swap_in,
 )
 from logger import get_logger
 
 log = get_logger(__name__)
 
+T = TypeVar("T")
+
 
 def get_jdbc_url(db_host: str, db_port: int, db_name: str) -> str:
     return f"jdbc:postgresql://{db_host}:{db_port}/{db_name}"
@@ -24,20 +32,27 @@ def load(
     table_name: str,
     db_user: str,
     db_password: str,
+    engine: Engine,
+    rows: int | None = None,
+    **write_options,
 ) -> None:
-    count = df.count()
-    log.info(f"Full load: writing {count} rows to '{table_name}' via JDBC...")
+    shadow = _shadow_name(table_name)
+    # Callers that already counted the frame pass the count in, which saves a
+    # job over the whole lineage.
+    count = df.count() if rows is None else rows
+    log.info(f"Full load: writing {count} rows to '{shadow}' via JDBC...")
 
-    (
-        df.write.format("jdbc")
-        .option("url", jdbc_url)
-        .option("dbtable", table_name)
-        .option("user", db_user)
-        .option("password", db_password)
-        .option("driver", "org.postgresql.Driver")
-        .mode("overwrite")
-        .save()
-    )
+    _write(df, jdbc_url, shadow, db_user, db_password, "overwrite", **write_options)
+
+    # Same finish as the pandas full load: the unique key that incremental
+    # merges conflict on, a row count check, then a swap readers never see
+    # half of.
+    try:
+        with engine.begin() as conn:
+            _finalize_table(conn, shadow, column="order_id", expected=count)
+            _swap_in(conn, shadow, table_name, column="order_id")
+    except SQLAlchemyError as e:
+        raise SQLAlchemyError(f"Full load failed for '{table_name}': {e}") from e
 
     log.info(f"Full load complete: {count} rows written to '{table_name}'.")
 
@@ -48,23 +63,184 @@ def load_incremental(
     table_name: str,
     db_user: str,
     db_password: str,
-) -> None:
-    if df.count() == 0:
+    engine: Engine,
+    rows: int | None = None,
+    **write_options,
+) -> int:
+    count = df.count() if rows is None else rows
+    if count == 0:
         log.info("No new rows to load.")
-        return
+        return 0
+
+    log.info(f"Incremental load: staging {count} rows via JDBC...")
+    columns = ", ".join(f'"{c}"' for c in df.columns)
+
+    def merge(conn: Connection, staging: str) -> int:
+        return conn.execute(
+            text(f"""
+            INSERT INTO "{table_name}" ({columns})
+            SELECT {columns} FROM "{staging}"
+            ON CONFLICT (order_id) DO NOTHING
+        """)
+        ).rowcount
+
+    try:
+        inserted = _merge_from_staging(
+            df, jdbc_url, table_name, db_user, db_password, engine, merge, write_options
+        )
+    except SQLAlchemyError as e:
+        raise SQLAlchemyError(f"Incremental load failed for '{table_name}': {e}") from e
+
+    log.info(
+        f"Incremental load complete: {inserted} inserted, {count - inserted} skipped."
+    )
+    return inserted
+
+
+def load_upsert(
+    df: DataFrame,
+    jdbc_url: str,
+    table_name: str,
+    db_user: str,
+    db_password: str,
+    engine: Engine,
+    **write_options,
+) -> MergeCounts:
+    # ON CONFLICT DO UPDATE can't touch a row twice in one statement. Unlike
+    # the pandas path there's no read order to go by, so which version of a
+    # repeated order survives within one batch is arbitrary.
+    df = df.dropDuplicates(["order_id"])
+    if df.isEmpty():
+        log.info("No rows to upsert.")
+        return MergeCounts()
+
+    log.info(f"Upsert: staging rows for '{table_name}' via JDBC...")
+    columns = ", ".join(f'"{c}"' for c in df.columns)
+    content = [c for c in df.columns if c not in {"order_id"} | UNHASHED_COLUMNS]
+    updates = ", ".join(
+        f'"{c}" = EXCLUDED."{c}"' for c in df.columns if c != "order_id"
+    )
+    # No row_hash from Spark, so the content columns are compared directly;
+    # an identical row is still left alone and costs no new row version.
+    current = ", ".join(f'target."{c}"' for c in content)
+    incoming = ", ".join(f'EXCLUDED."{c}"' for c in content)
+
+    def merge(conn: Connection, staging: str) -> MergeCounts:
+        # A table the pandas loader built keeps a row_hash per row. Spark
+        # can't reproduce that hash, so a rewritten row gets NULL instead of
+        # keeping the old content's hash; the next pandas upsert then treats
+        # it as changed rather than matching it against the stale hash.
+        set_clause = updates
+        if ROW_HASH_COLUMN not in df.columns and _has_column(
+            conn, table_name, ROW_HASH_COLUMN
+        ):
+            set_clause += f', "{ROW_HASH_COLUMN}" = NULL'
+        inserted, updated, staged = conn.execute(
+            text(f"""
+            WITH merged AS (
+                INSERT INTO "{table_name}" AS target ({columns})
+                SELECT {columns} FROM "{staging}"
+                ON CONFLICT (order_id) DO UPDATE SET {set_clause}
+                WHERE ({current}) IS DISTINCT FROM ({incoming})
+                RETURNING (xmax = 0) AS inserted
+            )
+            SELECT
+                COUNT(*) FILTER (WHERE inserted),
+                COUNT(*) FILTER (WHERE NOT inserted),
+                (SELECT COUNT(*) FROM "{staging}")
+            FROM merged
+        """)
+        ).one()
+        return MergeCounts(inserted, updated, staged - inserted - updated)
+
+    try:
+        counts = _merge_from_staging(
+            df, jdbc_url, table_name, db_user, db_password, engine, merge, write_options
+        )
+    except SQLAlchemyError as e:
+        raise SQLAlchemyError(f"Upsert failed for '{table_name}': {e}") from e
+
+    log.info(
+        f"Upsert complete: {counts.inserted} inserted, {counts.updated} updated, {counts.unchanged} unchanged."
+    )
+    return counts
+
+
+def _has_column(conn: Connection, table_name: str, column: str) -> bool:
+    return (
+        conn.execute(
+            text("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = current_schema()
+              AND table_name = :table AND column_name = :column
+        """),
+            {"table": table_name, "column": column},
+        ).first()
+        is not None
+    )
 
-    count = df.count()
-    log.info(f"Incremental load: appending {count} rows to '{table_name}' via JDBC...")
 
-    (
+def _merge_from_staging(
+    df: DataFrame,
+    jdbc_url: str,
+    table_name: str,
+    db_user: str,
+    db_password: str,
+    engine: Engine,
+    merge: Callable[[Connection, str], T],
+    write_options: dict,
+) -> T:
+    # Executors write over their own connections, so the staging table can't
+    # be TEMP as in the pandas path. A per-run name keeps concurrent runs apart,
+    # and UNLOGGED skips the WAL for rows that only live until the merge.
+    staging = f"{table_name}_staging_{uuid4().hex[:8]}"
+    try:
+        with engine.begin() as conn:
+            conn.execute(
+                text(f"""
+                CREATE UNLOGGED TABLE "{staging}"
+                (LIKE "{table_name}" INCLUDING DEFAULTS)
+            """)
+            )
+        _write(df, jdbc_url, staging, db_user, db_password, "append", **write_options)
+        with engine.begin() as conn:
+            return merge(conn, staging)
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f'DROP TABLE IF EXISTS "{staging}"'))
+
+
+def _write(
+    df: DataFrame,
+    jdbc_url: str,
+    table_name: str,
+    db_user: str,
+    db_password: str,
+    mode: str,
+    num_partitions: int = 0,
+    batch_size: int = 10_000,
+    isolation_level: str = "READ_COMMITTED",
+    rewrite_batched_inserts: bool = True,
+) -> None:
+    # Each partition is written by one task over its own connection, in its
+    # own transaction. numPartitions caps that at the given count by
+    # coalescing; a frame with fewer partitions is spread out to match.
+    if num_partitions and df.rdd.getNumPartitions() < num_partitions:
+        df = df.repartition(num_partitions)
+
+    writer = (
         df.write.format("jdbc")
         .option("url", jdbc_url)
         .option("dbtable", table_name)
         .option("user", db_user)
         .option("password", db_password)
         .option("driver", "org.postgresql.Driver")
-        .mode("append")
-        .save()
+        .option("batchsize", batch_size)
+        .option("isolationLevel", isolation_level)
+        # Passed through to the PostgreSQL driver, which folds each batch into
+        # multi-row INSERTs instead of sending one statement per row.
+        .option("reWriteBatchedInserts", str(rewrite_batched_inserts).lower())
     )
-
-    log.info(f"Incremental load complete: {count} rows appended.")
+    if num_partitions:
+        writer = writer.option("numPartitions", num_partitions)
+    writer.mode(mode).save()
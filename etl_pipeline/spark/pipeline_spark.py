@@ -1,35 +1,46 @@
+import argparse
 import sys
+from datetime import date, datetime, time, timezone
 
-from pyspark.sql import SparkSession
+from pyspark.sql import DataFrame, SparkSession
+from sqlalchemy.engine import Engine
 
 from config import Settings
 from load import (
-    WATERMARK_COLUMN,
+    dispose_engines,
     get_engine,
     get_watermark,
     save_watermark,
     verify_connection,
 )
 from logger import get_logger
-from spark.extract_spark import extract
-from spark.load_spark import get_jdbc_url, load, load_incremental
-from spark.transform_spark import transform
+from spark.extract_spark import extract, extract_stream
+from spark.load_spark import get_jdbc_url, load, load_incremental, load_upsert
+from spark.transform_spark import TransformCounts, transform_with_counts
 
 log = get_logger(__name__)
 
 _SEP = "=" * 60
 
 
-def get_spark(app_name: str = "etl-csv-to-postgres") -> SparkSession:
-    return (
+def get_spark(
+    app_name: str = "etl-csv-to-postgres", max_partition_bytes: int = 0
+) -> SparkSession:
+    builder = (
         SparkSession.builder.appName(app_name)
         .config("spark.jars.packages", "org.postgresql:postgresql:42.7.3")
         .config("spark.sql.session.timeZone", "UTC")
-        .getOrCreate()
     )
+    if max_partition_bytes:
+        # Smaller splits give large files more read tasks than Spark's 128 MB
+        # default, so they spread across every executor core.
+        builder = builder.config(
+            "spark.sql.files.maxPartitionBytes", str(max_partition_bytes)
+        )
+    return builder.getOrCreate()
 
 
-def run_pipeline(settings: Settings, spark: SparkSession) -> None:
+def run_pipeline(settings: Settings, spark: SparkSession) -> TransformCounts:
     log.info(_SEP)
     log.info("SPARK PIPELINE START  [mode: full]")
     log.info(f"Source : {settings.csv_path}")
@@ -39,17 +50,24 @@ def run_pipeline(settings: Settings, spark: SparkSession) -> None:
     log.info(_SEP)
 
     try:
-        raw_df = extract(spark, settings.csv_path)
-        clean_df = transform(raw_df)
+        raw_df = extract(spark, settings.csv_path, partitions=settings.spark_partitions)
+        clean_df, counts, cached = transform_with_counts(raw_df)
 
         jdbc_url = get_jdbc_url(settings.db_host, settings.db_port, settings.db_name)
-        load(
-            clean_df,
-            jdbc_url,
-            settings.table_name,
-            settings.db_user,
-            settings.db_password,
-        )
+        try:
+            load(
+                clean_df,
+                jdbc_url,
+                settings.table_name,
+                settings.db_user,
+                settings.db_password,
+                get_engine(settings.database_url, **settings.pool_options),
+                rows=counts.rows_out,
+                **settings.jdbc_options,
+            )
+        finally:
+            cached.unpersist()
+        log.info(f"Rows   : {counts.rows_out}/{counts.rows_in} clean")
 
     except FileNotFoundError as e:
         log.error(f"SPARK PIPELINE FAILED — file not found: {e}")
@@ -61,6 +79,7 @@ def run_pipeline(settings: Settings, spark: SparkSession) -> None:
     log.info(_SEP)
     log.info("SPARK PIPELINE COMPLETE  [mode: full]")
     log.info(_SEP)
+    return counts
 
 
 def run_incremental_pipeline(settings: Settings, spark: SparkSession) -> None:
@@ -73,7 +92,7 @@ def run_incremental_pipeline(settings: Settings, spark: SparkSession) -> None:
     log.info(_SEP)
 
     try:
-        engine = get_engine(settings.database_url)
+        engine = get_engine(settings.database_url, **settings.pool_options)
         verify_connection(engine)
         watermark = get_watermark(engine)
 
@@ -81,40 +100,50 @@ def run_incremental_pipeline(settings: Settings, spark: SparkSession) -> None:
 
         if watermark is None:
             log.info("No watermark — bootstrapping with full load.")
-            run_pipeline(settings, spark)
-            clean_df = transform(extract(spark, settings.csv_path))
-            max_date = clean_df.agg({WATERMARK_COLUMN: "max"}).collect()[0][0]
-            save_watermark(engine, max_date)
+            # The full load's transform already found the latest date, so the
+            # bootstrap reads and cleans the CSV once.
+            counts = run_pipeline(settings, spark)
+            _save_watermark(engine, counts.latest_order_date)
             return
 
-        raw_df = extract(spark, settings.csv_path, since=watermark)
+        raw_df = extract(
+            spark,
+            settings.csv_path,
+            since=watermark,
+            partitions=settings.spark_partitions,
+        )
+        clean_df, counts, cached = transform_with_counts(raw_df)
 
-        if raw_df.count() == 0:
+        if counts.rows_in == 0:
+            cached.unpersist()
             log.info("No new rows since last run.")
             log.info(_SEP)
             log.info("SPARK PIPELINE COMPLETE  [mode: incremental — no new data]")
             log.info(_SEP)
             return
 
-        clean_df = transform(raw_df)
-
-        if clean_df.count() == 0:
+        if counts.rows_out == 0:
+            cached.unpersist()
             log.info("All new rows filtered by transform — nothing to load.")
             log.info(_SEP)
             log.info("SPARK PIPELINE COMPLETE  [mode: incremental — all rows invalid]")
             log.info(_SEP)
             return
 
-        load_incremental(
-            clean_df,
-            jdbc_url,
-            settings.table_name,
-            settings.db_user,
-            settings.db_password,
-        )
-
-        max_date = clean_df.agg({WATERMARK_COLUMN: "max"}).collect()[0][0]
-        save_watermark(engine, max_date)
+        try:
+            load_incremental(
+                clean_df,
+                jdbc_url,
+                settings.table_name,
+                settings.db_user,
+                settings.db_password,
+                engine,
+                rows=counts.rows_out,
+                **settings.jdbc_options,
+            )
+        finally:
+            cached.unpersist()
+        _save_watermark(engine, counts.latest_order_date)
 
     except FileNotFoundError as e:
         log.error(f"SPARK PIPELINE FAILED — file not found: {e}")
@@ -128,7 +157,84 @@ def run_incremental_pipeline(settings: Settings, spark: SparkSession) -> None:
     log.info(_SEP)
 
 
+def run_streaming_pipeline(settings: Settings, spark: SparkSession) -> None:
+    log.info(_SEP)
+    log.info("SPARK PIPELINE START  [mode: stream]")
+    log.info(f"Source : {settings.csv_path}")
+    log.info(
+        f"Target : {settings.db_host}:{settings.db_port}/{settings.db_name} -> {settings.table_name}"
+    )
+    log.info(_SEP)
+
+    try:
+        engine = get_engine(settings.database_url, **settings.pool_options)
+        verify_connection(engine)
+        jdbc_url = get_jdbc_url(settings.db_host, settings.db_port, settings.db_name)
+
+        # Runs on the driver once per micro-batch. Spark may replay a batch
+        # after a crash; the upsert leaves rows it already wrote unchanged,
+        # so a replay is harmless.
+        def upsert_batch(batch_df: DataFrame, batch_id: int) -> None:
+            clean_df, counts, cached = transform_with_counts(batch_df)
+            try:
+                log.info(f"Batch {batch_id}: {counts.rows_out}/{counts.rows_in} clean")
+                if counts.rows_out:
+                    load_upsert(
+                        clean_df,
+                        jdbc_url,
+                        settings.table_name,
+                        settings.db_user,
+                        settings.db_password,
+                        engine,
+                        **settings.jdbc_options,
+                    )
+            finally:
+                # transform persists each batch; without this a long-running
+                # stream would keep every batch it has seen cached.
+                cached.unpersist()
+
+        # The checkpoint records which files have been processed, so a
+        # restarted stream picks up where it stopped instead of starting over.
+        query = (
+            extract_stream(
+                spark, settings.csv_path, settings.spark_max_files_per_trigger
+            )
+            .writeStream.foreachBatch(upsert_batch)
+            .option("checkpointLocation", str(settings.spark_checkpoint_dir))
+            .trigger(processingTime=f"{settings.spark_trigger_seconds} seconds")
+            .queryName("sales-stream")
+            .start()
+        )
+        log.info(
+            f"Streaming every {settings.spark_trigger_seconds}s, checkpoint: {settings.spark_checkpoint_dir}"
+        )
+        query.awaitTermination()
+
+    except Exception as e:
+        log.error(f"SPARK PIPELINE FAILED — {type(e).__name__}: {e}")
+        raise
+
+    log.info(_SEP)
+    log.info("SPARK PIPELINE COMPLETE  [mode: stream]")
+    log.info(_SEP)
+
+
+def _save_watermark(engine: Engine, latest: date | None) -> None:
+    if latest is None:
+        log.info("No valid rows — watermark left unset.")
+        return
+    save_watermark(engine, datetime.combine(latest, time.min, tzinfo=timezone.utc))
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Spark ETL pipeline.")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="watch CSV_PATH and upsert new files as they arrive",
+    )
+    args = parser.parse_args()
+
     try:
         settings = Settings()
     except ValueError as e:
@@ -136,10 +242,21 @@ if __name__ == "__main__":
         sys.exit(1)
 
     log.info(f"Configuration loaded: {settings}")
-    spark = get_spark()
+    if settings.load_mode == "upsert" and not args.stream:
+        log.error("LOAD_MODE=upsert needs the pandas pipeline or --stream.")
+        sys.exit(1)
+    if settings.partition_by_month:
+        # Every Spark load keys on order_id alone: the merges conflict on it
+        # and the full load builds an unpartitioned shadow table, which would
+        # quietly replace a partitioned sales_clean.
+        log.error("PARTITION_BY_MONTH=true needs the pandas pipeline.")
+        sys.exit(1)
+    spark = get_spark(max_partition_bytes=settings.spark_max_partition_bytes)
 
     try:
-        if settings.load_mode == "incremental":
+        if args.stream:
+            run_streaming_pipeline(settings, spark)
+        elif settings.load_mode == "incremental":
             run_incremental_pipeline(settings, spark)
         else:
             run_pipeline(settings, spark)
@@ -147,3 +264,4 @@ if __name__ == "__main__":
         sys.exit(1)
     finally:
         spark.stop()
+        dispose_engines()
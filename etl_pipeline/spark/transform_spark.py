@@ -1,67 +1,156 @@
-from pyspark.sql import DataFrame
+from dataclasses import dataclass
+from datetime import date
+
+from pyspark import StorageLevel
+from pyspark.sql import Column, DataFrame
 from pyspark.sql.functions import (
     col,
+    count,
     current_timestamp,
     initcap,
+    lit,
     to_date,
     trim,
+    when,
+)
+from pyspark.sql.functions import (
+    max as spark_max,
 )
 from pyspark.sql.functions import (
     round as spark_round,
 )
+from pyspark.sql.functions import (
+    sum as spark_sum,
+)
+from pyspark.sql.types import StringType
 
 from logger import get_logger
+from spark.extract_spark import CORRUPT_RECORD_COLUMN
 
 log = get_logger(__name__)
 
 CRITICAL_FIELDS = ["customer_name", "product", "region"]
 NUMERIC_FIELDS = ["quantity", "unit_price"]
+NUMERIC_TYPES = {"quantity": "integer", "unit_price": "double"}
+
+# Internal columns added for the single counting pass and dropped afterwards.
+_COPIES = "_copies"
+_REJECTED = "_rejected_by"
+
+
+@dataclass(frozen=True)
+class TransformCounts:
+    rows_in: int
+    duplicates: int
+    null_critical: int
+    bad_numerics: int
+    bad_dates: int
+    # Rows the CSV reader couldn't parse against the schema. They're already
+    # included in the step counts above, since their bad values read as null.
+    malformed: int = 0
+    # Latest order_date among the clean rows, taken in the same aggregation so
+    # the watermark needs no pass of its own after the load.
+    latest_order_date: date | None = None
+
+    @property
+    def rows_out(self) -> int:
+        return (
+            self.rows_in
+            - self.duplicates
+            - self.null_critical
+            - self.bad_numerics
+            - self.bad_dates
+        )
 
 
 def transform(df: DataFrame) -> DataFrame:
-    original_count = df.count()
+    # Same rows as transform_with_counts, but lazy: nothing is persisted and
+    # no job runs, so there's no cached frame left for the caller to release.
+    columns = [c for c in df.columns if c != CORRUPT_RECORD_COLUMN]
+    return _clean(_tag_rejections(df.dropDuplicates()), columns)
+
+
+def transform_with_counts(
+    df: DataFrame,
+) -> tuple[DataFrame, TransformCounts, DataFrame]:
+    # Every step used to count before and after itself, and each count was a
+    # separate job re-reading the CSV. Instead each distinct row is tagged with
+    # the first step that would drop it, the tagged frame is persisted, and one
+    # aggregation over it yields all the step counts. Loading then reads the
+    # cached rows rather than scanning the source again. The persisted frame
+    # is returned last so the caller can unpersist it once the load is done.
+    columns = [c for c in df.columns if c != CORRUPT_RECORD_COLUMN]
+    tagged = _tag_rejections(
+        df.groupBy(*df.columns).agg(count(lit(1)).alias(_COPIES))
+    ).persist(StorageLevel.MEMORY_AND_DISK)
+
+    malformed = (
+        spark_sum(when(col(CORRUPT_RECORD_COLUMN).isNotNull(), col(_COPIES)))
+        if CORRUPT_RECORD_COLUMN in df.columns
+        else lit(0)
+    )
+    stats = tagged.agg(
+        spark_sum(_COPIES).alias("rows_in"),
+        count(lit(1)).alias("distinct"),
+        *(
+            count(when(col(_REJECTED) == step, 1)).alias(step)
+            for step in ["null_critical", "bad_numerics", "bad_dates"]
+        ),
+        malformed.alias("malformed"),
+        spark_max(when(col(_REJECTED).isNull(), col("order_date"))).alias("latest"),
+    ).first()
+    counts = TransformCounts(
+        rows_in=stats["rows_in"] or 0,
+        duplicates=(stats["rows_in"] or 0) - stats["distinct"],
+        null_critical=stats["null_critical"],
+        bad_numerics=stats["bad_numerics"],
+        bad_dates=stats["bad_dates"],
+        malformed=stats["malformed"] or 0,
+        latest_order_date=stats["latest"],
+    )
+    _log_counts(counts)
+
+    df = _clean(tagged, columns)
+    log.info(f"Transform complete: {counts.rows_out}/{counts.rows_in} rows passed.")
+    return df, counts, tagged
+
 
-    df = _drop_duplicates(df)
-    df = _drop_null_critical_fields(df)
-    df = _validate_numerics(df)
-    df = _validate_dates(df)
+def _clean(tagged: DataFrame, columns: list[str]) -> DataFrame:
+    df = tagged.filter(col(_REJECTED).isNull()).select(*columns)
     df = _standardize_text(df)
     df = _derive_columns(df)
-    df = _add_metadata(df)
-
-    log.info(f"Transform complete: {df.count()}/{original_count} rows passed.")
-    return df
+    return _add_metadata(df)
 
 
-def _drop_duplicates(df: DataFrame) -> DataFrame:
-    before = df.count()
-    df = df.dropDuplicates()
-    _log_removed("drop_duplicates", before, df.count())
-    return df
+def _tag_rejections(df: DataFrame) -> DataFrame:
+    df = _cast_numerics(_parse_dates(df))
+    null_critical = _any_null(CRITICAL_FIELDS)
+    return df.withColumn(
+        _REJECTED,
+        when(null_critical, "null_critical")
+        .when(_any_null(NUMERIC_FIELDS), "bad_numerics")
+        .when(col("order_date").isNull(), "bad_dates"),
+    )
 
 
-def _drop_null_critical_fields(df: DataFrame) -> DataFrame:
-    before = df.count()
-    df = df.na.drop(subset=CRITICAL_FIELDS)
-    _log_removed("drop_null_critical_fields", before, df.count())
-    return df
+def _any_null(fields: list[str]) -> Column:
+    condition = col(fields[0]).isNull()
+    for field in fields[1:]:
+        condition = condition | col(field).isNull()
+    return condition
 
 
-def _validate_numerics(df: DataFrame) -> DataFrame:
-    before = df.count()
-    df = df.withColumn("quantity", col("quantity").cast("integer"))
-    df = df.withColumn("unit_price", col("unit_price").cast("double"))
-    df = df.na.drop(subset=NUMERIC_FIELDS)
-    _log_removed("validate_numerics", before, df.count())
+def _cast_numerics(df: DataFrame) -> DataFrame:
+    for field, spark_type in NUMERIC_TYPES.items():
+        df = df.withColumn(field, col(field).cast(spark_type))
     return df
 
 
-def _validate_dates(df: DataFrame) -> DataFrame:
-    before = df.count()
-    df = df.withColumn("order_date", to_date(col("order_date"), "yyyy-MM-dd"))
-    df = df.na.drop(subset=["order_date"])
-    _log_removed("validate_dates", before, df.count())
-    return df
+def _parse_dates(df: DataFrame) -> DataFrame:
+    # extract already reads order_date as a date; only string input is parsed.
+    if not isinstance(df.schema["order_date"].dataType, StringType):
+        return df
+    return df.withColumn("order_date", to_date(col("order_date"), "yyyy-MM-dd"))
 
 
 def _standardize_text(df: DataFrame) -> DataFrame:
@@ -82,5 +171,19 @@ def _add_metadata(df: DataFrame) -> DataFrame:
     return df
 
 
+def _log_counts(counts: TransformCounts) -> None:
+    remaining = counts.rows_in
+    for step, removed in [
+        ("drop_duplicates", counts.duplicates),
+        ("drop_null_critical_fields", counts.null_critical),
+        ("validate_numerics", counts.bad_numerics),
+        ("validate_dates", counts.bad_dates),
+    ]:
+        remaining -= removed
+        _log_removed(step, remaining + removed, remaining)
+    if counts.malformed:
+        log.info(f"{counts.malformed} rows did not match the CSV schema.")
+
+
 def _log_removed(step: str, before: int, after: int) -> None:
     log.info(f"[{step}] {before - after} rows removed -> {after} remaining.")
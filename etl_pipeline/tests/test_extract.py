@@ -1,10 +1,25 @@
+import bz2
+import gzip
+import lzma
 import textwrap
+from datetime import datetime, timezone
 from pathlib import Path
 
 import pandas as pd
 import pytest
 
-from extract import EXPECTED_COLUMNS, extract
+from extract import (
+    CATEGORICAL_COLUMNS,
+    EXPECTED_COLUMNS,
+    NUMERIC_COLUMNS,
+    FileState,
+    extract,
+    extract_chunks,
+    extract_files,
+    resolve_sources,
+    snapshot_file,
+)
+from load import merge_parquet_sink, write_parquet_sink
 
 
 def write_csv(tmp_path, content):
@@ -53,7 +68,7 @@ class TestExtractColumnValidation:
         with pytest.raises(ValueError, match="region"):
             extract(csv)
 
-    def test_extra_columns_allowed(self, tmp_path):
+    def test_extra_columns_pruned(self, tmp_path):
         csv = write_csv(
             tmp_path,
             """
@@ -62,7 +77,8 @@ class TestExtractColumnValidation:
         """,
         )
         df = extract(csv)
-        assert "extra" in df.columns
+        assert "extra" not in df.columns
+        assert len(df) == 1
 
     def test_expected_columns_constant(self):
         assert EXPECTED_COLUMNS == frozenset(
@@ -102,7 +118,8 @@ class TestExtractSuccess:
         )
         df = extract(csv)
         assert len(df) == 1
-        assert df.iloc[0]["quantity"] == "abc"
+        assert pd.isna(df.iloc[0]["quantity"])
+        assert pd.isna(df.iloc[0]["order_date"])
         assert pd.isna(df.iloc[0]["customer_name"])
 
     def test_multirow_csv(self, tmp_path):
@@ -121,3 +138,307 @@ class TestExtractSuccess:
         csv = write_csv(tmp_path, valid_csv())
         assert isinstance(csv, Path)
         assert len(extract(csv)) == 1
+
+
+class TestExtractSchema:
+    def test_categorical_columns(self, tmp_path):
+        df = extract(write_csv(tmp_path, valid_csv()))
+        for col in CATEGORICAL_COLUMNS:
+            assert isinstance(df[col].dtype, pd.CategoricalDtype)
+
+    def test_numeric_columns(self, tmp_path):
+        df = extract(write_csv(tmp_path, valid_csv()))
+        for col in NUMERIC_COLUMNS:
+            assert pd.api.types.is_numeric_dtype(df[col])
+
+    def test_dates_parsed(self, tmp_path):
+        df = extract(write_csv(tmp_path, valid_csv()))
+        assert pd.api.types.is_datetime64_any_dtype(df["order_date"])
+
+    def test_pyarrow_engine_matches_c_engine(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        csv = write_csv(
+            tmp_path,
+            """
+            order_id,customer_name,product,quantity,unit_price,order_date,region,extra
+            1001,Alice,Laptop,2,999.99,2024-01-15,North,foo
+            1002,,Mouse,abc,29.99,not-a-date,South,bar
+        """,
+        )
+        pd.testing.assert_frame_equal(
+            extract(csv, engine="pyarrow"), extract(csv, engine="c")
+        )
+
+    def test_chunks_use_same_schema(self, tmp_path):
+        csv = write_csv(tmp_path, valid_csv())
+        chunk = next(extract_chunks(csv, chunk_rows=10))
+        pd.testing.assert_series_equal(chunk.dtypes, extract(csv).dtypes)
+
+
+class TestExtractChunks:
+    def _csv(self, tmp_path):
+        return write_csv(
+            tmp_path,
+            """
+            order_id,customer_name,product,quantity,unit_price,order_date,region
+            1001,Alice,Laptop,2,999.99,2024-01-15,North
+            1002,Bob,Mouse,5,29.99,2024-01-16,South
+            1003,Carol,Keyboard,1,79.99,2024-01-17,East
+            1004,Dave,Monitor,1,349.99,2024-01-28,West
+            1005,Eve,Webcam,3,89.99,2024-01-29,North
+        """,
+        )
+
+    def test_yields_bounded_chunks(self, tmp_path):
+        chunks = list(extract_chunks(self._csv(tmp_path), chunk_rows=2))
+        assert [len(c) for c in chunks] == [2, 2, 1]
+
+    def test_chunks_cover_all_rows(self, tmp_path):
+        chunks = list(extract_chunks(self._csv(tmp_path), chunk_rows=2))
+        assert pd.concat(chunks)["order_id"].tolist() == [1001, 1002, 1003, 1004, 1005]
+
+    def test_filters_each_chunk_with_watermark(self, tmp_path):
+        wm = datetime(2024, 1, 20, tzinfo=timezone.utc)
+        chunks = list(extract_chunks(self._csv(tmp_path), chunk_rows=2, since=wm))
+        assert pd.concat(chunks)["order_id"].tolist() == [1004, 1005]
+
+    def test_skips_chunks_emptied_by_watermark(self, tmp_path):
+        wm = datetime(2024, 1, 20, tzinfo=timezone.utc)
+        chunks = list(extract_chunks(self._csv(tmp_path), chunk_rows=2, since=wm))
+        assert all(not c.empty for c in chunks)
+
+    def test_raises_file_not_found(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            list(extract_chunks(tmp_path / "ghost.csv", chunk_rows=2))
+
+    def test_raises_for_missing_column(self, tmp_path):
+        csv = write_csv(
+            tmp_path,
+            """
+            order_id,customer_name,product,quantity,unit_price,order_date
+            1001,Alice,Laptop,2,999.99,2024-01-15
+        """,
+        )
+        with pytest.raises(ValueError, match="region"):
+            list(extract_chunks(csv, chunk_rows=2))
+
+
+def sales_frame():
+    return pd.DataFrame(
+        {
+            "order_id": [1001, 1002, 1003],
+            "customer_name": ["Alice", "Bob", "Carol"],
+            "product": ["Laptop", "Mouse", "Monitor"],
+            "quantity": [2, 5, 1],
+            "unit_price": [999.99, 29.99, 349.99],
+            "order_date": pd.to_datetime(["2024-01-15", "2024-01-20", "2024-01-25"]),
+            "region": ["North", "South", "North"],
+            "notes": ["a", "b", "c"],
+        }
+    )
+
+
+class TestExtractColumnar:
+    SINCE = datetime(2024, 1, 20, tzinfo=timezone.utc)
+
+    def test_reads_parquet(self, tmp_path):
+        path = tmp_path / "sales.parquet"
+        sales_frame().to_parquet(path)
+        assert extract(path)["order_id"].tolist() == [1001, 1002, 1003]
+
+    def test_reads_arrow_ipc(self, tmp_path):
+        path = tmp_path / "sales.arrow"
+        sales_frame().to_feather(path)
+        assert len(extract(path)) == 3
+
+    def test_projects_expected_columns(self, tmp_path):
+        path = tmp_path / "sales.parquet"
+        sales_frame().to_parquet(path)
+        assert set(extract(path).columns) == EXPECTED_COLUMNS
+
+    def test_since_pushed_down(self, tmp_path):
+        path = tmp_path / "sales.parquet"
+        sales_frame().to_parquet(path)
+        assert extract(path, since=self.SINCE)["order_id"].tolist() == [1003]
+
+    def test_string_dates_filtered_after_read(self, tmp_path):
+        path = tmp_path / "sales.parquet"
+        df = sales_frame().assign(order_date=["2024-01-15", "not-a-date", "2024-01-25"])
+        df.to_parquet(path)
+        assert extract(path, since=self.SINCE)["order_id"].tolist() == [1003]
+
+    def test_missing_column_rejected(self, tmp_path):
+        path = tmp_path / "sales.parquet"
+        sales_frame().drop(columns=["region"]).to_parquet(path)
+        with pytest.raises(ValueError, match="missing columns"):
+            extract(path)
+
+    def test_chunks(self, tmp_path):
+        path = tmp_path / "sales.parquet"
+        sales_frame().to_parquet(path, row_group_size=1)
+        chunks = list(extract_chunks(path, 1, since=self.SINCE))
+        assert [c["order_id"].tolist() for c in chunks] == [[1003]]
+
+    def test_no_byte_offset_state(self, tmp_path):
+        path = tmp_path / "sales.parquet"
+        sales_frame().to_parquet(path)
+        assert snapshot_file(path) is None
+
+
+class TestParquetSink:
+    SINCE = datetime(2024, 1, 20, tzinfo=timezone.utc)
+
+    def test_partitioned_by_day_and_region(self, tmp_path):
+        write_parquet_sink(sales_frame(), tmp_path / "sink")
+        day = tmp_path / "sink" / "order_date=2024-01-15"
+        assert [p.name for p in day.iterdir()] == ["region=North"]
+
+    def test_round_trips_through_extract(self, tmp_path):
+        write_parquet_sink(sales_frame(), tmp_path / "sink")
+        df = extract(tmp_path / "sink")
+        assert sorted(df["order_id"]) == [1001, 1002, 1003]
+        assert df["order_date"].dtype == "datetime64[ns]"
+
+    def test_partitions_pruned_by_since(self, tmp_path):
+        write_parquet_sink(sales_frame(), tmp_path / "sink")
+        assert extract(tmp_path / "sink", since=self.SINCE)["order_id"].tolist() == [
+            1003
+        ]
+
+    def test_append_keeps_earlier_rows(self, tmp_path):
+        df = sales_frame()
+        write_parquet_sink(df.iloc[:2], tmp_path / "sink")
+        write_parquet_sink(df.iloc[2:], tmp_path / "sink")
+        assert len(extract(tmp_path / "sink")) == 3
+
+    def test_replace_clears_previous_run(self, tmp_path):
+        write_parquet_sink(sales_frame(), tmp_path / "sink")
+        write_parquet_sink(sales_frame().iloc[:1], tmp_path / "sink", replace=True)
+        assert len(extract(tmp_path / "sink")) == 1
+
+    def test_merge_retried_batch_adds_no_copies(self, tmp_path):
+        write_parquet_sink(sales_frame(), tmp_path / "sink")
+        merge_parquet_sink(sales_frame(), tmp_path / "sink", key=["order_id"])
+        assert sorted(extract(tmp_path / "sink")["order_id"]) == [1001, 1002, 1003]
+
+    def test_merge_keep_first_leaves_stored_row(self, tmp_path):
+        write_parquet_sink(sales_frame(), tmp_path / "sink")
+        fixed = sales_frame().iloc[:1].assign(quantity=9)
+        merge_parquet_sink(fixed, tmp_path / "sink", key=["order_id"])
+        df = extract(tmp_path / "sink")
+        assert df.loc[df["order_id"] == 1001, "quantity"].tolist() == [2]
+
+    def test_merge_keep_last_replaces_corrected_order(self, tmp_path):
+        write_parquet_sink(sales_frame(), tmp_path / "sink")
+        fixed = sales_frame().iloc[:1].assign(quantity=9)
+        merge_parquet_sink(fixed, tmp_path / "sink", key=["order_id"], keep="last")
+        df = extract(tmp_path / "sink")
+        assert len(df) == 3
+        assert df.loc[df["order_id"] == 1001, "quantity"].tolist() == [9]
+
+    def test_merge_moves_order_to_new_day(self, tmp_path):
+        write_parquet_sink(sales_frame(), tmp_path / "sink")
+        moved = sales_frame().iloc[:1].assign(order_date=pd.Timestamp("2024-01-16"))
+        merge_parquet_sink(moved, tmp_path / "sink", key=["order_id"], keep="last")
+        df = extract(tmp_path / "sink")
+        assert len(df) == 3
+        assert not (tmp_path / "sink" / "order_date=2024-01-15").exists()
+
+    def test_merge_into_missing_sink_writes_batch(self, tmp_path):
+        merge_parquet_sink(sales_frame(), tmp_path / "sink", key=["order_id"])
+        assert len(extract(tmp_path / "sink")) == 3
+
+
+class TestMultiFileSources:
+    def _stores(self, tmp_path, count=3):
+        for i in range(count):
+            (tmp_path / f"store_{i}.csv").write_text(
+                "order_id,customer_name,product,quantity,unit_price,order_date,region\n"
+                f"{i},Alice,Laptop,2,999.99,2024-01-15,North\n"
+            )
+        return tmp_path
+
+    def test_directory_lists_csvs(self, tmp_path):
+        self._stores(tmp_path)
+        (tmp_path / "notes.txt").write_text("ignore me")
+        assert [p.name for p in resolve_sources(tmp_path)] == [
+            "store_0.csv",
+            "store_1.csv",
+            "store_2.csv",
+        ]
+
+    def test_glob(self, tmp_path):
+        self._stores(tmp_path)
+        assert len(resolve_sources(tmp_path / "store_[01].csv")) == 2
+
+    def test_glob_without_matches_raises(self, tmp_path):
+        with pytest.raises(FileNotFoundError, match="No files match"):
+            resolve_sources(tmp_path / "*.csv")
+
+    def test_single_file_unchanged(self, tmp_path):
+        csv = write_csv(tmp_path, valid_csv())
+        assert resolve_sources(csv) == [csv]
+
+    def test_extract_files_keeps_job_order(self, tmp_path):
+        jobs = [
+            (p, None, None, None) for p in resolve_sources(self._stores(tmp_path, 7))
+        ]
+        frames = list(extract_files(jobs, workers=2))
+        assert [f["order_id"].iloc[0] for f in frames] == list(range(7))
+
+
+def _zstd_compress(data: bytes) -> bytes:
+    zstandard = pytest.importorskip("zstandard")
+    return zstandard.ZstdCompressor().compress(data)
+
+
+COMPRESSORS = {
+    "gz": gzip.compress,
+    "bz2": bz2.compress,
+    "xz": lzma.compress,
+    "zst": _zstd_compress,
+}
+
+
+@pytest.fixture(params=sorted(COMPRESSORS))
+def compressed_csv(request, tmp_path):
+    rows = "".join(
+        f"{i},Alice,Laptop,2,999.99,2024-01-{i % 28 + 1:02d},North\n" for i in range(50)
+    )
+    data = (
+        "order_id,customer_name,product,quantity,unit_price,order_date,region\n" + rows
+    ).encode()
+    path = tmp_path / f"sales.csv.{request.param}"
+    path.write_bytes(COMPRESSORS[request.param](data))
+    return path
+
+
+class TestCompressedSources:
+    @pytest.mark.parametrize("engine", ["c", "pyarrow"])
+    def test_extract(self, compressed_csv, engine):
+        df = extract(compressed_csv, engine=engine)
+        assert len(df) == 50
+        assert isinstance(df["region"].dtype, pd.CategoricalDtype)
+
+    def test_extract_chunks(self, compressed_csv):
+        chunks = list(extract_chunks(compressed_csv, chunk_rows=20))
+        assert [len(c) for c in chunks] == [20, 20, 10]
+
+    def test_no_uncompressed_copy(self, compressed_csv):
+        list(extract_chunks(compressed_csv, chunk_rows=20))
+        assert list(compressed_csv.parent.iterdir()) == [compressed_csv]
+
+    def test_watermark_filter(self, compressed_csv):
+        since = datetime(2024, 1, 20, tzinfo=timezone.utc)
+        assert (extract(compressed_csv, since=since)["order_date"] > "2024-01-20").all()
+
+    def test_directory_lists_compressed_csvs(self, compressed_csv):
+        assert resolve_sources(compressed_csv.parent) == [compressed_csv]
+
+    def test_snapshot_covers_whole_file(self, compressed_csv):
+        state = snapshot_file(compressed_csv)
+        assert state.byte_offset == compressed_csv.stat().st_size
+
+    def test_resume_reads_in_full(self, compressed_csv):
+        stale = FileState(str(compressed_csv.resolve()), "stale", byte_offset=10)
+        assert len(extract(compressed_csv, resume_from=stale)) == 50
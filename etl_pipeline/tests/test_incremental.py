@@ -4,9 +4,8 @@ from pathlib import Path
 from unittest.mock import MagicMock
 
 import pandas as pd
-import pytest
 
-from extract import _filter_since, extract
+from extract import FileState, _filter_since, extract, extract_chunks, snapshot_file
 from load import PIPELINE_NAME, WATERMARK_COLUMN
 
 
@@ -91,6 +90,154 @@ class TestExtractWithWatermark:
         assert extract(csv, since=datetime(2024, 6, 1, tzinfo=timezone.utc)).empty
 
 
+HEADER = "order_id,customer_name,product,quantity,unit_price,order_date,region\n"
+DAY1 = (
+    "1001,Alice,Laptop,2,999.99,2024-01-15,North\n"
+    "1002,Bob,Mouse,5,29.99,2024-01-28,South\n"
+)
+DAY2 = "1003,Carol,Keyboard,1,79.99,2024-01-10,East\n"
+
+
+class TestResumeFromOffset:
+    def _csv(self, tmp_path, content=HEADER + DAY1):
+        csv = tmp_path / "sales.csv"
+        csv.write_text(content)
+        return csv
+
+    def test_reads_only_appended_rows(self, tmp_path):
+        csv = self._csv(tmp_path)
+        state = snapshot_file(csv)
+        with csv.open("a") as f:
+            f.write(DAY2)
+        result = extract(csv, resume_from=state)
+        assert result["order_id"].tolist() == [1003]
+
+    def test_resumed_rows_skip_date_filter(self, tmp_path):
+        csv = self._csv(tmp_path)
+        state = snapshot_file(csv)
+        with csv.open("a") as f:
+            f.write(DAY2)
+        wm = datetime(2024, 1, 28, tzinfo=timezone.utc)
+        assert len(extract(csv, since=wm, resume_from=state)) == 1
+
+    def test_no_new_bytes_returns_empty_frame_with_columns(self, tmp_path):
+        csv = self._csv(tmp_path)
+        result = extract(csv, resume_from=snapshot_file(csv))
+        assert result.empty
+        assert "order_id" in result.columns
+
+    def test_rewritten_file_falls_back_to_date_filter(self, tmp_path):
+        csv = self._csv(tmp_path)
+        state = snapshot_file(csv)
+        csv.write_text(HEADER + DAY1.replace("Alice", "Alina") + DAY2)
+        wm = datetime(2024, 1, 20, tzinfo=timezone.utc)
+        result = extract(csv, since=wm, resume_from=state)
+        assert result["order_id"].tolist() == [1002]
+
+    def test_truncated_file_falls_back(self, tmp_path):
+        csv = self._csv(tmp_path)
+        state = snapshot_file(csv)
+        csv.write_text(HEADER)
+        assert extract(csv, resume_from=state).empty
+
+    def test_snapshot_stops_at_last_complete_line(self, tmp_path):
+        csv = self._csv(tmp_path, HEADER + DAY1 + "1003,Car")
+        assert snapshot_file(csv).byte_offset == len(HEADER + DAY1)
+
+    def test_partial_line_reread_once_complete(self, tmp_path):
+        csv = self._csv(tmp_path, HEADER + DAY1 + "1003,Car")
+        state = snapshot_file(csv)
+        csv.write_text(HEADER + DAY1 + DAY2)
+        assert extract(csv, resume_from=state)["order_id"].tolist() == [1003]
+
+    def test_chunks_resume_from_offset(self, tmp_path):
+        csv = self._csv(tmp_path)
+        state = snapshot_file(csv)
+        with csv.open("a") as f:
+            f.write(DAY2 + DAY2.replace("1003", "1004"))
+        chunks = list(extract_chunks(csv, chunk_rows=1, resume_from=state))
+        assert [c.iloc[0]["order_id"] for c in chunks] == [1003, 1004]
+
+    def test_correction_mid_prefix_falls_back(self, tmp_path):
+        filler = "".join(
+            f"{2000 + i},Filler,Mouse,1,9.99,2024-01-01,North\n" for i in range(5000)
+        )
+        csv = self._csv(tmp_path, HEADER + filler + DAY1)
+        state = snapshot_file(csv)
+        csv.write_text(HEADER + filler.replace("2100,Filler", "2100,Fixed") + DAY1)
+        result = extract(csv, resume_from=state)
+        assert "Fixed" in result["customer_name"].tolist()
+
+    def test_full_read_stops_at_snapshot(self, tmp_path):
+        csv = self._csv(tmp_path, HEADER + DAY1 + "1003,Car")
+        state = snapshot_file(csv)
+        assert extract(csv, until=state)["order_id"].tolist() == [1001, 1002]
+
+    def test_resumed_read_stops_at_snapshot(self, tmp_path):
+        csv = self._csv(tmp_path)
+        state = snapshot_file(csv)
+        with csv.open("a") as f:
+            f.write(DAY2 + "1004,Da")
+        end = snapshot_file(csv)
+        result = extract(csv, resume_from=state, until=end)
+        assert result["order_id"].tolist() == [1003]
+
+    def test_chunks_stop_at_snapshot(self, tmp_path):
+        csv = self._csv(tmp_path, HEADER + DAY1 + "1003,Car")
+        chunks = list(extract_chunks(csv, chunk_rows=1, until=snapshot_file(csv)))
+        assert [c.iloc[0]["order_id"] for c in chunks] == [1001, 1002]
+
+    def test_snapshot_records_verified_previous_state(self, tmp_path):
+        csv = self._csv(tmp_path)
+        state = snapshot_file(csv)
+        with csv.open("a") as f:
+            f.write(DAY2)
+        assert snapshot_file(csv, state).extends == state
+
+    def test_snapshot_rejects_rewritten_prefix(self, tmp_path):
+        csv = self._csv(tmp_path)
+        state = snapshot_file(csv)
+        csv.write_text(HEADER + DAY1.replace("Alice", "Alina") + DAY2)
+        assert snapshot_file(csv, state).extends is None
+
+    def test_verified_snapshot_skips_second_prefix_hash(self, tmp_path, monkeypatch):
+        import extract as extract_module
+
+        csv = self._csv(tmp_path)
+        state = snapshot_file(csv)
+        with csv.open("a") as f:
+            f.write(DAY2)
+        end = snapshot_file(csv, state)
+        rehash = MagicMock()
+        monkeypatch.setattr(extract_module, "_prefix_unchanged", rehash)
+        result = extract(csv, resume_from=state, until=end)
+        assert result["order_id"].tolist() == [1003]
+        rehash.assert_not_called()
+
+    def test_snapshot_path_is_absolute(self, tmp_path):
+        assert Path(snapshot_file(self._csv(tmp_path)).path).is_absolute()
+
+
+class TestGetFileState:
+    def test_returns_none_when_missing(self):
+        from load import get_file_state
+
+        engine = MagicMock()
+        conn = engine.connect.return_value.__enter__.return_value
+        conn.execute.return_value.fetchone.return_value = None
+        assert get_file_state(engine, "/data/sales.csv") is None
+
+    def test_returns_state(self):
+        from load import get_file_state
+
+        engine = MagicMock()
+        conn = engine.connect.return_value.__enter__.return_value
+        conn.execute.return_value.fetchone.return_value = ("abc", 120)
+        assert get_file_state(engine, "/data/sales.csv") == FileState(
+            path="/data/sales.csv", fingerprint="abc", byte_offset=120
+        )
+
+
 class TestGetWatermark:
     def test_returns_none_on_first_run(self):
         from load import get_watermark
@@ -146,6 +293,35 @@ class TestSaveWatermark:
         assert params["name"] == "my_pipeline"
         assert params["watermark"] == wm
 
+    def test_saves_file_state_in_same_transaction(self):
+        from load import save_watermark
+
+        engine = MagicMock()
+        conn = engine.begin.return_value.__enter__.return_value
+        state = FileState(path="/data/sales.csv", fingerprint="abc", byte_offset=120)
+        save_watermark(
+            engine, datetime(2024, 1, 27, tzinfo=timezone.utc), file_state=state
+        )
+        sql, params = conn.execute.call_args_list[-2][0]
+        assert "etl_file_state" in str(sql)
+        assert params[0]["offset"] == 120
+        assert params[0]["path"] == "/data/sales.csv"
+
+    def test_saves_every_file_state(self):
+        from load import save_watermark
+
+        engine = MagicMock()
+        conn = engine.begin.return_value.__enter__.return_value
+        states = [
+            FileState(path=f"/data/store_{i}.csv", fingerprint="abc", byte_offset=i)
+            for i in range(3)
+        ]
+        save_watermark(
+            engine, datetime(2024, 1, 27, tzinfo=timezone.utc), file_states=states
+        )
+        _, params = conn.execute.call_args_list[-2][0]
+        assert [p["path"] for p in params] == [s.path for s in states]
+
 
 class TestConstants:
     def test_watermark_column(self):
@@ -0,0 +1,301 @@
+import json
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pytest
+
+import pipeline
+from config import Settings
+from extract import extract, snapshot_file
+
+HEADER = "order_id,customer_name,product,quantity,unit_price,order_date,region\n"
+
+CSV = """order_id,customer_name,product,quantity,unit_price,order_date,region
+1001,Alice,Laptop,2,999.99,2024-01-15,North
+1002,Bob,Mouse,5,29.99,2024-01-28,South
+1003,,Mouse,5,29.99,2024-01-30,South
+"""
+
+
+@pytest.fixture
+def settings(tmp_path):
+    csv = tmp_path / "sales.csv"
+    csv.write_text(CSV)
+    return Settings(
+        db_host="localhost",
+        db_name="etl",
+        db_user="etl",
+        db_password="etl",
+        csv_path=csv,
+        load_mode="incremental",
+    )
+
+
+@pytest.fixture
+def db(monkeypatch):
+    calls = MagicMock()
+    monkeypatch.setattr(pipeline, "get_engine", calls.get_engine)
+    monkeypatch.setattr(pipeline, "verify_connection", calls.verify_connection)
+    monkeypatch.setattr(pipeline, "get_watermark", MagicMock(return_value=None))
+    monkeypatch.setattr(pipeline, "load", calls.load)
+    monkeypatch.setattr(pipeline, "load_chunks", calls.load_chunks)
+    monkeypatch.setattr(pipeline, "save_watermark", calls.save_watermark)
+    monkeypatch.setattr(pipeline, "save_run_metrics", calls.save_run_metrics)
+    return calls
+
+
+@pytest.fixture(autouse=True)
+def reports_dir(tmp_path, monkeypatch):
+    import metrics
+    import validate
+
+    monkeypatch.setattr(validate, "REPORTS_DIR", tmp_path / "reports")
+    monkeypatch.setattr(metrics, "METRICS_DIR", tmp_path / "metrics")
+    return tmp_path
+
+
+class TestRunPipeline:
+    def test_returns_summary(self, settings, db):
+        summary = pipeline.run_pipeline(settings)
+        assert summary.rows_in == 3
+        assert summary.rows_out == 2
+        assert summary.watermark == pd.Timestamp("2024-01-28")
+        assert {"extract", "transform", "load"} <= summary.timings.keys()
+
+    def test_streaming_summary_matches_batch(self, settings, db):
+        batch = pipeline.run_pipeline(settings)
+        settings.stream_chunk_rows = 1
+        db.load_chunks.side_effect = lambda chunks, *a, **k: sum(len(c) for c in chunks)
+        streamed = pipeline.run_pipeline(settings)
+        assert (streamed.rows_in, streamed.rows_out, streamed.watermark) == (
+            batch.rows_in,
+            batch.rows_out,
+            batch.watermark,
+        )
+
+
+class TestIncrementalBootstrap:
+    def test_reads_csv_once(self, settings, db, monkeypatch):
+        spy = MagicMock(wraps=extract)
+        monkeypatch.setattr(pipeline, "extract", spy)
+        pipeline.run_incremental_pipeline(settings)
+        assert spy.call_count == 1
+
+    def test_saves_watermark_from_summary(self, settings, db):
+        summary = pipeline.run_incremental_pipeline(settings)
+        saved = db.save_watermark.call_args
+        assert saved.args[1] == summary.watermark == pd.Timestamp("2024-01-28")
+        assert [state.path for state in saved.kwargs["file_states"]] == [
+            str(settings.csv_path.resolve())
+        ]
+
+
+class TestRunMetrics:
+    def test_old_metrics_pruned(self, reports_dir, monkeypatch):
+        import os
+
+        import metrics
+
+        monkeypatch.setattr(metrics, "METRICS_KEEP", 2)
+        metrics_dir = reports_dir / "metrics"
+        metrics_dir.mkdir()
+        for age, name in enumerate(["c", "b", "a"], start=1):
+            (metrics_dir / f"{name}.json").write_text("{}")
+            os.utime(metrics_dir / f"{name}.json", (0, 1_000_000 - age))
+        latest = metrics.write_metrics(metrics.RunSummary(mode="full"))
+        assert sorted(p.name for p in metrics_dir.iterdir()) == [
+            "c.json",
+            latest.name,
+        ]
+
+    def test_metrics_json_written(self, settings, db, reports_dir):
+        summary = pipeline.run_pipeline(settings)
+        written = json.loads(
+            (reports_dir / "metrics" / f"{summary.run_id}.json").read_text()
+        )
+        stages = {s["stage"]: s for s in written["stages"]}
+        assert list(stages) == [
+            "extract",
+            "validate_raw",
+            "transform",
+            "validate_clean",
+            "load",
+        ]
+        assert stages["extract"]["rows"] == 3
+        assert stages["load"]["rows"] == 2
+        assert stages["extract"]["rows_per_sec"] > 0
+        assert stages["extract"]["peak_rss_mb"] > 0
+
+    def test_watermark_io_measured(self, settings, db):
+        summary = pipeline.run_incremental_pipeline(settings)
+        assert {"read_watermark", "save_watermark"} <= summary.timings.keys()
+
+    def test_persisted_only_when_enabled(self, settings, db):
+        pipeline.run_pipeline(settings)
+        db.save_run_metrics.assert_not_called()
+
+        settings.persist_metrics = True
+        summary = pipeline.run_pipeline(settings)
+        db.save_run_metrics.assert_called_once()
+        assert db.save_run_metrics.call_args.args[1] is summary
+
+
+class TestParquetSink:
+    def test_full_run_writes_sink(self, settings, db, tmp_path):
+        settings.parquet_sink_dir = tmp_path / "sink"
+        pipeline.run_pipeline(settings)
+        assert len(extract(tmp_path / "sink")) == 2
+
+    def test_streamed_run_writes_every_chunk(self, settings, db, tmp_path):
+        settings.parquet_sink_dir = tmp_path / "sink"
+        settings.stream_chunk_rows = 1
+        db.load_chunks.side_effect = lambda chunks, *a, **k: sum(len(c) for c in chunks)
+        pipeline.run_pipeline(settings)
+        assert len(extract(tmp_path / "sink")) == 2
+
+
+class TestMultiFileSources:
+    @pytest.fixture
+    def store_dir(self, settings, tmp_path):
+        stores = tmp_path / "stores"
+        stores.mkdir()
+        (stores / "store_1.csv").write_text(
+            HEADER + "2001,Ann,Laptop,1,999.99,2024-02-01,North\n"
+        )
+        (stores / "store_2.csv").write_text(
+            HEADER + "2002,Ben,Mouse,2,29.99,2024-01-05,East\n"
+        )
+        settings.csv_path = stores
+        return stores
+
+    def _incremental(self, monkeypatch, stored):
+        from datetime import datetime, timezone
+
+        watermark = datetime(2024, 1, 31, tzinfo=timezone.utc)
+        monkeypatch.setattr(
+            pipeline, "get_watermark", MagicMock(return_value=watermark)
+        )
+        monkeypatch.setattr(pipeline, "get_file_states", MagicMock(return_value=stored))
+        monkeypatch.setattr(pipeline, "load_incremental", MagicMock())
+
+    def test_full_run_reads_every_file(self, settings, db, store_dir):
+        assert pipeline.run_pipeline(settings).rows_in == 2
+
+    def test_glob_source(self, settings, db, store_dir):
+        settings.csv_path = store_dir / "store_1*.csv"
+        assert pipeline.run_pipeline(settings).rows_in == 1
+
+    def test_bootstrap_saves_state_per_file(self, settings, db, store_dir):
+        pipeline.run_incremental_pipeline(settings)
+        states = db.save_watermark.call_args.kwargs["file_states"]
+        assert sorted(s.path.rsplit("/", 1)[1] for s in states) == [
+            "store_1.csv",
+            "store_2.csv",
+        ]
+
+    def test_unchanged_files_skipped(self, settings, db, store_dir, monkeypatch):
+        seen = snapshot_file(store_dir / "store_1.csv")
+        self._incremental(monkeypatch, {seen.path: seen})
+        summary = pipeline.run_incremental_pipeline(settings)
+        # store_2 has no state, so it's read in full despite its old date.
+        assert summary.rows_in == 1
+        assert summary.watermark == pd.Timestamp("2024-01-05")
+
+    def test_untracked_source_uses_watermark(
+        self, settings, db, store_dir, monkeypatch
+    ):
+        self._incremental(monkeypatch, {})
+        assert pipeline.run_incremental_pipeline(settings).rows_in == 1
+
+    def test_streamed_across_files(self, settings, db, store_dir):
+        settings.stream_chunk_rows = 1
+        db.load_chunks.side_effect = lambda chunks, *a, **k: sum(len(c) for c in chunks)
+        assert pipeline.run_pipeline(settings).rows_out == 2
+
+
+class TestEngineReuse:
+    def test_bootstrap_uses_one_pooled_engine(self, settings, db):
+        pipeline.run_incremental_pipeline(settings)
+        assert {c.args for c in db.get_engine.call_args_list} == {
+            (settings.database_url,)
+        }
+        assert {len(c.kwargs) for c in db.get_engine.call_args_list} == {3}
+
+    def test_pool_options_from_settings(self, settings, db):
+        settings.db_pool_size = 2
+        settings.db_statement_timeout_ms = 5000
+        pipeline.run_pipeline(settings)
+        assert db.get_engine.call_args.kwargs == {
+            "pool_size": 2,
+            "pre_ping": True,
+            "statement_timeout_ms": 5000,
+        }
+
+
+class TestPartitionedTarget:
+    def test_full_load_partitioned(self, settings, db):
+        settings.partition_by_month = True
+        pipeline.run_pipeline(settings)
+        assert db.load.call_args.kwargs["partitioned"] is True
+
+    def test_incremental_partitioned(self, settings, db, monkeypatch):
+        from datetime import datetime, timezone
+
+        watermark = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        monkeypatch.setattr(
+            pipeline, "get_watermark", MagicMock(return_value=watermark)
+        )
+        monkeypatch.setattr(pipeline, "get_file_states", MagicMock(return_value={}))
+        monkeypatch.setattr(pipeline, "load_incremental", db.load_incremental)
+        settings.partition_by_month = True
+        pipeline.run_incremental_pipeline(settings)
+        assert db.load_incremental.call_args.kwargs["partitioned"] is True
+
+
+class TestUpsertMode:
+    @pytest.fixture
+    def upsert(self, settings, db, monkeypatch):
+        from datetime import datetime, timezone
+
+        from load import MergeCounts
+
+        watermark = datetime(2024, 6, 1, tzinfo=timezone.utc)
+        monkeypatch.setattr(
+            pipeline, "get_watermark", MagicMock(return_value=watermark)
+        )
+        monkeypatch.setattr(pipeline, "get_file_states", MagicMock(return_value={}))
+        db.load_upsert.return_value = MergeCounts(inserted=1, updated=2, unchanged=3)
+        monkeypatch.setattr(pipeline, "load_upsert", db.load_upsert)
+        monkeypatch.setattr(pipeline, "load_incremental", db.load_incremental)
+        settings.load_mode = "upsert"
+        return db
+
+    def test_merges_with_upsert(self, settings, upsert):
+        summary = pipeline.run_incremental_pipeline(settings)
+        upsert.load_upsert.assert_called_once()
+        upsert.load_incremental.assert_not_called()
+        assert summary.mode == "upsert"
+
+    def test_corrections_behind_watermark_are_read(self, settings, upsert):
+        # Every order in the fixture predates the watermark.
+        summary = pipeline.run_incremental_pipeline(settings)
+        assert summary.rows_in == len(extract(settings.csv_path))
+
+    def test_correction_in_same_batch_reaches_merge(self, settings, upsert):
+        with settings.csv_path.open("a") as f:
+            f.write("1001,Alice,Laptop,3,999.99,2024-01-15,North\n")
+        pipeline.run_incremental_pipeline(settings)
+        merged = upsert.load_upsert.call_args.args[0]
+        assert merged["order_id"].tolist().count(1001) == 2
+
+    def test_counts_in_summary(self, settings, upsert):
+        summary = pipeline.run_incremental_pipeline(settings)
+        assert summary.merged == {"inserted": 1, "updated": 2, "unchanged": 3}
+        assert summary.as_dict()["merged"] == summary.merged
+
+    def test_streamed_counts_accumulate(self, settings, upsert):
+        settings.stream_chunk_rows = 1
+        summary = pipeline.run_incremental_pipeline(settings)
+        calls = upsert.load_upsert.call_count
+        assert calls > 1
+        assert summary.merged["updated"] == 2 * calls
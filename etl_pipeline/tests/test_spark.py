@@ -1,6 +1,9 @@
+import gzip
+import lzma
 import textwrap
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
 from pathlib import Path
+from unittest.mock import MagicMock, patch
 
 import pytest
 
@@ -8,25 +11,32 @@ pyspark = pytest.importorskip("pyspark")
 
 from pyspark.sql import SparkSession
 from pyspark.sql.types import (
+    DateType,
     DoubleType,
     IntegerType,
     StringType,
-    StructField,
-    StructType,
 )
 
-from spark.extract_spark import EXPECTED_COLUMNS, _filter_since, extract
+from spark.extract_spark import (
+    CORRUPT_RECORD_COLUMN,
+    _filter_since,
+    extract,
+    extract_stream,
+)
+from spark.load_spark import load as load_spark
+from spark.load_spark import load_incremental as load_incremental_spark
+from spark.load_spark import load_upsert as load_upsert_spark
+from spark.pipeline_spark import run_incremental_pipeline
 from spark.transform_spark import (
     CRITICAL_FIELDS,
     NUMERIC_FIELDS,
+    TransformCounts,
     _add_metadata,
+    _cast_numerics,
     _derive_columns,
-    _drop_duplicates,
-    _drop_null_critical_fields,
     _standardize_text,
-    _validate_dates,
-    _validate_numerics,
     transform,
+    transform_with_counts,
 )
 
 
@@ -57,101 +67,51 @@ def make_row(**overrides) -> dict:
     return {**defaults, **overrides}
 
 
-class TestDropDuplicates:
-    def test_removes_exact_duplicates(self, spark):
-        row = make_row()
-        df = spark.createDataFrame([row, row])
-        assert _drop_duplicates(df).count() == 1
-
-    def test_keeps_unique_rows(self, spark):
-        df = spark.createDataFrame([make_row()])
-        assert _drop_duplicates(df).count() == 1
+class TestRejectionSteps:
+    def test_exact_duplicates_dropped(self, spark):
+        df = spark.createDataFrame([make_row(), make_row()])
+        assert transform(df).count() == 1
 
     def test_near_duplicates_kept(self, spark):
-        df = spark.createDataFrame(
-            [
-                make_row(quantity="1"),
-                make_row(quantity="2"),
-            ]
-        )
-        assert _drop_duplicates(df).count() == 2
-
-    def test_empty_dataframe(self, spark):
-        schema = StructType(
-            [
-                StructField("order_id", StringType()),
-                StructField("customer_name", StringType()),
-            ]
-        )
-        df = spark.createDataFrame([], schema)
-        assert _drop_duplicates(df).count() == 0
-
-
-class TestDropNullCriticalFields:
-    def test_drops_null_customer_name(self, spark):
-        df = spark.createDataFrame(
-            [
-                make_row(customer_name=None),
-                make_row(customer_name="Alice"),
-            ]
-        )
-        assert _drop_null_critical_fields(df).count() == 1
+        df = spark.createDataFrame([make_row(quantity="1"), make_row(quantity="2")])
+        assert transform(df).count() == 2
 
-    def test_drops_null_product(self, spark):
-        df = spark.createDataFrame([make_row(product=None), make_row()])
-        assert _drop_null_critical_fields(df).count() == 1
+    @pytest.mark.parametrize("field", ["customer_name", "product", "region"])
+    def test_null_critical_field_dropped(self, spark, field):
+        df = spark.createDataFrame([make_row(**{field: None}), make_row(order_id="2")])
+        assert transform(df).count() == 1
 
-    def test_drops_null_region(self, spark):
-        df = spark.createDataFrame([make_row(region=None), make_row()])
-        assert _drop_null_critical_fields(df).count() == 1
+    def test_null_non_critical_field_kept(self, spark):
+        df = spark.createDataFrame([make_row(order_id=None), make_row(order_id="2")])
+        assert transform(df).count() == 2
 
-    def test_keeps_null_non_critical_field(self, spark):
-        df = spark.createDataFrame([make_row(order_id=None)])
-        assert _drop_null_critical_fields(df).count() == 1
+    @pytest.mark.parametrize("quantity", ["abc", None])
+    def test_bad_quantity_dropped(self, spark, quantity):
+        df = spark.createDataFrame([make_row(quantity=quantity), make_row()])
+        assert transform(df).count() == 1
 
-    def test_critical_fields_constant(self):
-        assert set(CRITICAL_FIELDS) == {"customer_name", "product", "region"}
-
-
-class TestValidateNumerics:
-    def test_drops_string_quantity(self, spark):
-        df = spark.createDataFrame([make_row(quantity="abc"), make_row(quantity="2")])
-        assert _validate_numerics(df).count() == 1
-
-    def test_drops_null_quantity(self, spark):
-        df = spark.createDataFrame([make_row(quantity=None), make_row(quantity="2")])
-        assert _validate_numerics(df).count() == 1
-
-    def test_quantity_cast_to_int(self, spark):
-        df = spark.createDataFrame([make_row(quantity="2")])
-        result = _validate_numerics(df)
+    def test_numerics_cast(self, spark):
+        result = transform(spark.createDataFrame([make_row()]))
         assert result.schema["quantity"].dataType == IntegerType()
-
-    def test_unit_price_cast_to_double(self, spark):
-        df = spark.createDataFrame([make_row(unit_price="9.99")])
-        result = _validate_numerics(df)
         assert result.schema["unit_price"].dataType == DoubleType()
 
-    def test_numeric_fields_constant(self):
-        assert set(NUMERIC_FIELDS) == {"quantity", "unit_price"}
-
-
-class TestValidateDates:
-    def test_drops_unparseable_date(self, spark):
-        df = spark.createDataFrame([make_row(order_date="not-a-date"), make_row()])
-        assert _validate_dates(df).count() == 1
-
-    def test_valid_date_parsed(self, spark):
-        df = spark.createDataFrame([make_row(order_date="2024-01-15")])
-        result = _validate_dates(df)
-        assert result.count() == 1
-        from pyspark.sql.types import DateType
+    @pytest.mark.parametrize("order_date", ["not-a-date", ""])
+    def test_bad_date_dropped(self, spark, order_date):
+        df = spark.createDataFrame([make_row(order_date=order_date), make_row()])
+        assert transform(df).count() == 1
 
+    def test_date_parsed(self, spark):
+        result = transform(spark.createDataFrame([make_row()]))
         assert result.schema["order_date"].dataType == DateType()
 
-    def test_empty_string_dropped(self, spark):
-        df = spark.createDataFrame([make_row(order_date=""), make_row()])
-        assert _validate_dates(df).count() == 1
+    def test_transform_caches_nothing(self, spark):
+        cached = spark.sparkContext._jsc.getPersistentRDDs().size()
+        transform(spark.createDataFrame([make_row()])).count()
+        assert spark.sparkContext._jsc.getPersistentRDDs().size() == cached
+
+    def test_field_constants(self):
+        assert set(CRITICAL_FIELDS) == {"customer_name", "product", "region"}
+        assert set(NUMERIC_FIELDS) == {"quantity", "unit_price"}
 
 
 class TestStandardizeText:
@@ -182,19 +142,19 @@ class TestStandardizeText:
 class TestDeriveColumns:
     def test_total_revenue_calculated(self, spark):
         df = spark.createDataFrame([make_row()])
-        df = _validate_numerics(df)
+        df = _cast_numerics(df)
         result = _derive_columns(df).collect()
         assert result[0]["total_revenue"] == pytest.approx(1999.98)
 
     def test_total_revenue_column_added(self, spark):
         df = spark.createDataFrame([make_row()])
-        df = _validate_numerics(df)
+        df = _cast_numerics(df)
         assert "total_revenue" not in df.columns
         assert "total_revenue" in _derive_columns(df).columns
 
     def test_zero_quantity_produces_zero_revenue(self, spark):
         df = spark.createDataFrame([make_row(quantity="0", unit_price="99.99")])
-        df = _validate_numerics(df)
+        df = _cast_numerics(df)
         result = _derive_columns(df).collect()
         assert result[0]["total_revenue"] == 0.0
 
@@ -382,6 +342,59 @@ class TestTransformIntegration:
             assert row["region"] == row["region"].title()
 
 
+class TestTransformWithCounts:
+    def _raw(self, spark):
+        return spark.createDataFrame(
+            [
+                make_row(order_id="1"),
+                make_row(order_id="1"),
+                make_row(order_id="2", customer_name=None),
+                make_row(order_id="3", quantity="abc"),
+                make_row(order_id="4", order_date="not-a-date"),
+                make_row(order_id="5", region=None, quantity="abc"),
+                make_row(order_id="6"),
+            ]
+        )
+
+    def test_counts_every_step(self, spark):
+        _, counts, _ = transform_with_counts(self._raw(spark))
+        assert counts == TransformCounts(
+            rows_in=7,
+            duplicates=1,
+            null_critical=2,
+            bad_numerics=1,
+            bad_dates=1,
+            latest_order_date=date(2024, 1, 15),
+        )
+
+    def test_rows_out_matches_result(self, spark):
+        result, counts, _ = transform_with_counts(self._raw(spark))
+        assert counts.rows_out == result.count() == 2
+
+    def test_internal_columns_dropped(self, spark):
+        result, _, _ = transform_with_counts(self._raw(spark))
+        assert result.columns == transform(self._raw(spark)).columns
+        assert "_copies" not in result.columns
+        assert "_rejected_by" not in result.columns
+
+    def test_empty_input(self, spark):
+        empty = spark.createDataFrame([], self._raw(spark).schema)
+        result, counts, _ = transform_with_counts(empty)
+        assert counts.rows_in == counts.rows_out == 0
+        assert counts.latest_order_date is None
+        assert result.count() == 0
+
+    def test_latest_date_ignores_rejected_rows(self, spark):
+        raw = spark.createDataFrame(
+            [
+                make_row(order_id="1", order_date="2024-01-10"),
+                make_row(order_id="2", order_date="2024-03-01", region=None),
+            ]
+        )
+        _, counts, _ = transform_with_counts(raw)
+        assert counts.latest_order_date == date(2024, 1, 10)
+
+
 class TestFilterSince:
     def test_filters_rows_before_watermark(self, spark):
         df = spark.createDataFrame(
@@ -458,3 +471,304 @@ class TestExtractSpark:
         result = extract(spark, csv, since=wm)
         assert result.count() == 1
         assert result.collect()[0]["order_id"] == "1002"
+
+    @pytest.mark.parametrize(
+        "suffix, compress", [(".gz", gzip.compress), (".xz", lzma.compress)]
+    )
+    def test_reads_compressed_csv(self, spark, tmp_path, suffix, compress):
+        csv = tmp_path / f"test.csv{suffix}"
+        csv.write_bytes(
+            compress(
+                b"order_id,customer_name,product,quantity,unit_price,"
+                b"order_date,region\n"
+                b"1001,Alice,Laptop,2,999.99,2024-01-15,North\n"
+                b"1002,Bob,Mouse,5,29.99,2024-01-16,South\n"
+            )
+        )
+        result = extract(spark, csv)
+        assert sorted(r["order_id"] for r in result.collect()) == ["1001", "1002"]
+
+
+HEADER = "order_id,customer_name,product,quantity,unit_price,order_date,region"
+
+
+class TestExtractSchema:
+    def _csv(self, tmp_path, *rows: str) -> Path:
+        csv = tmp_path / "test.csv"
+        csv.write_text("\n".join([HEADER, *rows]) + "\n")
+        return csv
+
+    def test_reads_declared_types(self, spark, tmp_path):
+        csv = self._csv(tmp_path, "1001,Alice,Laptop,2,999.99,2024-01-15,North")
+        schema = extract(spark, csv).schema
+        assert schema["order_id"].dataType == StringType()
+        assert schema["quantity"].dataType == IntegerType()
+        assert schema["unit_price"].dataType == DoubleType()
+        assert schema["order_date"].dataType == DateType()
+
+    def test_schema_follows_header_order(self, spark, tmp_path):
+        csv = tmp_path / "test.csv"
+        csv.write_text(
+            "region,order_date,unit_price,quantity,product,customer_name,order_id\n"
+            "North,2024-01-15,999.99,2,Laptop,Alice,1001\n"
+        )
+        row = extract(spark, csv).collect()[0]
+        assert row["region"] == "North"
+        assert row["quantity"] == 2
+
+    def test_bad_values_read_as_null_and_kept_raw(self, spark, tmp_path):
+        csv = self._csv(
+            tmp_path,
+            "1001,Alice,Laptop,abc,999.99,2024-01-15,North",
+            "1002,Bob,Mouse,5,29.99,2024-01-16,South",
+        )
+        rows = {r["order_id"]: r for r in extract(spark, csv).collect()}
+        assert rows["1001"]["quantity"] is None
+        assert rows["1001"][CORRUPT_RECORD_COLUMN].startswith("1001,Alice")
+        assert rows["1002"][CORRUPT_RECORD_COLUMN] is None
+
+    def test_transform_counts_malformed_rows(self, spark, tmp_path):
+        csv = self._csv(
+            tmp_path,
+            "1001,Alice,Laptop,abc,999.99,2024-01-15,North",
+            "1002,Bob,Mouse,5,29.99,2024-13-45,South",
+            "1003,Carol,Webcam,1,89.99,2024-01-17,East",
+        )
+        result, counts, _ = transform_with_counts(extract(spark, csv))
+        assert counts.malformed == 2
+        assert counts.bad_numerics == 1
+        assert counts.bad_dates == 1
+        assert CORRUPT_RECORD_COLUMN not in result.columns
+        assert [r["order_id"] for r in result.collect()] == ["1003"]
+
+    def test_repartitions_by_order_date(self, spark, tmp_path):
+        csv = self._csv(
+            tmp_path,
+            "1001,Alice,Laptop,2,999.99,2024-01-15,North",
+            "1002,Bob,Mouse,5,29.99,2024-01-16,South",
+        )
+        df = extract(spark, csv, partitions=3)
+        assert df.rdd.getNumPartitions() == 3
+        assert df.count() == 2
+
+
+def _jdbc_frame(rows: int = 3, partitions: int = 2) -> MagicMock:
+    df = MagicMock()
+    df.count.return_value = rows
+    df.columns = ["order_id", "order_date"]
+    df.rdd.getNumPartitions.return_value = partitions
+    df.repartition.return_value = df
+    return df
+
+
+def _jdbc_options(df: MagicMock) -> dict:
+    writer = df.write.format.return_value
+    options = {}
+    while writer.option.call_args_list:
+        for call in writer.option.call_args_list:
+            options[call.args[0]] = call.args[1]
+        writer = writer.option.return_value
+    return options
+
+
+class TestLoadSparkJdbc:
+    def _incremental(self, df, rowcount=2, **options):
+        engine = MagicMock()
+        conn = engine.begin.return_value.__enter__.return_value
+        conn.execute.return_value.rowcount = rowcount
+        inserted = load_incremental_spark(
+            df, "jdbc:postgresql://h/db", "sales_clean", "u", "p", engine, **options
+        )
+        statements = [str(c.args[0]) for c in conn.execute.call_args_list]
+        return inserted, statements
+
+    def test_write_options(self):
+        df = _jdbc_frame()
+        self._incremental(df, num_partitions=2, batch_size=500)
+        options = _jdbc_options(df)
+        assert options["batchsize"] == 500
+        assert options["numPartitions"] == 2
+        assert options["isolationLevel"] == "READ_COMMITTED"
+        assert options["reWriteBatchedInserts"] == "true"
+
+    def test_spreads_narrow_frame_across_partitions(self):
+        df = _jdbc_frame(partitions=1)
+        self._incremental(df, num_partitions=4)
+        df.repartition.assert_called_once_with(4)
+
+    def test_incremental_merges_from_staging(self):
+        inserted, statements = self._incremental(_jdbc_frame(rows=3), rowcount=2)
+        assert inserted == 2
+        assert "CREATE UNLOGGED TABLE" in statements[0]
+        assert 'LIKE "sales_clean"' in statements[0]
+        assert "ON CONFLICT (order_id) DO NOTHING" in statements[1]
+        assert "DROP TABLE IF EXISTS" in statements[-1]
+
+    def test_staging_dropped_when_merge_fails(self):
+        from sqlalchemy.exc import SQLAlchemyError
+
+        engine = MagicMock()
+        conn = engine.begin.return_value.__enter__.return_value
+        conn.execute.side_effect = [None, SQLAlchemyError("boom"), None]
+        with pytest.raises(SQLAlchemyError, match="Incremental load failed"):
+            load_incremental_spark(
+                _jdbc_frame(), "jdbc:postgresql://h/db", "sales_clean", "u", "p", engine
+            )
+        assert "DROP TABLE IF EXISTS" in str(conn.execute.call_args.args[0])
+
+    def test_empty_frame_skips_database(self):
+        engine = MagicMock()
+        df = _jdbc_frame(rows=0)
+        assert load_incremental_spark(df, "url", "t", "u", "p", engine) == 0
+        engine.begin.assert_not_called()
+
+    def test_full_load_swaps_in_shadow(self):
+        df = _jdbc_frame(rows=3)
+        engine = MagicMock()
+        with (
+            patch("spark.load_spark._finalize_table") as finalize,
+            patch("spark.load_spark._swap_in") as swap,
+        ):
+            load_spark(df, "url", "sales_clean", "u", "p", engine)
+        assert _jdbc_options(df)["dbtable"] == "sales_clean_shadow"
+        finalize.assert_called_once()
+        assert finalize.call_args.kwargs["expected"] == 3
+        assert swap.call_args.args[1:3] == ("sales_clean_shadow", "sales_clean")
+
+
+class TestSparkWatermark:
+    COUNTS = TransformCounts(
+        rows_in=2,
+        duplicates=0,
+        null_critical=0,
+        bad_numerics=0,
+        bad_dates=0,
+        latest_order_date=date(2024, 1, 20),
+    )
+
+    def _run(self, watermark, **patches):
+        targets = {
+            "get_engine": MagicMock(),
+            "verify_connection": MagicMock(),
+            "get_watermark": MagicMock(return_value=watermark),
+            "save_watermark": MagicMock(),
+            **patches,
+        }
+        with patch.multiple("spark.pipeline_spark", **targets):
+            settings = MagicMock(pool_options={}, jdbc_options={})
+            run_incremental_pipeline(settings, MagicMock())
+        return targets
+
+    def test_bootstrap_reads_source_once(self):
+        mocks = self._run(
+            None,
+            run_pipeline=MagicMock(return_value=self.COUNTS),
+            extract=MagicMock(),
+        )
+        mocks["run_pipeline"].assert_called_once()
+        mocks["extract"].assert_not_called()
+        saved = mocks["save_watermark"].call_args.args[1]
+        assert saved == datetime(2024, 1, 20, tzinfo=timezone.utc)
+
+    def test_incremental_watermark_needs_no_extra_job(self):
+        clean, cached = MagicMock(), MagicMock()
+        mocks = self._run(
+            datetime(2024, 1, 10, tzinfo=timezone.utc),
+            extract=MagicMock(),
+            transform_with_counts=MagicMock(return_value=(clean, self.COUNTS, cached)),
+            load_incremental=MagicMock(),
+        )
+        clean.agg.assert_not_called()
+        cached.unpersist.assert_called_once()
+        assert mocks["load_incremental"].call_args.kwargs["rows"] == 2
+        saved = mocks["save_watermark"].call_args.args[1]
+        assert saved == datetime(2024, 1, 20, tzinfo=timezone.utc)
+
+    def test_no_valid_rows_leaves_watermark_unset(self):
+        empty = TransformCounts(
+            rows_in=1, duplicates=0, null_critical=1, bad_numerics=0, bad_dates=0
+        )
+        mocks = self._run(None, run_pipeline=MagicMock(return_value=empty))
+        mocks["save_watermark"].assert_not_called()
+
+
+class TestExtractStream:
+    def test_rejects_single_file(self, spark, tmp_path):
+        csv = tmp_path / "test.csv"
+        csv.write_text(HEADER + "\n")
+        with pytest.raises(ValueError, match="directory or glob"):
+            extract_stream(spark, csv)
+
+    def test_streams_typed_rows_from_directory(self, spark, tmp_path):
+        source = tmp_path / "incoming"
+        source.mkdir()
+        (source / "a.csv").write_text(
+            HEADER + "\n1001,Alice,Laptop,2,999.99,2024-01-15,North\n"
+        )
+        stream = extract_stream(spark, source)
+        assert stream.isStreaming
+        assert stream.schema["quantity"].dataType == IntegerType()
+
+        query = (
+            stream.writeStream.format("memory")
+            .queryName("sales_stream_test")
+            .option("checkpointLocation", str(tmp_path / "checkpoint"))
+            .trigger(availableNow=True)
+            .start()
+        )
+        query.awaitTermination()
+        rows = spark.table("sales_stream_test").collect()
+        assert [r["order_id"] for r in rows] == ["1001"]
+
+
+class TestLoadUpsertSpark:
+    def _upsert(self, df, counts=(1, 1, 3), has_row_hash=True):
+        engine = MagicMock()
+        conn = engine.begin.return_value.__enter__.return_value
+        conn.execute.return_value.one.return_value = counts
+        conn.execute.return_value.first.return_value = (1,) if has_row_hash else None
+        merged = load_upsert_spark(df, "url", "sales_clean", "u", "p", engine)
+        statements = [str(c.args[0]) for c in conn.execute.call_args_list]
+        return merged, statements
+
+    def _merge_statement(self, statements):
+        return next(s for s in statements if "ON CONFLICT" in s)
+
+    def _frame(self):
+        df = _jdbc_frame()
+        df.columns = ["order_id", "quantity", "loaded_at"]
+        df.dropDuplicates.return_value = df
+        df.isEmpty.return_value = False
+        return df
+
+    def test_keeps_one_row_per_order(self):
+        df = self._frame()
+        self._upsert(df)
+        df.dropDuplicates.assert_called_once_with(["order_id"])
+
+    def test_updates_only_changed_rows(self):
+        _, statements = self._upsert(self._frame())
+        merge = self._merge_statement(statements)
+        assert "ON CONFLICT (order_id) DO UPDATE" in merge
+        assert '"loaded_at" = EXCLUDED."loaded_at"' in merge
+        assert '(target."quantity") IS DISTINCT FROM (EXCLUDED."quantity")' in merge
+        assert "DROP TABLE IF EXISTS" in statements[-1]
+
+    def test_clears_stale_row_hash(self):
+        _, statements = self._upsert(self._frame())
+        assert '"row_hash" = NULL' in self._merge_statement(statements)
+
+    def test_no_row_hash_column_left_alone(self):
+        _, statements = self._upsert(self._frame(), has_row_hash=False)
+        assert "row_hash" not in self._merge_statement(statements)
+
+    def test_returns_merge_counts(self):
+        merged, _ = self._upsert(self._frame(), counts=(1, 1, 3))
+        assert (merged.inserted, merged.updated, merged.unchanged) == (1, 1, 1)
+
+    def test_empty_batch_skips_database(self):
+        df = self._frame()
+        df.isEmpty.return_value = True
+        engine = MagicMock()
+        assert load_upsert_spark(df, "url", "t", "u", "p", engine).inserted == 0
+        engine.begin.assert_not_called()
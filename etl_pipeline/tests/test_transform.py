@@ -1,5 +1,7 @@
 from datetime import timezone
+from unittest.mock import MagicMock
 
+import numpy as np
 import pandas as pd
 import pytest
 
@@ -8,122 +10,70 @@ from transform import (
     NUMERIC_FIELDS,
     _add_metadata,
     _derive_columns,
-    _drop_duplicates,
-    _drop_null_critical_fields,
+    _drop_seen,
+    _filter_valid_rows,
     _standardize_text,
-    _validate_dates,
-    _validate_numerics,
+    parallel_transform,
     transform,
+    transform_chunks,
 )
 
 
+def _rows(base: pd.DataFrame, *overrides: dict) -> pd.DataFrame:
+    return pd.concat([base.assign(**o) for o in overrides], ignore_index=True)
+
+
 class TestDropDuplicates:
     def test_removes_exact_duplicates(self, duplicate_rows):
-        assert len(_drop_duplicates(duplicate_rows)) == 1
+        assert len(_filter_valid_rows(duplicate_rows)) == 1
 
     def test_keeps_unique_rows(self, clean_row):
-        assert len(_drop_duplicates(clean_row)) == 1
-
-    def test_near_duplicates_kept(self):
-        df = pd.DataFrame(
-            [
-                {"order_id": 1, "customer_name": "Alice", "quantity": 1},
-                {"order_id": 1, "customer_name": "Alice", "quantity": 2},
-            ]
-        )
-        assert len(_drop_duplicates(df)) == 2
+        assert len(_filter_valid_rows(clean_row)) == 1
 
-    def test_empty_dataframe(self):
-        df = pd.DataFrame(columns=["order_id", "customer_name"])
-        assert len(_drop_duplicates(df)) == 0
+    def test_near_duplicates_kept(self, clean_row):
+        df = _rows(clean_row, {"quantity": 1}, {"quantity": 2})
+        assert len(_filter_valid_rows(df)) == 2
+
+    def test_empty_dataframe(self, clean_row):
+        assert len(_filter_valid_rows(clean_row.iloc[:0])) == 0
 
 
 class TestDropNullCriticalFields:
-    def test_drops_null_customer_name(self):
-        df = pd.DataFrame(
-            [
-                {"customer_name": None, "product": "Laptop", "region": "North"},
-                {"customer_name": "Alice", "product": "Laptop", "region": "North"},
-            ]
-        )
-        result = _drop_null_critical_fields(df)
+    @pytest.mark.parametrize("field", ["customer_name", "product", "region"])
+    def test_drops_null_critical_field(self, clean_row, field):
+        df = _rows(clean_row, {field: None}, {})
+        result = _filter_valid_rows(df)
         assert len(result) == 1
-        assert result.iloc[0]["customer_name"] == "Alice"
-
-    def test_drops_null_product(self):
-        df = pd.DataFrame(
-            [
-                {"customer_name": "Alice", "product": None, "region": "North"},
-                {"customer_name": "Alice", "product": "Laptop", "region": "North"},
-            ]
-        )
-        assert len(_drop_null_critical_fields(df)) == 1
-
-    def test_drops_null_region(self):
-        df = pd.DataFrame(
-            [
-                {"customer_name": "Alice", "product": "Laptop", "region": None},
-                {"customer_name": "Alice", "product": "Laptop", "region": "North"},
-            ]
-        )
-        assert len(_drop_null_critical_fields(df)) == 1
-
-    def test_keeps_null_non_critical_field(self):
-        df = pd.DataFrame(
-            [
-                {
-                    "customer_name": "Alice",
-                    "product": "Laptop",
-                    "region": "North",
-                    "order_id": None,
-                }
-            ]
-        )
-        assert len(_drop_null_critical_fields(df)) == 1
+        assert result.iloc[0][field] is not None
+
+    def test_keeps_null_non_critical_field(self, clean_row):
+        assert len(_filter_valid_rows(clean_row.assign(order_id=None))) == 1
 
     def test_critical_fields_constant(self):
         assert set(CRITICAL_FIELDS) == {"customer_name", "product", "region"}
 
     def test_null_rows_fixture(self, null_rows):
-        assert len(_drop_null_critical_fields(null_rows)) == 1
+        assert len(_filter_valid_rows(null_rows)) == 1
 
 
 class TestValidateNumerics:
-    def test_drops_string_quantity(self):
-        df = pd.DataFrame(
-            [
-                {"quantity": "abc", "unit_price": 9.99},
-                {"quantity": 2, "unit_price": 9.99},
-            ]
-        )
-        assert len(_validate_numerics(df)) == 1
-
-    def test_drops_null_quantity(self):
-        df = pd.DataFrame(
-            [
-                {"quantity": None, "unit_price": 9.99},
-                {"quantity": 2, "unit_price": 9.99},
-            ]
-        )
-        assert len(_validate_numerics(df)) == 1
+    @pytest.mark.parametrize("quantity", ["abc", None])
+    def test_drops_bad_quantity(self, clean_row, quantity):
+        df = _rows(clean_row, {"quantity": quantity}, {})
+        assert len(_filter_valid_rows(df)) == 1
 
-    def test_drops_null_unit_price(self):
-        df = pd.DataFrame(
-            [{"quantity": 2, "unit_price": None}, {"quantity": 2, "unit_price": 9.99}]
-        )
-        assert len(_validate_numerics(df)) == 1
+    def test_drops_null_unit_price(self, clean_row):
+        df = _rows(clean_row, {"unit_price": None}, {})
+        assert len(_filter_valid_rows(df)) == 1
 
-    def test_quantity_cast_to_int(self):
-        df = pd.DataFrame([{"quantity": 2, "unit_price": 9.99}])
-        assert _validate_numerics(df)["quantity"].dtype == int
+    def test_quantity_cast_to_int(self, clean_row):
+        assert _filter_valid_rows(clean_row)["quantity"].dtype == int
 
-    def test_unit_price_cast_to_float(self):
-        df = pd.DataFrame([{"quantity": 2, "unit_price": 9.99}])
-        assert _validate_numerics(df)["unit_price"].dtype == float
+    def test_unit_price_cast_to_float(self, clean_row):
+        assert _filter_valid_rows(clean_row)["unit_price"].dtype == float
 
-    def test_numeric_string_coerced_and_kept(self):
-        df = pd.DataFrame([{"quantity": "3", "unit_price": 9.99}])
-        result = _validate_numerics(df)
+    def test_numeric_string_coerced_and_kept(self, clean_row):
+        result = _filter_valid_rows(clean_row.assign(quantity="3"))
         assert len(result) == 1
         assert result.iloc[0]["quantity"] == 3
 
@@ -131,28 +81,25 @@ class TestValidateNumerics:
         assert set(NUMERIC_FIELDS) == {"quantity", "unit_price"}
 
     def test_bad_numerics_fixture(self, bad_numerics):
-        assert len(_validate_numerics(bad_numerics)) == 1
+        assert len(_filter_valid_rows(bad_numerics)) == 1
 
 
 class TestValidateDates:
-    def test_drops_unparseable_date(self):
-        df = pd.DataFrame([{"order_date": "not-a-date"}, {"order_date": "2024-01-15"}])
-        assert len(_validate_dates(df)) == 1
+    @pytest.mark.parametrize("order_date", ["not-a-date", ""])
+    def test_drops_bad_date(self, clean_row, order_date):
+        df = _rows(clean_row, {"order_date": order_date}, {})
+        assert len(_filter_valid_rows(df)) == 1
 
-    def test_valid_date_parsed(self):
-        df = pd.DataFrame([{"order_date": "2024-01-15"}])
-        assert pd.api.types.is_datetime64_any_dtype(_validate_dates(df)["order_date"])
+    def test_valid_date_parsed(self, clean_row):
+        result = _filter_valid_rows(clean_row)
+        assert pd.api.types.is_datetime64_any_dtype(result["order_date"])
 
-    def test_already_datetime_kept(self):
-        df = pd.DataFrame([{"order_date": pd.Timestamp("2024-01-15")}])
-        assert len(_validate_dates(df)) == 1
+    def test_already_datetime_kept(self, clean_row):
+        df = clean_row.assign(order_date=pd.Timestamp("2024-01-15"))
+        assert len(_filter_valid_rows(df)) == 1
 
     def test_bad_dates_fixture(self, bad_dates):
-        assert len(_validate_dates(bad_dates)) == 1
-
-    def test_empty_string_dropped(self):
-        df = pd.DataFrame([{"order_date": ""}, {"order_date": "2024-01-15"}])
-        assert len(_validate_dates(df)) == 1
+        assert len(_filter_valid_rows(bad_dates)) == 1
 
 
 class TestStandardizeText:
@@ -211,8 +158,6 @@ class TestAddMetadata:
         assert ts.tzinfo == timezone.utc
 
     def test_loaded_at_is_recent(self, clean_row):
-        import time
-
         before = pd.Timestamp.now(tz=timezone.utc).timestamp()
         result = _add_metadata(clean_row)
         after = pd.Timestamp.now(tz=timezone.utc).timestamp()
@@ -258,3 +203,107 @@ class TestTransformIntegration:
 
     def test_clean_row_passes_through(self, clean_row):
         assert len(transform(clean_row)) == 1
+
+
+class TestTransformSingleMask:
+    def test_logs_per_step_removals(self, full_raw_df, caplog):
+        with caplog.at_level("INFO", logger="transform"):
+            transform(full_raw_df)
+        messages = [r.getMessage() for r in caplog.records]
+        assert "[drop_duplicates] 1 rows removed -> 14 remaining." in messages
+        assert "[drop_null_critical_fields] 3 rows removed -> 11 remaining." in messages
+        assert "[validate_numerics] 2 rows removed -> 9 remaining." in messages
+        assert "[validate_dates] 1 rows removed -> 8 remaining." in messages
+
+    def test_input_not_modified(self, full_raw_df):
+        before = full_raw_df.copy()
+        transform(full_raw_df)
+        pd.testing.assert_frame_equal(full_raw_df, before)
+
+    def test_no_setting_with_copy_warning(self, full_raw_df):
+        import warnings
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", pd.errors.SettingWithCopyWarning)
+            transform(full_raw_df)
+
+    def test_empty_frame(self, full_raw_df):
+        assert transform(full_raw_df.iloc[0:0]).empty
+
+    def test_all_null_text_chunk(self, clean_row):
+        chunk = clean_row.assign(customer_name=float("nan"))
+        assert transform(chunk).empty
+
+
+class TestTransformChunks:
+    def test_matches_single_pass_row_count(self, full_raw_df):
+        chunks = [full_raw_df.iloc[i : i + 4] for i in range(0, len(full_raw_df), 4)]
+        result = pd.concat(transform_chunks(chunks))
+        assert len(result) == len(transform(full_raw_df))
+
+    def test_drops_duplicates_across_chunks(self, clean_row):
+        chunks = [clean_row.copy(), clean_row.copy()]
+        assert [len(c) for c in transform_chunks(chunks)] == [1, 0]
+
+    def test_duplicates_matched_across_inferred_dtypes(self, clean_row):
+        second = pd.concat(
+            [clean_row.assign(quantity="2"), clean_row.assign(quantity="abc")]
+        )
+        assert [len(c) for c in transform_chunks([clean_row, second])] == [1, 0]
+
+    def test_yields_one_frame_per_chunk(self, clean_row):
+        chunks = [clean_row, clean_row.assign(order_id=1002)]
+        assert len(list(transform_chunks(chunks))) == 2
+
+    def test_seen_keeps_one_hash_per_distinct_row(self, clean_row):
+        _, seen = _drop_seen(pd.concat([clean_row, clean_row]), np.empty(0, np.uint64))
+        _, seen = _drop_seen(clean_row, seen)
+        assert len(seen) == 1
+
+
+class TestParallelTransform:
+    def test_matches_transform(self, full_raw_df):
+        expected = transform(full_raw_df).drop(columns=["loaded_at"])
+        result = parallel_transform(full_raw_df, workers=3).drop(columns=["loaded_at"])
+        pd.testing.assert_frame_equal(result, expected)
+
+    def test_drops_duplicates_across_partitions(self, clean_row):
+        df = pd.concat([clean_row, clean_row.assign(order_id=1002), clean_row])
+        assert len(parallel_transform(df, workers=3)) == 2
+
+    def test_single_loaded_at_for_all_partitions(self, full_raw_df):
+        result = parallel_transform(full_raw_df, workers=2)
+        assert result["loaded_at"].nunique() == 1
+
+    def test_one_worker_runs_in_process(self, full_raw_df, monkeypatch):
+        import transform as transform_module
+
+        monkeypatch.setattr(transform_module, "ProcessPoolExecutor", None)
+        assert len(parallel_transform(full_raw_df, workers=1)) == len(
+            transform(full_raw_df)
+        )
+
+    def test_input_not_modified(self, full_raw_df):
+        before = full_raw_df.copy()
+        parallel_transform(full_raw_df, workers=2)
+        pd.testing.assert_frame_equal(full_raw_df, before)
+
+    def test_falls_back_when_shared_memory_is_full(
+        self, full_raw_df, tmp_path, monkeypatch
+    ):
+        import transform as transform_module
+
+        monkeypatch.setattr(transform_module, "SHARED_MEMORY_DIR", tmp_path)
+        monkeypatch.setattr(
+            transform_module.shutil, "disk_usage", lambda _: MagicMock(free=0)
+        )
+        assert transform_module._shared_dir(full_raw_df) is None
+        assert len(parallel_transform(full_raw_df, workers=2)) == len(
+            transform(full_raw_df)
+        )
+
+    def test_uses_shared_memory_with_room(self, full_raw_df, tmp_path, monkeypatch):
+        import transform as transform_module
+
+        monkeypatch.setattr(transform_module, "SHARED_MEMORY_DIR", tmp_path)
+        assert transform_module._shared_dir(full_raw_df) == tmp_path
@@ -1,9 +1,30 @@
+import json
+
 import pandas as pd
 import pytest
 
-gx = pytest.importorskip("great_expectations")
+import validate
+from validate import (
+    CLEAN_EXPECTATIONS,
+    VALID_REGIONS,
+    ChunkedReport,
+    DataQualityError,
+    validate_clean,
+    validate_raw,
+)
+
+
+@pytest.fixture(params=["builtin", "gx"])
+def backend(request):
+    if request.param == "gx":
+        pytest.importorskip("great_expectations")
+    return request.param
 
-from validate import VALID_REGIONS, DataQualityError, validate_clean, validate_raw
+
+@pytest.fixture(autouse=True)
+def reports_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(validate, "REPORTS_DIR", tmp_path)
+    return tmp_path
 
 
 def make_raw_row(**overrides) -> dict:
@@ -35,105 +56,111 @@ def make_clean_row(**overrides) -> dict:
 
 
 class TestValidateRaw:
-    def test_passes_valid_data(self):
+    def test_passes_valid_data(self, backend):
         df = pd.DataFrame([make_raw_row()])
-        assert validate_raw(df, action="halt") is True
+        assert validate_raw(df, action="halt", backend=backend) is True
 
-    def test_passes_multiple_valid_rows(self):
+    def test_passes_multiple_valid_rows(self, backend):
         df = pd.DataFrame([make_raw_row(order_id=i) for i in range(1, 6)])
-        assert validate_raw(df, action="halt") is True
+        assert validate_raw(df, action="halt", backend=backend) is True
 
-    def test_halts_on_missing_column(self):
+    def test_halts_on_missing_column(self, backend):
         df = pd.DataFrame([make_raw_row()])
         df = df.drop(columns=["region"])
         with pytest.raises(DataQualityError, match="region"):
-            validate_raw(df, action="halt")
+            validate_raw(df, action="halt", backend=backend)
 
-    def test_warns_on_missing_column(self):
+    def test_warns_on_missing_column(self, backend):
         df = pd.DataFrame([make_raw_row()])
         df = df.drop(columns=["region"])
-        result = validate_raw(df, action="warn")
+        result = validate_raw(df, action="warn", backend=backend)
         assert result is False
 
-    def test_halts_on_empty_dataframe(self):
+    def test_halts_on_empty_dataframe(self, backend):
         df = pd.DataFrame(columns=list(make_raw_row().keys()))
         with pytest.raises(DataQualityError):
-            validate_raw(df, action="halt")
+            validate_raw(df, action="halt", backend=backend)
 
-    def test_halts_on_null_order_id(self):
+    def test_halts_on_null_order_id(self, backend):
         df = pd.DataFrame([make_raw_row(order_id=None)])
         with pytest.raises(DataQualityError):
-            validate_raw(df, action="halt")
+            validate_raw(df, action="halt", backend=backend)
 
-    def test_does_not_halt_on_null_non_critical_field(self):
+    def test_does_not_halt_on_null_non_critical_field(self, backend):
         df = pd.DataFrame([make_raw_row(customer_name=None)])
-        assert validate_raw(df, action="halt") is True
+        assert validate_raw(df, action="halt", backend=backend) is True
 
-    def test_allows_dirty_data_through(self):
+    def test_allows_dirty_data_through(self, backend):
         df = pd.DataFrame([make_raw_row(quantity="abc", order_date="not-a-date")])
-        assert validate_raw(df, action="halt") is True
+        assert validate_raw(df, action="halt", backend=backend) is True
 
 
 class TestValidateClean:
-    def test_passes_valid_clean_data(self):
+    def test_passes_valid_clean_data(self, backend):
         df = pd.DataFrame([make_clean_row()])
-        assert validate_clean(df, action="halt") is True
+        assert validate_clean(df, action="halt", backend=backend) is True
 
-    def test_passes_multiple_rows(self):
+    def test_passes_multiple_rows(self, backend):
         df = pd.DataFrame([make_clean_row(order_id=i) for i in range(1, 6)])
-        assert validate_clean(df, action="halt") is True
+        assert validate_clean(df, action="halt", backend=backend) is True
 
-    def test_halts_on_null_customer_name(self):
+    def test_halts_on_null_customer_name(self, backend):
         df = pd.DataFrame([make_clean_row(customer_name=None)])
         with pytest.raises(DataQualityError):
-            validate_clean(df, action="halt")
+            validate_clean(df, action="halt", backend=backend)
 
-    def test_halts_on_null_region(self):
+    def test_halts_on_null_region(self, backend):
         df = pd.DataFrame([make_clean_row(region=None)])
         with pytest.raises(DataQualityError):
-            validate_clean(df, action="halt")
+            validate_clean(df, action="halt", backend=backend)
 
-    def test_halts_on_invalid_region(self):
+    def test_halts_on_invalid_region(self, backend):
         df = pd.DataFrame([make_clean_row(region="InvalidRegion")])
         with pytest.raises(DataQualityError):
-            validate_clean(df, action="halt")
+            validate_clean(df, action="halt", backend=backend)
 
-    def test_valid_regions_accepted(self):
+    def test_valid_regions_accepted(self, backend):
         for region in VALID_REGIONS:
             df = pd.DataFrame([make_clean_row(region=region)])
-            assert validate_clean(df, action="halt") is True
+            assert validate_clean(df, action="halt", backend=backend) is True
 
-    def test_halts_on_zero_quantity(self):
+    def test_halts_on_zero_quantity(self, backend):
         df = pd.DataFrame([make_clean_row(quantity=0)])
         with pytest.raises(DataQualityError):
-            validate_clean(df, action="halt")
+            validate_clean(df, action="halt", backend=backend)
 
-    def test_halts_on_negative_quantity(self):
+    def test_halts_on_negative_quantity(self, backend):
         df = pd.DataFrame([make_clean_row(quantity=-1)])
         with pytest.raises(DataQualityError):
-            validate_clean(df, action="halt")
+            validate_clean(df, action="halt", backend=backend)
 
-    def test_halts_on_zero_unit_price(self):
+    def test_halts_on_zero_unit_price(self, backend):
         df = pd.DataFrame([make_clean_row(unit_price=0.0)])
         with pytest.raises(DataQualityError):
-            validate_clean(df, action="halt")
+            validate_clean(df, action="halt", backend=backend)
 
-    def test_halts_on_duplicate_order_id(self):
+    def test_halts_on_duplicate_order_id(self, backend):
         df = pd.DataFrame([make_clean_row(order_id=1), make_clean_row(order_id=1)])
         with pytest.raises(DataQualityError):
-            validate_clean(df, action="halt")
+            validate_clean(df, action="halt", backend=backend)
+
+    def test_upsert_accepts_repeated_order_id(self, backend):
+        df = pd.DataFrame(
+            [make_clean_row(order_id=1), make_clean_row(order_id=1, quantity=3)]
+        )
+        assert validate_clean(df, action="halt", backend=backend, upsert=True)
 
-    def test_halts_on_null_total_revenue(self):
+    def test_halts_on_null_total_revenue(self, backend):
         df = pd.DataFrame([make_clean_row(total_revenue=None)])
         with pytest.raises(DataQualityError):
-            validate_clean(df, action="halt")
+            validate_clean(df, action="halt", backend=backend)
 
-    def test_warns_instead_of_halting(self):
+    def test_warns_instead_of_halting(self, backend):
         df = pd.DataFrame([make_clean_row(region="BadRegion")])
-        result = validate_clean(df, action="warn")
+        result = validate_clean(df, action="warn", backend=backend)
         assert result is False
 
-    def test_valid_regions_constant(self):
+    def test_valid_regions_constant(self, backend):
         assert VALID_REGIONS == {"North", "South", "East", "West"}
 
 
@@ -146,3 +173,95 @@ class TestDataQualityError:
             raise DataQualityError("suite failed: expect_column_to_exist(region)")
         except DataQualityError as e:
             assert "region" in str(e)
+
+
+class TestBuiltinEngine:
+    def test_report_written_in_suite_format(self, reports_dir):
+        df = pd.DataFrame([make_clean_row(region="Atlantis")])
+        validate_clean(df, action="warn")
+        report = json.loads((reports_dir / "clean_suite.json").read_text())
+        assert report["suite"] == "clean_suite"
+        assert report["success"] is False
+        assert report["evaluated"] == len(CLEAN_EXPECTATIONS)
+        assert report["failed"] == 1
+        assert report["failures"][0]["expectation"] == (
+            "expect_column_values_to_be_in_set"
+        )
+        assert report["failures"][0]["column"] == "region"
+        assert "Atlantis" in report["failures"][0]["details"]
+
+    def test_in_set_ignores_nulls(self):
+        df = pd.DataFrame([make_clean_row(), make_clean_row(order_id=2, region=None)])
+        with pytest.raises(DataQualityError) as exc:
+            validate_clean(df, action="halt")
+        assert "to_be_in_set" not in str(exc.value)
+        assert "to_not_be_null(region)" in str(exc.value)
+
+    def test_between_is_inclusive_without_strict(self):
+        df = pd.DataFrame([make_clean_row(quantity=1)])
+        assert validate_clean(df, action="halt") is True
+
+    def test_missing_column_fails_column_checks(self):
+        df = pd.DataFrame([make_clean_row()]).drop(columns=["loaded_at"])
+        with pytest.raises(DataQualityError, match="loaded_at"):
+            validate_clean(df, action="halt")
+
+    def test_unique_counts_every_duplicate(self, reports_dir):
+        df = pd.DataFrame([make_clean_row(order_id=7) for _ in range(3)])
+        validate_clean(df, action="warn")
+        report = json.loads((reports_dir / "clean_suite.json").read_text())
+        assert "'unexpected_count': 3" in report["failures"][0]["details"]
+
+    def test_unknown_backend_expectation_rejected(self):
+        bad = validate.Expectation("expect_column_mean_to_be_between", {"column": "x"})
+        with pytest.raises(ValueError, match="Unsupported"):
+            validate._evaluate(pd.DataFrame({"x": [1]}), bad)
+
+
+class TestChunkedReport:
+    def test_aggregates_counts_across_chunks(self, reports_dir):
+        report = ChunkedReport()
+        validate_clean(pd.DataFrame([make_clean_row()]), report=report)
+        validate_clean(
+            pd.DataFrame([make_clean_row(region="Atlantis")]),
+            action="warn",
+            report=report,
+        )
+        report.write()
+        summary = json.loads((reports_dir / "clean_suite.json").read_text())
+        assert summary["chunks"] == 2
+        assert summary["success"] is False
+        assert summary["evaluated"] == 2 * len(CLEAN_EXPECTATIONS)
+        assert summary["failures"][0]["chunk"] == 1
+
+    def test_nothing_written_until_write(self, reports_dir):
+        report = ChunkedReport()
+        validate_clean(pd.DataFrame([make_clean_row()]), report=report)
+        assert not (reports_dir / "clean_suite.json").exists()
+
+
+class TestGxCache:
+    def test_suite_key_is_stable(self):
+        assert validate._suite_key(CLEAN_EXPECTATIONS) == validate._suite_key(
+            list(CLEAN_EXPECTATIONS)
+        )
+
+    def test_suite_key_changes_with_expectations(self):
+        assert validate._suite_key(CLEAN_EXPECTATIONS) != validate._suite_key(
+            CLEAN_EXPECTATIONS[:-1]
+        )
+
+    def test_validation_definition_reused(self):
+        pytest.importorskip("great_expectations")
+        validate._clear_gx_cache()
+        first = validate._gx_validation("clean_suite", CLEAN_EXPECTATIONS)
+        second = validate._gx_validation("clean_suite", CLEAN_EXPECTATIONS)
+        assert first is second
+        assert len(validate._gx_validations) == 1
+
+    def test_changed_suite_compiled_separately(self):
+        pytest.importorskip("great_expectations")
+        validate._clear_gx_cache()
+        validate._gx_validation("clean_suite", CLEAN_EXPECTATIONS)
+        validate._gx_validation("clean_suite", CLEAN_EXPECTATIONS[:-1])
+        assert len(validate._gx_validations) == 2
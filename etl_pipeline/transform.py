@@ -1,6 +1,14 @@
+import shutil
+import tempfile
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
+from itertools import pairwise
+from pathlib import Path
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 
 from logger import get_logger
 
@@ -9,57 +17,172 @@ log = get_logger(__name__)
 CRITICAL_FIELDS: list[str] = ["customer_name", "product", "region"]
 NUMERIC_FIELDS: list[str] = ["quantity", "unit_price"]
 
+# tmpfs, so partitions handed to workers never touch disk.
+SHARED_MEMORY_DIR = Path("/dev/shm")
+
 
 def transform(df: pd.DataFrame) -> pd.DataFrame:
     original_count = len(df)
 
-    df = _drop_duplicates(df)
-    df = _drop_null_critical_fields(df)
-    df = _validate_numerics(df)
-    df = _validate_dates(df)
-    df = _standardize_text(df)
-    df = _derive_columns(df)
+    df = _clean(df)
     df = _add_metadata(df)
 
     log.info(f"Transform complete: {len(df)}/{original_count} rows passed.")
     return df
 
 
-def _drop_duplicates(df: pd.DataFrame) -> pd.DataFrame:
-    before = len(df)
-    df = df.drop_duplicates()
-    _log_removed("drop_duplicates", before, len(df))
+def parallel_transform(df: pd.DataFrame, workers: int) -> pd.DataFrame:
+    if workers <= 1 or len(df) < workers:
+        return transform(df)
+
+    original_count = len(df)
+
+    # A duplicate pair can straddle a partition boundary, so duplicates are
+    # dropped across the whole frame before it's split.
+    keep = ~df.duplicated().to_numpy()
+    _log_step("drop_duplicates", original_count, keep)
+    df = df.take(np.flatnonzero(keep))
+
+    # Partitions go to the workers as Arrow IPC files on tmpfs and come back
+    # the same way; each side memory-maps the file instead of unpickling.
+    with (
+        tempfile.TemporaryDirectory(dir=_shared_dir(df)) as tmp,
+        ProcessPoolExecutor(max_workers=workers) as pool,
+    ):
+        bounds = np.linspace(0, len(df), workers + 1, dtype=int)
+        futures = []
+        for i, (start, stop) in enumerate(pairwise(bounds)):
+            source = Path(tmp) / f"partition-{i}.arrow"
+            _write_arrow(df.iloc[start:stop], source)
+            futures.append(pool.submit(_clean_partition, source))
+        parts = [_read_arrow(future.result()) for future in futures]
+
+    df = _add_metadata(pd.concat(parts))
+    log.info(
+        f"Parallel transform complete ({workers} workers): {len(df)}/{original_count} rows passed."
+    )
     return df
 
 
-def _drop_null_critical_fields(df: pd.DataFrame) -> pd.DataFrame:
-    before = len(df)
-    df = df.dropna(subset=CRITICAL_FIELDS)
-    _log_removed("drop_null_critical_fields", before, len(df))
+def _shared_dir(df: pd.DataFrame) -> Path | None:
+    # tmpfs is backed by RAM and Docker caps /dev/shm at 64 MB by default. The
+    # partitions and their cleaned copies are on it at the same time, so if
+    # twice the frame won't fit they go to the regular temp dir instead.
+    if not SHARED_MEMORY_DIR.is_dir():
+        return None
+    needed = 2 * int(df.memory_usage(deep=True).sum())
+    free = shutil.disk_usage(SHARED_MEMORY_DIR).free
+    if free < needed:
+        log.warning(
+            f"{SHARED_MEMORY_DIR} has {free} bytes free, {needed} needed — using the temp dir."
+        )
+        return None
+    return SHARED_MEMORY_DIR
+
+
+def _clean(df: pd.DataFrame) -> pd.DataFrame:
+    df = _filter_valid_rows(df)
+    df = _standardize_text(df)
+    df = _derive_columns(df)
     return df
 
 
-def _validate_numerics(df: pd.DataFrame) -> pd.DataFrame:
+def _clean_partition(source: Path) -> Path:
+    target = source.with_suffix(".clean.arrow")
+    _write_arrow(_clean(_read_arrow(source)), target)
+    return target
+
+
+def _write_arrow(df: pd.DataFrame, path: Path) -> None:
+    try:
+        table = pa.Table.from_pandas(df)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Raw object columns can mix types ("abc" next to 3). Arrow needs one
+        # type per column, and transform coerces from the string form anyway.
+        df = df.copy(deep=False)
+        for column in df.select_dtypes("object").columns:
+            values = df[column]
+            df[column] = values.where(values.isna(), values.astype(str))
+        table = pa.Table.from_pandas(df)
+
+    with (
+        pa.OSFile(str(path), "wb") as sink,
+        pa.ipc.new_file(sink, table.schema) as writer,
+    ):
+        writer.write_table(table)
+
+
+def _read_arrow(path: Path) -> pd.DataFrame:
+    with pa.memory_map(str(path)) as source:
+        return pa.ipc.open_file(source).read_all().to_pandas()
+
+
+def transform_chunks(chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    # Rows already yielded are remembered as a sorted array of 64-bit hashes,
+    # so memory grows by 8 bytes per distinct row rather than per chunk.
+    seen = np.empty(0, dtype=np.uint64)
+    rows_in = rows_out = 0
+
+    for chunk in chunks:
+        rows_in += len(chunk)
+        chunk, seen = _drop_seen(chunk, seen)
+        clean = transform(chunk)
+        rows_out += len(clean)
+        yield clean
+
+    log.info(f"Streaming transform complete: {rows_out}/{rows_in} rows passed.")
+
+
+def _drop_seen(df: pd.DataFrame, seen: np.ndarray) -> tuple[pd.DataFrame, np.ndarray]:
+    # Chunks can infer different dtypes for the same column (e.g. "2" vs 2),
+    # so rows are hashed on their string form to match duplicates across chunks.
     before = len(df)
+    keys = pd.util.hash_pandas_object(df.astype(str), index=False).to_numpy()
+
+    # `seen` stays sorted, so membership is a binary search per key and only
+    # the chunk's new keys are sorted; `seen` itself is never re-sorted.
+    positions = np.searchsorted(seen, keys)
+    found = positions < len(seen)
+    found[found] = seen[positions[found]] == keys[found]
+    df = df.take(np.flatnonzero(~found))
+    _log_removed("drop_seen_duplicates", before, len(df))
+
+    fresh = np.unique(keys[~found])
+    return df, np.insert(seen, np.searchsorted(seen, fresh), fresh)
+
+
+def _filter_valid_rows(df: pd.DataFrame) -> pd.DataFrame:
+    # Every filter step only ever removes rows, so the row-validity checks are
+    # combined into one mask and the surviving rows are copied out once.
+    keep = ~df.duplicated().to_numpy()
+    remaining = _log_step("drop_duplicates", len(df), keep)
+
+    keep &= df[CRITICAL_FIELDS].notna().all(axis=1).to_numpy()
+    remaining = _log_step("drop_null_critical_fields", remaining, keep)
+
+    # Coerce on a shallow copy so the caller's frame is left untouched and the
+    # raw string columns aren't carried into the filtered copy.
+    df = df.copy(deep=False)
     for field in NUMERIC_FIELDS:
         df[field] = pd.to_numeric(df[field], errors="coerce")
-    df = df.dropna(subset=NUMERIC_FIELDS)
-    _log_removed("validate_numerics", before, len(df))
+        keep &= df[field].notna().to_numpy()
+    remaining = _log_step("validate_numerics", remaining, keep)
 
+    df["order_date"] = pd.to_datetime(df["order_date"], errors="coerce")
+    keep &= df["order_date"].notna().to_numpy()
+    _log_step("validate_dates", remaining, keep)
+
+    df = df.take(np.flatnonzero(keep))
     df["quantity"] = df["quantity"].astype(int)
     df["unit_price"] = df["unit_price"].astype(float)
     return df
 
 
-def _validate_dates(df: pd.DataFrame) -> pd.DataFrame:
-    before = len(df)
-    df["order_date"] = pd.to_datetime(df["order_date"], errors="coerce")
-    df = df.dropna(subset=["order_date"])
-    _log_removed("validate_dates", before, len(df))
-    return df
-
-
 def _standardize_text(df: pd.DataFrame) -> pd.DataFrame:
+    # A chunk whose text column was all blank is read as float64, which has no
+    # .str accessor; if every row was filtered out there's nothing to clean.
+    if df.empty:
+        return df
     for field in ["customer_name", "region"]:
         df[field] = df[field].str.strip().str.title()
     return df
@@ -75,5 +198,11 @@ def _add_metadata(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+def _log_step(step: str, before: int, keep: np.ndarray) -> int:
+    after = int(keep.sum())
+    _log_removed(step, before, after)
+    return after
+
+
 def _log_removed(step: str, before: int, after: int) -> None:
     log.info(f"[{step}] {before - after} rows removed -> {after} remaining.")
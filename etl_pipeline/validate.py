@@ -1,92 +1,192 @@
+import hashlib
 import json
+import threading
+from dataclasses import dataclass, field
 from pathlib import Path
 
-import great_expectations as gx
-import great_expectations.expectations as gxe
+import numpy as np
 import pandas as pd
 
 from logger import get_logger
 
+try:
+    import great_expectations as gx
+    import great_expectations.expectations as gxe
+except ImportError:  # pragma: no cover - GX is an optional backend
+    gx = None
+    gxe = None
+
 log = get_logger(__name__)
 
 VALID_REGIONS = {"North", "South", "East", "West"}
 REPORTS_DIR = Path(__file__).parent / "reports"
+VALID_BACKENDS = {"builtin", "gx"}
+
+PARTIAL_UNEXPECTED_LIMIT = 20
+
+# One GX context per process; validation definitions compiled once per
+# (suite name, expectation list) and reused by every later call.
+_gx_lock = threading.Lock()
+_gx_context = None
+_gx_batch_definition = None
+_gx_validations: dict[tuple[str, str], object] = {}
 
 
 class DataQualityError(Exception):
     pass
 
 
-def validate_raw(df: pd.DataFrame, action: str = "halt") -> bool:
-    expectations = [
-        gxe.ExpectColumnToExist(column="order_id"),
-        gxe.ExpectColumnToExist(column="customer_name"),
-        gxe.ExpectColumnToExist(column="product"),
-        gxe.ExpectColumnToExist(column="quantity"),
-        gxe.ExpectColumnToExist(column="unit_price"),
-        gxe.ExpectColumnToExist(column="order_date"),
-        gxe.ExpectColumnToExist(column="region"),
-        gxe.ExpectTableRowCountToBeGreaterThan(value=0),
-        gxe.ExpectColumnValuesToNotBeNull(column="order_id"),
-    ]
-    return _run(df, suite_name="raw_suite", expectations=expectations, action=action)
-
-
-def validate_clean(df: pd.DataFrame, action: str = "halt") -> bool:
-    expectations = [
-        gxe.ExpectColumnValuesToNotBeNull(column="customer_name"),
-        gxe.ExpectColumnValuesToNotBeNull(column="product"),
-        gxe.ExpectColumnValuesToNotBeNull(column="region"),
-        gxe.ExpectColumnValuesToNotBeNull(column="order_date"),
-        gxe.ExpectColumnValuesToNotBeNull(column="total_revenue"),
-        gxe.ExpectColumnValuesToNotBeNull(column="loaded_at"),
-        gxe.ExpectColumnValuesToBeInSet(column="region", value_set=VALID_REGIONS),
-        gxe.ExpectColumnValuesToBeBetween(column="quantity", min_value=1),
-        gxe.ExpectColumnValuesToBeBetween(
-            column="unit_price", min_value=0, strict_min=True
-        ),
-        gxe.ExpectColumnValuesToBeBetween(
-            column="total_revenue", min_value=0, strict_min=True
-        ),
-        gxe.ExpectColumnValuesToBeUnique(column="order_id"),
-    ]
-    return _run(df, suite_name="clean_suite", expectations=expectations, action=action)
+@dataclass(frozen=True)
+class Expectation:
+    type: str
+    kwargs: dict = field(default_factory=dict)
 
+    @property
+    def column(self) -> str:
+        return self.kwargs.get("column", "table")
 
-def _run(
+
+@dataclass(frozen=True)
+class ExpectationResult:
+    expectation: Expectation
+    success: bool
+    details: dict
+
+
+RAW_EXPECTATIONS: list[Expectation] = [
+    Expectation("expect_column_to_exist", {"column": "order_id"}),
+    Expectation("expect_column_to_exist", {"column": "customer_name"}),
+    Expectation("expect_column_to_exist", {"column": "product"}),
+    Expectation("expect_column_to_exist", {"column": "quantity"}),
+    Expectation("expect_column_to_exist", {"column": "unit_price"}),
+    Expectation("expect_column_to_exist", {"column": "order_date"}),
+    Expectation("expect_column_to_exist", {"column": "region"}),
+    Expectation("expect_table_row_count_to_be_greater_than", {"value": 0}),
+    Expectation("expect_column_values_to_not_be_null", {"column": "order_id"}),
+]
+
+CLEAN_EXPECTATIONS: list[Expectation] = [
+    Expectation("expect_column_values_to_not_be_null", {"column": "customer_name"}),
+    Expectation("expect_column_values_to_not_be_null", {"column": "product"}),
+    Expectation("expect_column_values_to_not_be_null", {"column": "region"}),
+    Expectation("expect_column_values_to_not_be_null", {"column": "order_date"}),
+    Expectation("expect_column_values_to_not_be_null", {"column": "total_revenue"}),
+    Expectation("expect_column_values_to_not_be_null", {"column": "loaded_at"}),
+    Expectation(
+        "expect_column_values_to_be_in_set",
+        {"column": "region", "value_set": VALID_REGIONS},
+    ),
+    Expectation(
+        "expect_column_values_to_be_between", {"column": "quantity", "min_value": 1}
+    ),
+    Expectation(
+        "expect_column_values_to_be_between",
+        {"column": "unit_price", "min_value": 0, "strict_min": True},
+    ),
+    Expectation(
+        "expect_column_values_to_be_between",
+        {"column": "total_revenue", "min_value": 0, "strict_min": True},
+    ),
+    Expectation("expect_column_values_to_be_unique", {"column": "order_id"}),
+]
+
+# An upsert batch can carry an order next to its later correction, and the
+# merge keeps the last version read, so a repeated order_id isn't a defect.
+UPSERT_CLEAN_EXPECTATIONS: list[Expectation] = [
+    e for e in CLEAN_EXPECTATIONS if e.type != "expect_column_values_to_be_unique"
+]
+
+
+class ChunkedReport:
+    def __init__(self) -> None:
+        self._summaries: dict[str, dict] = {}
+
+    def add(self, summary: dict) -> None:
+        current = self._summaries.get(summary["suite"])
+        chunk = 0 if current is None else current["chunks"]
+        failures = [{**f, "chunk": chunk} for f in summary["failures"]]
+
+        if current is None:
+            self._summaries[summary["suite"]] = {
+                **summary,
+                "chunks": 1,
+                "failures": failures,
+            }
+            return
+
+        current["success"] = current["success"] and summary["success"]
+        current["chunks"] += 1
+        for key in ("evaluated", "passed", "failed"):
+            current[key] += summary[key]
+        current["failures"].extend(failures)
+
+    def write(self) -> None:
+        for summary in self._summaries.values():
+            _write_report(summary)
+
+
+def validate_raw(
     df: pd.DataFrame,
-    suite_name: str,
-    expectations: list,
-    action: str,
+    action: str = "halt",
+    report: ChunkedReport | None = None,
+    backend: str = "builtin",
 ) -> bool:
-    context = gx.get_context(mode="ephemeral")
-
-    datasource = context.data_sources.add_pandas("pandas_source")
-    asset = datasource.add_dataframe_asset("dataframe_asset")
-    batch_definition = asset.add_batch_definition_whole_dataframe("batch_definition")
+    return _run(
+        df,
+        suite_name="raw_suite",
+        expectations=RAW_EXPECTATIONS,
+        action=action,
+        report=report,
+        backend=backend,
+    )
 
-    suite = context.suites.add(gx.ExpectationSuite(name=suite_name))
-    for expectation in expectations:
-        suite.add_expectation(expectation)
 
-    validation_definition = context.validation_definitions.add(
-        gx.ValidationDefinition(name=suite_name, data=batch_definition, suite=suite)
+def validate_clean(
+    df: pd.DataFrame,
+    action: str = "halt",
+    report: ChunkedReport | None = None,
+    backend: str = "builtin",
+    upsert: bool = False,
+) -> bool:
+    return _run(
+        df,
+        suite_name="clean_suite",
+        expectations=UPSERT_CLEAN_EXPECTATIONS if upsert else CLEAN_EXPECTATIONS,
+        action=action,
+        report=report,
+        backend=backend,
     )
 
-    result = validation_definition.run(batch_parameters={"dataframe": df})
 
-    failures = [r for r in result.results if not r.success]
-    _write_report(suite_name, result)
+def _run(
+    df: pd.DataFrame,
+    suite_name: str,
+    expectations: list[Expectation],
+    action: str,
+    report: ChunkedReport | None = None,
+    backend: str = "builtin",
+) -> bool:
+    if backend == "gx":
+        results = _run_gx(df, suite_name, expectations)
+    else:
+        results = [_evaluate(df, expectation) for expectation in expectations]
 
-    if result.success:
-        log.info(f"[{suite_name}] All {len(result.results)} expectations passed.")
+    failures = [r for r in results if not r.success]
+    summary = _summarize(suite_name, results)
+    if report is None:
+        _write_report(summary)
+    else:
+        report.add(summary)
+
+    if not failures:
+        log.info(f"[{suite_name}] All {len(results)} expectations passed.")
         return True
 
     failure_summary = ", ".join(
-        f"{r.expectation_config.type}({_expectation_column(r)})" for r in failures
+        f"{r.expectation.type}({r.expectation.column})" for r in failures
     )
     log.warning(
-        f"[{suite_name}] {len(failures)}/{len(result.results)} expectations failed: {failure_summary}"
+        f"[{suite_name}] {len(failures)}/{len(results)} expectations failed: {failure_summary}"
     )
 
     if action == "halt":
@@ -97,31 +197,181 @@ def _run(
     return False
 
 
-def _expectation_column(result) -> str:
-    kwargs = result.expectation_config.kwargs
-    return kwargs.get("column", "table")
+def _run_gx(
+    df: pd.DataFrame, suite_name: str, expectations: list[Expectation]
+) -> list[ExpectationResult]:
+    if gx is None:
+        raise ImportError(
+            "VALIDATION_BACKEND=gx requires great_expectations. Install it or use 'builtin'."
+        )
 
+    validation_definition = _gx_validation(suite_name, expectations)
+    result = validation_definition.run(batch_parameters={"dataframe": df})
 
-def _write_report(suite_name: str, result) -> None:
-    REPORTS_DIR.mkdir(exist_ok=True)
-    report_path = REPORTS_DIR / f"{suite_name}.json"
+    return [
+        ExpectationResult(
+            expectation=Expectation(
+                r.expectation_config.type, r.expectation_config.kwargs
+            ),
+            success=r.success,
+            details=r.result,
+        )
+        for r in result.results
+    ]
+
+
+def _gx_validation(suite_name: str, expectations: list[Expectation]):
+    global _gx_context, _gx_batch_definition
+
+    key = (suite_name, _suite_key(expectations))
+    with _gx_lock:
+        if key in _gx_validations:
+            return _gx_validations[key]
+
+        if _gx_context is None:
+            log.info("Creating Great Expectations context...")
+            context = gx.get_context(mode="ephemeral")
+            datasource = context.data_sources.add_pandas("pandas_source")
+            asset = datasource.add_dataframe_asset("dataframe_asset")
+            _gx_batch_definition = asset.add_batch_definition_whole_dataframe(
+                "batch_definition"
+            )
+            _gx_context = context
+
+        # Names must be unique in the context, so a suite whose expectations
+        # change mid-process gets its own entry instead of clobbering the old one.
+        name = f"{suite_name}_{key[1][:12]}"
+        suite = _gx_context.suites.add(gx.ExpectationSuite(name=name))
+        for expectation in expectations:
+            suite.add_expectation(_to_gx(expectation))
+
+        validation_definition = _gx_context.validation_definitions.add(
+            gx.ValidationDefinition(name=name, data=_gx_batch_definition, suite=suite)
+        )
+        _gx_validations[key] = validation_definition
+        log.info(f"[{suite_name}] Compiled GX suite cached.")
+        return validation_definition
+
+
+def _suite_key(expectations: list[Expectation]) -> str:
+    payload = json.dumps(
+        [[e.type, e.kwargs] for e in expectations],
+        sort_keys=True,
+        default=lambda value: sorted(value) if isinstance(value, set) else str(value),
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _clear_gx_cache() -> None:
+    global _gx_context, _gx_batch_definition
+    with _gx_lock:
+        _gx_context = None
+        _gx_batch_definition = None
+        _gx_validations.clear()
+
+
+def _to_gx(expectation: Expectation):
+    class_name = "".join(part.title() for part in expectation.type.split("_"))
+    return getattr(gxe, class_name)(**expectation.kwargs)
+
+
+def _evaluate(df: pd.DataFrame, expectation: Expectation) -> ExpectationResult:
+    kwargs = expectation.kwargs
 
-    summary = {
+    if expectation.type == "expect_column_to_exist":
+        success = kwargs["column"] in df.columns
+        return ExpectationResult(expectation, success, {})
+
+    if expectation.type == "expect_table_row_count_to_be_greater_than":
+        success = len(df) > kwargs["value"]
+        return ExpectationResult(expectation, success, {"observed_value": len(df)})
+
+    column = kwargs["column"]
+    if column not in df.columns:
+        return ExpectationResult(
+            expectation, False, {"error": f"Column '{column}' not found"}
+        )
+
+    values = df[column]
+    if expectation.type == "expect_column_values_to_not_be_null":
+        return _column_result(expectation, values, values.isna().to_numpy())
+
+    # Like GX, the remaining column checks only consider non-null values.
+    present = values[values.notna()]
+    if expectation.type == "expect_column_values_to_be_in_set":
+        unexpected = ~present.isin(kwargs["value_set"]).to_numpy()
+    elif expectation.type == "expect_column_values_to_be_between":
+        unexpected = _out_of_range(present.to_numpy(), **kwargs)
+    elif expectation.type == "expect_column_values_to_be_unique":
+        unexpected = present.duplicated(keep=False).to_numpy()
+    else:
+        raise ValueError(
+            f"Unsupported expectation for builtin backend: {expectation.type}"
+        )
+
+    return _column_result(expectation, present, unexpected, element_count=len(values))
+
+
+def _out_of_range(
+    values: np.ndarray,
+    column: str,
+    min_value: float | None = None,
+    max_value: float | None = None,
+    strict_min: bool = False,
+    strict_max: bool = False,
+) -> np.ndarray:
+    unexpected = np.zeros(len(values), dtype=bool)
+    if min_value is not None:
+        unexpected |= values <= min_value if strict_min else values < min_value
+    if max_value is not None:
+        unexpected |= values >= max_value if strict_max else values > max_value
+    return unexpected
+
+
+def _column_result(
+    expectation: Expectation,
+    values: pd.Series,
+    unexpected: np.ndarray,
+    element_count: int | None = None,
+) -> ExpectationResult:
+    element_count = len(values) if element_count is None else element_count
+    unexpected_count = int(unexpected.sum())
+    details = {
+        "element_count": element_count,
+        "unexpected_count": unexpected_count,
+        "unexpected_percent": (
+            100 * unexpected_count / element_count if element_count else 0.0
+        ),
+        "partial_unexpected_list": values[unexpected]
+        .head(PARTIAL_UNEXPECTED_LIMIT)
+        .tolist(),
+    }
+    return ExpectationResult(expectation, unexpected_count == 0, details)
+
+
+def _summarize(suite_name: str, results: list[ExpectationResult]) -> dict:
+    return {
         "suite": suite_name,
-        "success": result.success,
-        "evaluated": len(result.results),
-        "passed": sum(1 for r in result.results if r.success),
-        "failed": sum(1 for r in result.results if not r.success),
+        "success": all(r.success for r in results),
+        "evaluated": len(results),
+        "passed": sum(1 for r in results if r.success),
+        "failed": sum(1 for r in results if not r.success),
         "failures": [
             {
-                "expectation": r.expectation_config.type,
-                "column": _expectation_column(r),
-                "details": str(r.result),
+                "expectation": r.expectation.type,
+                "column": r.expectation.column,
+                "details": str(r.details),
             }
-            for r in result.results
+            for r in results
             if not r.success
         ],
     }
 
+
+def _write_report(summary: dict) -> None:
+    REPORTS_DIR.mkdir(exist_ok=True)
+    suite_name = summary["suite"]
+    report_path = REPORTS_DIR / f"{suite_name}.json"
+
     report_path.write_text(json.dumps(summary, indent=2, default=str))
     log.info(f"[{suite_name}] Report written to {report_path}")